@@ -0,0 +1,86 @@
+"""products.jsonl şemasında deterministik sentetik katalog üretimi (benchmark'lar için)."""
+import json
+import random
+from typing import Dict, Any, Iterator, List
+
+BASE_URL = "https://www.bimakskimya.com.tr/cozumler-urunler/su-ve-proses-kimyasallari"
+
+CATEGORIES = [
+    ("Ters Osmoz", "ters-osmoz-urunleri"),
+    ("Kazan Su Islahı", "kazan-su-islahi"),
+    ("Soğutma Suyu Islahı", "sogutma-suyu-islahi"),
+    ("Şeker Prosesi", "seker-prosesi"),
+    ("Petrokimya", "petrokimya-urunleri"),
+    ("Çelik Endüstrisi", "celik-endustrisi-uygulamalari"),
+    ("Kağıt Prosesi", "kagit-prosesi"),
+    ("Atık Su Arıtma", "atik-su-aritma"),
+]
+PRODUCT_TYPES = [
+    "antiskalant", "korozyon inhibitörü", "biyosit", "membran temizleyici", "oksijen tutucu",
+    "birikinti önleyici", "dispersan", "flokülant", "koagülant", "köpük kesici", "pH ayarlayıcı",
+    "kostik temizleme katkısı", "H2S tutucu", "yağ gres dispersanı", "tufal çöktürme",
+]
+APPLICATIONS = [
+    "ters osmoz sistemleri", "buhar kazanları", "açık devre soğutma kuleleri", "kapalı devre soğutma",
+    "şeker evaporatörleri", "rafineri prosesleri", "kağıt makinesi", "membran arıtma", "eşanjörler",
+    "atık su tesisleri", "deniz suyu arıtma", "sıcak su kazanları",
+]
+PROBLEMS = [
+    "kireçlenme", "kazan taşı", "korozyon", "mikroorganizma üremesi", "biyofilm", "membran tıkanması",
+    "silis birikintisi", "demir birikintisi", "köpüklenme", "çamur oluşumu", "oksijen korozyonu",
+    "lejyonella", "askıda katı madde", "renk giderme",
+]
+PARAMS = [
+    "düşük dozaj", "NSF sertifikalı", "fosfat içermez", "yüksek sıcaklığa dayanıklı", "sıvı form",
+    "geniş pH aralığı", "çevre dostu", "gıda temaslı onaylı", "online izlenebilir", "konsantre",
+]
+FILLER = [
+    "yüksek", "verimli", "endüstriyel", "sistem", "performans", "uzun", "ömür", "koruma", "proses",
+    "kontrol", "program", "güvenli", "ekonomik", "etkili", "sürekli", "arıtma", "su", "kimyasal",
+]
+
+
+def slugify(text: str) -> str:
+    table = str.maketrans("çğıöşüÇĞİÖŞÜ", "cgiosuCGIOSU")
+    return "-".join(text.translate(table).lower().split())
+
+
+def generate_products(n: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for i in range(n):
+        category, cat_slug = rng.choice(CATEGORIES)
+        ptype = rng.choice(PRODUCT_TYPES)
+        code = f"{1000 + i}"
+        name = f"MAKS {code} {ptype.upper()}"
+        applications = rng.sample(APPLICATIONS, rng.randint(1, 3))
+        problems = rng.sample(PROBLEMS, rng.randint(1, 3))
+        desc_words = [ptype] + problems + rng.sample(FILLER, rng.randint(4, 10))
+        rng.shuffle(desc_words)
+        yield {
+            "product_name": name,
+            "category": category,
+            "applications": applications,
+            "problems_solved": problems,
+            "key_params": rng.sample(PARAMS, rng.randint(0, 3)),
+            "short_desc": " ".join(desc_words).capitalize() + ".",
+            "url": f"{BASE_URL}/{cat_slug}/maks-{code}-{slugify(ptype)}/",
+            "doc_url": "",
+        }
+
+
+def write_catalog(path: str, n: int, seed: int = 42) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        for product in generate_products(n, seed):
+            f.write(json.dumps(product, ensure_ascii=False) + "\n")
+    return path
+
+
+def sample_queries(n: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n):
+        parts = [rng.choice(PROBLEMS), rng.choice(APPLICATIONS)]
+        if rng.random() < 0.5:
+            parts.append(rng.choice(PRODUCT_TYPES))
+        queries.append(" ".join(parts))
+    return queries
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Katalog sıkıştırma kontrolü: bilinen tekrarlar eklenmiş sentetik katalogda
+birleştirme doğruluğu, indeks boyutu ve açılış süresi.
+
+Sentetik kataloğa eklenenler (her biri için doğru sonuç bilinir):
+  URL varyantı    aynı ürün http / büyük harfli host / sondaki / yok / ?utm / #,
+                  bazı alanları eksik -> tek satıra birleşmeli, listeler tamamlanmalı
+  kategori kopyası aynı sayfa başka kategori yolunda, küçük metin farklarıyla
+                  -> içerik benzerliğiyle birleşmeli
+  kardeş ürün     aynı açıklama, farklı ürün kodu (MAKS 1001 / MAKS 91001)
+                  -> ayrı kalmalı
+  menü sayfası    jenerik ad + menü metni açıklama, geçersiz URL -> atılmalı
+Ayrıca CSV kopyası kaynak olarak verilir (products.csv gibi). Son olarak
+katalog üretildikten sonra products.jsonl güncellenince canlı yenilemenin
+products.jsonl'e geçtiği, katalog yeniden üretilince ona döndüğü kontrol edilir.
+
+    python -m bench.catalog_compact_check --products 5000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from bench.catalog import BASE_URL, generate_products
+
+BOILERPLATE = "HAKKIMIZDAARGESERTİFİKALARIMIZİNSAN KAYNAKLARIGİZLİLİK POLİTİKASI"
+
+
+def url_variant(url: str, rng: random.Random) -> str:
+    choice = rng.randrange(5)
+    if choice == 0:
+        return url.replace("https://", "http://")
+    if choice == 1:
+        return url.replace("www.bimakskimya.com.tr", "WWW.BIMAKSKIMYA.COM.TR")
+    if choice == 2:
+        return url.rstrip("/")
+    if choice == 3:
+        return url + "?utm_source=eposta"
+    return url + "#teknik"
+
+
+def noisy(text: str, rng: random.Random) -> str:
+    text = text.upper() if rng.random() < 0.5 else text
+    return text.rstrip(".") + ("  " if rng.random() < 0.5 else "")
+
+
+def build(n: int, seed: int = 3):
+    """Satırlar ve URL -> gerçek ürün kimliği eşlemesi"""
+    rng = random.Random(seed)
+    rows, truth = [], {}
+    expected = {"url": 0, "content": 0, "siblings": 0, "dropped": 0}
+    for i, p in enumerate(generate_products(n, seed=seed)):
+        rows.append(p)
+        truth[p["url"]] = i
+        r = rng.random()
+        if r < 0.10:
+            variant = dict(p, url=url_variant(p["url"], rng), key_params=[],
+                           applications=p["applications"][:1] + ["soğutma eşanjörleri"])
+            rows.append(variant)
+            expected["url"] += 1
+        elif r < 0.15:
+            # Aynı ürün sayfası başka bir kategori yolunda
+            slug = p["url"].rstrip("/").rsplit("/", 1)[-1]
+            copy = dict(p, url=f"{BASE_URL}/genel-urunler/{slug}/", short_desc=noisy(p["short_desc"], rng),
+                        product_name=noisy(p["product_name"], rng).strip())
+            rows.append(copy)
+            truth[copy["url"]] = i
+            expected["content"] += 1
+        elif r < 0.20:
+            code = p["product_name"].split()[1]
+            sibling = dict(p, product_name=p["product_name"].replace(code, f"9{code}"),
+                           url=p["url"].replace(f"maks-{code}", f"maks-9{code}"))
+            rows.append(sibling)
+            truth[sibling["url"]] = f"{i}-kardeş"
+            expected["siblings"] += 1
+        elif r < 0.23:
+            rows.append({"product_name": "Ters Osmoz Ürünleri", "category": "Bimaks", "applications": [],
+                         "problems_solved": [], "key_params": [], "short_desc": BOILERPLATE,
+                         "url": f"{BASE_URL}/urun-gruplari/grup-{i}/", "doc_url": ""})
+            expected["dropped"] += 1
+    rng.shuffle(rows)
+    return rows, truth, expected
+
+
+def write_sources(tmp: str, rows: List[Dict]) -> List[str]:
+    jsonl = os.path.join(tmp, "products.jsonl")
+    with open(jsonl, "w", encoding="utf-8") as f:
+        for r in rows:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    # products.csv gibi paralel kopya: liste alanları virgülle birleşik
+    csv_path = os.path.join(tmp, "products.csv")
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        for r in rows:
+            writer.writerow({k: ", ".join(v) if isinstance(v, list) else v for k, v in r.items()})
+    return [jsonl, csv_path]
+
+
+def load(path: str):
+    from search import ProductSearch
+
+    t0 = time.perf_counter()
+    search = ProductSearch(path, index_dir=None, query_cache_size=0)
+    return search, time.perf_counter() - t0
+
+
+def wait_for_reload(search, previous, timeout: float = 10.0) -> str:
+    """Watcher yeni snapshot'ı devreye alana kadar bekle; sunulan dosya yolunu döndür"""
+    deadline = time.perf_counter() + timeout
+    while search.snapshot is previous and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    return search.data_path
+
+
+def check_stale_catalog() -> List[str]:
+    """products.jsonl katalogdan sonra güncellenince (ingest_links.py) sunucu eski kataloğu sunmamalı;
+    katalog yeniden üretilince ona geri dönmeli. Varsayılan göreli yollar için geçici dizinde çalışır."""
+    from catalog_compact import SOURCE_PATH, compact, write_catalog
+    from search import ProductSearch
+
+    errors: List[str] = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            os.makedirs("data")
+            products = list(generate_products(200, seed=5))
+            with open(SOURCE_PATH, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(p, ensure_ascii=False) + "\n" for p in products)
+            catalog, report = compact([SOURCE_PATH])
+            write_catalog(catalog, report, "data/catalog.jsonl", [SOURCE_PATH])
+            search = ProductSearch(None, index_dir=None, query_cache_size=0)
+            served = [search.data_path]
+            # Canlı yenileme (watcher) katalogla birlikte kaynakları da izlemeli
+            search.start_watching(0.1)
+            new = dict(products[0], product_name="MAKS 4321 YENİ ÜRÜN",
+                       url=f"{BASE_URL}/cozumler-urunler/yeni/maks-4321-yeni-urun/")
+            snap = search.snapshot
+            with open(SOURCE_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(new, ensure_ascii=False) + "\n")
+            served.append(wait_for_reload(search, snap))
+            found = [r["product_name"] for r in search.search("MAKS 4321", top_k=1)]
+            snap = search.snapshot
+            catalog, report = compact([SOURCE_PATH])
+            write_catalog(catalog, report, "data/catalog.jsonl", [SOURCE_PATH])
+            served.append(wait_for_reload(search, snap))
+            search.stop_watching()
+        finally:
+            os.chdir(cwd)
+    print(f"  eski katalog: sunulan dosya {' -> '.join(served)} | yeni ürün bulundu: {found[:1]}")
+    if served != ["data/catalog.jsonl", SOURCE_PATH, "data/catalog.jsonl"] or found[:1] != ["MAKS 4321 YENİ ÜRÜN"]:
+        errors.append("kaynak değişince eski kanonik katalog sunuldu ya da yeni katalog yeniden seçilmedi")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Katalog sıkıştırma kontrolü")
+    parser.add_argument("--products", type=int, default=5000)
+    args = parser.parse_args()
+
+    from catalog_compact import canonical_url, compact, write_catalog
+
+    errors: List[str] = []
+    rows, truth, expected = build(args.products)
+    truth = {canonical_url(u): t for u, t in truth.items()}
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = write_sources(tmp, rows)
+        t0 = time.perf_counter()
+        products, report = compact(sources)
+        seconds = time.perf_counter() - t0
+        out = os.path.join(tmp, "catalog.jsonl")
+        write_catalog(products, report, out, sources)
+        s = report["summary"]
+        print(f"▶ {len(rows)} satır (+ CSV kopyası), eklenen: {expected['url']} URL varyantı, "
+              f"{expected['content']} kategori kopyası, {expected['siblings']} kardeş ürün, {expected['dropped']} menü sayfası")
+        print(f"  {s['input_rows']} -> {s['output_rows']} ürün ({seconds:.2f}s) | geçersiz {s['dropped_invalid']} | "
+              f"URL birleşmesi {s['merged_by_url']} | içerik birleşmesi {s['merged_by_content']} | "
+              f"benzer ama ayrı {s['near_duplicates_kept_apart']}")
+
+        # Doğruluk: her gerçek ürün çıktıda tam bir kez, birleşen içerik aynı ürüne ait
+        ids = [truth.get(canonical_url(p["url"])) for p in products]
+        missing = set(truth.values()) - set(ids)
+        doubled = len(ids) - len(set(ids))
+        wrong = sum(truth.get(canonical_url(u)) != truth.get(canonical_url(m["kept"]))
+                    for m in report["content_merges"] for u in m["merged"])
+        found = s["merged_by_content"]
+        print(f"  içerik birleşmesi: {found - wrong}/{expected['content']} doğru, {wrong} yanlış | "
+              f"eksik ürün {len(missing)} | çift kalan {doubled}")
+        if missing or doubled or wrong:
+            errors.append(f"birleştirme hatalı (eksik {len(missing)}, çift {doubled}, yanlış {wrong})")
+        if s["dropped_invalid"] != 2 * expected["dropped"]:
+            errors.append(f"menü sayfaları atılmadı ({s['dropped_invalid']})")
+        by_url = {canonical_url(p["url"]): p for p in products}
+        restored = sum(len(p["key_params"]) > 0 or len(p["applications"]) > 1 for p in products)
+        print(f"  birleştirilen satırlarda liste alanları korundu: {restored}/{len(products)} üründe dolu")
+        if any("soğutma eşanjörleri" in p["applications"] and not p["problems_solved"] for p in by_url.values()):
+            errors.append("birleştirmede alan kaybı")
+
+        # Tekrar çalıştırma aynı kataloğu vermeli
+        again, again_report = compact([out])
+        if again != products or again_report["summary"]["merged_by_content"]:
+            errors.append("sıkıştırma idempotent değil")
+
+
+        # Sunucu: ham kaynak (açılışta normalizasyon) ve kanonik katalog
+        raw, raw_seconds = load(sources[0])
+        canon, canon_seconds = load(out)
+        for name, search, secs in (("ham", raw, raw_seconds), ("kanonik", canon, canon_seconds)):
+            index = search.snapshot.index
+            print(f"  {name:<8} katalog: {len(search.products):6d} ürün | TF-IDF nnz {index.matrix.nnz:7d} | "
+                  f"yükleme + indeks {secs:.2f}s")
+    errors.extend(check_stale_catalog())
+    if errors:
+        for e in errors:
+            print("❌", e)
+        sys.exit(1)
+    print("✅ Tekrarlar doğru birleşti, kardeş ürünler ayrı kaldı, kanonik katalog normalizasyonsuz yüklendi, "
+          "kaynak değişince eski katalog sunulmadı")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""/api/recommend istek birleştirme (single-flight) kontrolü.
+
+Sahte OpenAI sunucusuna karşı aynı promptu (büyük/küçük harf ve noktalama
+farklarıyla) N kez aynı anda gönderir; upstream'e tek çağrı gittiğini,
+herkesin aynı cevabı aldığını ve farklı promptların birleştirilmediğini doğrular.
+
+    python -m bench.coalesce_check -n 50 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+import httpx
+
+from bench.stub_openai import StubState, run_in_thread
+
+VARIANTS = [
+    "Ters osmoz membranında kireçlenme",
+    "ters osmoz membranında kireçlenme?",
+    "TERS OSMOZ MEMBRANINDA KİREÇLENME",
+    "  ters   osmoz membranında, kireçlenme ",
+]
+
+
+async def fire(client: httpx.AsyncClient, prompts: list) -> list:
+    return await asyncio.gather(*(client.post("/api/recommend", json={"prompt": p}) for p in prompts))
+
+
+async def run(app, n: int, state: StubState) -> tuple:
+    # İki dalga aynı event loop'ta: LLM bağlantı havuzu loop'a bağlı
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        identical = await fire(client, [VARIANTS[i % len(VARIANTS)] for i in range(n)])
+        first_calls = state.calls
+        await fire(client, [VARIANTS[0], "kazan taşı oluşumu", "soğutma kulesinde korozyon"])
+        return identical, first_calls, state.calls - first_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="İstek birleştirme kontrolü")
+    parser.add_argument("-n", type=int, default=50, help="aynı anda gönderilen özdeş istek sayısı")
+    parser.add_argument("--latency", type=float, default=0.5, help="sahte LLM gecikmesi (saniye)")
+    args = parser.parse_args()
+
+    state = StubState(args.latency)
+    os.environ["OPENAI_BASE_URL"] = run_in_thread(state)
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    # Önbellek kapalı: tekrarları yalnızca birleştirme yakalamalı
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    os.environ["COALESCE_ENABLED"] = "1"
+
+    import main as app_module
+    # ASGITransport lifespan çalıştırmaz: indeks ve LLM istemcisi burada kurulur
+    app_module.warm_up()
+
+    failures = []
+
+    responses, calls, second_calls = asyncio.run(run(app_module.app, args.n, state))
+    stats = app_module.recommend_flight.stats()
+
+    # 1) Özdeş istekler -> tek upstream çağrısı
+    print(f"Özdeş istek: {args.n} | 200: {sum(r.status_code == 200 for r in responses)} | "
+          f"upstream çağrı: {calls} | birleştirilen: {stats['coalesced']}")
+    if any(r.status_code != 200 for r in responses):
+        failures.append("başarısız istek var")
+    if calls != 1:
+        failures.append(f"upstream'e {calls} çağrı gitti (beklenen 1)")
+    if len({r.text for r in responses}) != 1:
+        failures.append("istemciler farklı cevap aldı")
+
+    # 2) Farklı promptlar birleştirilmez; tamamlanan iş sonraki dalgayı karşılamaz
+    print(f"Farklı 3 prompt (ikinci dalga) | upstream çağrı: {second_calls}")
+    if second_calls != 3:
+        failures.append(f"farklı promptlarda {second_calls} çağrı (beklenen 3)")
+    if stats["coalesced"] != args.n - 1 or stats["in_flight"] != 0:
+        failures.append(f"sayaçlar beklenmedik: {stats}")
+
+    if failures:
+        for f in failures:
+            print("❌", f)
+        sys.exit(1)
+    print("✅ Aynı anda gelen özdeş istekler tek LLM çağrısında birleşti")
+
+
+if __name__ == "__main__":
+    main()
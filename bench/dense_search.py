@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Yoğun vektör (dense) motoru ile mevcut hibrit motorun karşılaştırması.
+
+  isabet     gerçek katalogda etiketli sorgu setleri, recall@3:
+             queries_tr.jsonl            ürün adındaki kelimelerle
+             queries_intent.jsonl        ihtiyaç ürün metninde geçmeyen kelimelerle
+                                         (borularda kireç -> antiskalant). embedding.CONCEPTS
+                                         tablosu bu sorgulara bakılarak yazıldı; sonucu döngüsel,
+                                         yalnızca bilgi için raporlanır
+             queries_intent_holdout.jsonl tablo yazıldıktan sonra, ona bakmadan yazılmış ihtiyaç
+                                         sorguları; kontrol bu set üzerinden yapılır
+  önbellek   dense motorunda önbellekten dönen sonuç taze aramayla aynı olmalı
+             ("soğutma kulesinde yosun" / "... pas" TF-IDF'te aynı vektöre düşer)
+  artefakt   dense indeksi diske yazılıp mmap ile açılınca aynı sonuçlar
+  gecikme    sentetik katalogda derleme süresi, p50/p99 sorgu gecikmesi
+  ANN        IVF aramasının (int8 vektörler) float32 tam taramaya göre
+             recall@10'u ve sorgu süresi, nprobe'a göre
+
+    python -m bench.dense_search [--products 100000] [--queries 300]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from bench.catalog import sample_queries, write_catalog
+from bench.search_eval import QUERIES_FILE, evaluate, load_queries
+from bench.search_latency import percentiles, time_queries
+
+INTENT_FILE = os.path.join(os.path.dirname(__file__), "queries_intent.jsonl")
+HOLDOUT_FILE = os.path.join(os.path.dirname(__file__), "queries_intent_holdout.jsonl")
+QUERY_SETS = (("kelime", QUERIES_FILE), ("ihtiyaç/ayar", INTENT_FILE), ("ihtiyaç/ayrılmış", HOLDOUT_FILE))
+# Yalnızca sözlük dışı kelimede ayrılan sorgular (TF-IDF vektörleri aynı)
+CACHE_PAIRS = ("soğutma kulesinde yosun", "soğutma kulesinde pas", "kazan biyosit", "kazan köpük",
+               "kazan pas", "kulede yosun", "kulede kireç")
+
+
+def recall_report(data: str, k: int = 3) -> Dict[str, Dict[str, float]]:
+    from search import ProductSearch
+
+    search = ProductSearch(data, index_dir=None, backend="dense", query_cache_size=0)
+    urls = [p.get("url", "") for p in search.products]
+    rows: Dict[str, Dict[str, float]] = {}
+    print(f"▶ İsabet ({len(urls)} ürün, {data}), recall@{k}")
+    for name, path in QUERY_SETS:
+        queries = load_queries(path)
+        for backend in ("hybrid", "dense"):
+            search.backend = backend
+            result = evaluate(lambda q: [r["url"] for r in search.search(q, top_k=k)], queries, urls, k)
+            rows[f"{name}/{backend}"] = result
+            print(f"  {name:<16} {backend:<7} recall@{k} {result['recall']:.3f} | isabet {result['hit_rate']:.3f} | "
+                  f"bulunamayan {len(result['misses'])}/{result['queries']}")
+    search.backend = "dense"
+    return rows
+
+
+def cache_consistency(data: str) -> int:
+    """Önbellek açık dense motorunda, önbellekten dönen sonuçların taze aramadan farklı olduğu sorgu sayısı"""
+    from search import ProductSearch
+
+    search = ProductSearch(data, index_dir=None, backend="dense")
+    queries = list(CACHE_PAIRS) + [q["query"] for _, path in QUERY_SETS for q in load_queries(path)]
+    wrong = 0
+    for q in queries + queries[::-1]:
+        got = [r["url"] for r in search.search(q, top_k=3)]
+        wrong += got != [r["url"] for r in search._search(search.snapshot, q, 3, None)]
+    stats = search.query_cache_stats()
+    print(f"  önbellek: {2 * len(queries)} sorgu, isabet {stats['hit']:.0f}, taze aramadan farklı {wrong}")
+    return wrong
+
+
+def artifact_roundtrip(data: str) -> bool:
+    """Derlenmiş dense artefaktı mmap ile açılınca canlı fit ile aynı sonuçları vermeli"""
+    from search import ProductSearch
+    from search_index import save_index
+
+    live = ProductSearch(data, index_dir=None, backend="dense", query_cache_size=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        snap = live.snapshot
+        save_index(tmp, snap.source_hash, snap.products, snap.index)
+        loaded = ProductSearch(data, index_dir=tmp, backend="dense", query_cache_size=0)
+        mapped = isinstance(loaded.snapshot.index.dense.vectors, np.memmap)
+        queries = [q["query"] for q in load_queries(INTENT_FILE) + load_queries(QUERIES_FILE)]
+        same = all([r["url"] for r in live.search(q, top_k=3)] == [r["url"] for r in loaded.search(q, top_k=3)]
+                   for q in queries)
+    print(f"  artefakt: mmap {'evet' if mapped else 'hayır'}, {len(queries)} sorguda sonuçlar "
+          f"{'aynı' if same else 'FARKLI'}")
+    return mapped and same
+
+
+def ann_report(search, queries: List[str], k: int = 10) -> Dict[int, float]:
+    """nprobe'a göre IVF recall@k (float32 tam taramaya göre) ve sorgu süresi"""
+    dense = search.snapshot.index.dense
+    products = [search.products.to_dict(i) for i in range(len(search.products))]
+    exact_vectors = dense.encoder.encode(search._search_texts(products))
+    encoded = [dense.encode_query(q) for q in queries]
+    truth = [set(np.argsort(-(exact_vectors @ q))[:k].tolist()) for q in encoded]
+    n_lists = max(1, len(dense.centroids))
+    float32_mb = exact_vectors.nbytes / 2 ** 20
+    print(f"  vektörler: {dense.vectors.shape[0]} x {dense.vectors.shape[1]} {dense.dtype} "
+          f"{dense.vectors.nbytes / 2 ** 20:.1f} MB (float32: {float32_mb:.1f} MB), {len(dense.centroids)} küme")
+    default = dense.nprobe
+    recalls: Dict[int, float] = {}
+    for nprobe in sorted({4, default, 32, n_lists}):
+        if nprobe > n_lists:
+            continue
+        dense.nprobe = nprobe
+        t0 = time.perf_counter()
+        found = [dense.search(q, k)[0] for q in encoded]
+        seconds = (time.perf_counter() - t0) / len(encoded)
+        recalls[nprobe] = float(np.mean([len(truth[i] & set(f.tolist())) / k for i, f in enumerate(found)]))
+        marker = " (varsayılan)" if nprobe == default else ""
+        print(f"  nprobe {nprobe:4d}: ANN recall@{k} {recalls[nprobe]:.3f} | {seconds * 1000:.2f} ms/sorgu{marker}")
+    dense.nprobe = default
+    return recalls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dense ve hibrit motor karşılaştırması")
+    parser.add_argument("--data", default=None, help="isabet ölçümü için katalog (varsayılan: kanonik katalog)")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    from catalog_compact import default_catalog_path
+    from search import ProductSearch
+
+    errors: List[str] = []
+    data = args.data or default_catalog_path()
+    rows = recall_report(data)
+    if rows["ihtiyaç/ayrılmış/dense"]["recall"] <= rows["ihtiyaç/ayrılmış/hybrid"]["recall"]:
+        errors.append("ayrılmış ihtiyaç sorgularında dense hibritten iyi değil")
+    if rows["kelime/dense"]["recall"] < rows["kelime/hybrid"]["recall"]:
+        errors.append("kelime sorgularında dense hibritten geride")
+    if cache_consistency(data):
+        errors.append("dense motorunda önbellek taze aramadan farklı sonuç döndürdü")
+    if not artifact_roundtrip(data):
+        errors.append("dense artefaktı canlı fit ile aynı sonucu vermedi")
+
+    queries = sample_queries(args.queries, seed=11)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_catalog(os.path.join(tmp, "products.jsonl"), args.products)
+        print(f"\n▶ Gecikme: {args.products} ürünlük sentetik katalog, {len(queries)} sorgu x 3")
+        engines = {}
+        for backend in ("hybrid", "dense"):
+            t0 = time.perf_counter()
+            engines[backend] = ProductSearch(path, index_dir=None, backend=backend, query_cache_size=0)
+            build = time.perf_counter() - t0
+            p50, p99 = percentiles(time_queries(engines[backend].search, queries))
+            print(f"  {backend:<7} derleme {build:6.1f}s | p50 {p50:6.2f} ms | p99 {p99:6.2f} ms")
+            engines[backend].p99 = p99
+        recalls = ann_report(engines["dense"], queries)
+    dense = engines["dense"].snapshot.index.dense
+    if recalls.get(dense.nprobe, 0) < 0.9:
+        errors.append(f"varsayılan nprobe ile ANN recall@10 düşük ({recalls.get(dense.nprobe, 0):.3f})")
+
+    if errors:
+        for e in errors:
+            print("❌", e)
+        sys.exit(1)
+    print("✅ dense ayrılmış ihtiyaç sorgularında daha isabetli, kelime sorgularında geride değil, "
+          "önbellek tutarlı, ANN recall yeterli")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Faset filtreli arama, faset sayımı ve kategori listeleme gecikmesi.
+
+Sentetik katalogda geniş (tek kategori), dar (kategori + uygulama) ve çok dar
+(üç alan) filtrelerle search() süresini filtresiz aramayla; kategori listelemeyi
+eski doğrusal taramayla karşılaştırır. Filtre dışına çıkan sonuç olursa hata verir.
+
+    python -m bench.facet_latency --products 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from bench.catalog import write_catalog, sample_queries
+from bench.search_latency import percentiles, time_queries
+
+FILTERS = {
+    "geniş": {"category": ["Soğutma Suyu Islahı"]},
+    "dar": {"category": ["Soğutma Suyu Islahı"], "applications": ["buhar kazanları", "eşanjörler"]},
+    "çok dar": {"category": ["Kazan Su Islahı"], "problems_solved": ["lejyonella"], "key_params": ["NSF sertifikalı"]},
+}
+
+
+def legacy_by_category(products, category: str):
+    """Değişiklik öncesi get_products_by_category (karşılaştırma için)"""
+    return [p for p in products if p.get('category', '').lower() == category.lower()]
+
+
+def matches(product, filters) -> bool:
+    from facets import facet_key
+
+    for field, values in filters.items():
+        have = product.get(field) or []
+        have = {facet_key(v) for v in (have if isinstance(have, list) else [have])}
+        if not have & {facet_key(v) for v in values}:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faset filtreleri gecikme ölçümü")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    from search import ProductSearch
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_catalog(os.path.join(tmp, "products.jsonl"), args.products)
+        search = ProductSearch(path, index_dir=None, query_cache_size=0)
+
+    queries = sample_queries(args.queries)
+    for q in queries[:20]:
+        search.search(q)
+    p50, p99 = percentiles(time_queries(search.search, queries))
+    print(f"filtresiz          p50: {p50:7.3f} ms | p99: {p99:7.3f} ms")
+
+    leaks = 0
+    for name, filters in FILTERS.items():
+        n = len(search.snapshot.facets.select(filters))
+        p50, p99 = percentiles(time_queries(lambda q: search.search(q, filters=filters), queries))
+        leaks += sum(not matches(r, filters) for q in queries for r in search.search(q, filters=filters))
+        print(f"{name:<9} ({n:>6}) p50: {p50:7.3f} ms | p99: {p99:7.3f} ms")
+
+    p50, p99 = percentiles(time_queries(lambda _: search.facet_counts(FILTERS["geniş"]), range(100)))
+    print(f"faset sayımı       p50: {p50:7.3f} ms | p99: {p99:7.3f} ms")
+    p50, _ = percentiles(time_queries(lambda _: search.get_products_by_category("petrokimya"), range(20)))
+    old50, _ = percentiles(time_queries(lambda _: legacy_by_category(search.products, "petrokimya"), range(20)))
+    print(f"kategori listesi   p50: {p50:7.3f} ms | eski doğrusal tarama: {old50:7.3f} ms")
+
+    if leaks:
+        print(f"❌ Filtre dışı sonuç: {leaks}")
+        sys.exit(1)
+    print("✅ Tüm sonuçlar filtreye uyuyor")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Ağ gerektirmeyen, deterministik LLMProcessor yedeği (benchmark'lar için).
+
+Yalnızca HTTP katmanı (`_complete` / `_stream_content`) değiştirilir; önbellek,
+süre bütçesi, prompt oluşturma ve parse yolları gerçek LLMProcessor'dakiyle aynıdır.
+"""
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, List
+
+from bench.stub_openai import STUB_CONTENT
+
+
+def make_fake_processor(latency: float = 0.05, chunk_size: int = 8):
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    from llm import LLMProcessor
+
+    class FakeLLMProcessor(LLMProcessor):
+        def __init__(self):
+            super().__init__()
+            self.latency = latency
+            self.calls = 0
+            self.content = json.dumps(STUB_CONTENT, ensure_ascii=False)
+
+        async def _complete(self, messages: List[Dict[str, str]]) -> str:
+            self.calls += 1
+            await asyncio.sleep(self.latency)
+            return self.content
+
+        async def _stream_content(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+            self.calls += 1
+            pieces = [self.content[i:i + chunk_size] for i in range(0, len(self.content), chunk_size)]
+            for piece in pieces:
+                await asyncio.sleep(self.latency / len(pieces))
+                yield piece
+
+    return FakeLLMProcessor()
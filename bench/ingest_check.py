@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""ingest_links.py için yerel sahte site üzerinde uçtan uca kontrol.
+
+Doğrulananlar: eşzamanlı çekim, host başına hız sınırı, ikinci çalıştırmada
+304 ile atlanan sayfalar, URL'ye göre upsert (tekrarlı satır yok), yalnızca
+değişen sayfanın güncellenmesi ve elle düzenlenmiş satırın (kategori, açıklama,
+ad) sayfa değişse de, --full ile yeniden çekilse de korunması.
+
+    python -m bench.ingest_check
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ingest_links
+
+
+class StubSite:
+    def __init__(self, pages: int, delay: float = 0.05):
+        self.delay = delay
+        self.version = {f"/cozumler-urunler/su/kazan/maks-{i}/": 1 for i in range(pages)}
+        self.requests = 0
+        self.not_modified = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started_at = []
+        self.lock = threading.Lock()
+
+    def body(self, path: str) -> str:
+        name = path.strip("/").rsplit("/", 1)[-1].upper()
+        return (f"<html><body><h1>{name} ANTİSKALANT</h1>"
+                f"<div class='entry-content'><p>{name} sürüm {self.version[path]} açıklaması</p></div></body></html>")
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with site.lock:
+                    site.requests += 1
+                    site.in_flight += 1
+                    site.max_in_flight = max(site.max_in_flight, site.in_flight)
+                    site.started_at.append(time.monotonic())
+                try:
+                    time.sleep(site.delay)
+                    if self.path not in site.version:
+                        self.send_response(404)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    body = site.body(self.path).encode("utf-8")
+                    etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                    if self.headers.get("If-None-Match") == etag:
+                        with site.lock:
+                            site.not_modified += 1
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with site.lock:
+                        site.in_flight -= 1
+
+        return Handler
+
+    def reset_counters(self):
+        self.requests = self.not_modified = self.max_in_flight = 0
+        self.started_at = []
+
+
+CURATED_PATH = "/cozumler-urunler/su/kazan/maks-2/"
+CURATED = {"product_name": "MAKS 2 Kazan Suyu Antiskalantı", "category": "Kazan Suyu Kimyasalları",
+           "applications": [], "problems_solved": ["kazan taşı"], "key_params": [],
+           "short_desc": "Buhar kazanlarında kireç ve silika birikimini önleyen, elle yazılmış açıklama."}
+
+
+def curated_kept(out: str) -> bool:
+    row = next(r for r in map(json.loads, open(out, encoding="utf-8")) if r["url"].endswith(CURATED_PATH))
+    return all(row[k] == v for k, v in CURATED.items())
+
+
+def check(condition: bool, message: str):
+    print(("✅ " if condition else "❌ ") + message)
+    if not condition:
+        sys.exit(1)
+
+
+def main():
+    pages, rate = 40, 100.0
+    site = StubSite(pages)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), site.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    CURATED["url"] = base + CURATED_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        links = os.path.join(tmp, "links.txt")
+        out = os.path.join(tmp, "products.jsonl")
+        state = os.path.join(tmp, "state.json")
+        with open(links, "w", encoding="utf-8") as f:
+            for path in site.version:
+                f.write(base + path + "\n")
+            f.write(base + "/cozumler-urunler/su/kazan/maks-0/\n")  # tekrarlı link
+        # Eski append-only davranışından kalma tekrarlı satır
+        with open(out, "w", encoding="utf-8") as f:
+            row = {"product_name": "ESKİ", "category": "Bimaks", "applications": ["kazan"], "problems_solved": [],
+                   "key_params": [], "short_desc": "", "url": base + "/cozumler-urunler/su/kazan/maks-1/"}
+            f.write(json.dumps(row, ensure_ascii=False) + "\n" + json.dumps(row, ensure_ascii=False) + "\n")
+            # Elle düzenlenmiş satır: varsayılan olmayan kategori, yazılmış açıklama ve ad
+            f.write(json.dumps(CURATED, ensure_ascii=False) + "\n")
+
+        t0 = time.monotonic()
+        stats = ingest_links.ingest(links, out, state, workers=8, rate=rate)
+        elapsed = time.monotonic() - t0
+        rows = [json.loads(line) for line in open(out, encoding="utf-8")]
+        span = site.started_at[-1] - site.started_at[0]
+        check(stats["added"] == pages - 2 and stats["updated"] == 2, f"ilk çalıştırma: {stats}")
+        check(len(rows) == pages and len({r['url'] for r in rows}) == pages, f"URL başına tek satır ({len(rows)})")
+        check(next(r for r in rows if r["url"].endswith("maks-1/"))["applications"] == ["kazan"],
+              "upsert mevcut zengin alanları korudu")
+        check(curated_kept(out), "elle düzenlenmiş kategori, açıklama ve ad sayfadan okunanla ezilmedi")
+        check(site.max_in_flight > 1, f"eşzamanlı çekim (en fazla {site.max_in_flight} istek aynı anda)")
+        observed = (len(site.started_at) - 1) / span
+        check(observed <= rate * 1.1, f"host başına hız sınırı ({observed:.0f} istek/s, sınır {rate:.0f})")
+        print(f"   {pages} sayfa {elapsed:.2f}s (sıralı + 0.3s uyku ile ~{pages * (site.delay + 0.3):.1f}s)")
+
+        site.reset_counters()
+        stats = ingest_links.ingest(links, out, state, workers=8, rate=rate)
+        check(stats["unchanged"] == pages and site.not_modified == pages, f"ikinci çalıştırma 304: {stats}")
+        check(sum(1 for _ in open(out, encoding="utf-8")) == pages, "ikinci çalıştırma satır çoğaltmadı")
+
+        site.version["/cozumler-urunler/su/kazan/maks-5/"] = 2
+        stats = ingest_links.ingest(links, out, state, workers=8, rate=rate)
+        changed = next(r for r in map(json.loads, open(out, encoding="utf-8")) if r["url"].endswith("maks-5/"))
+        check(stats["updated"] == 1 and stats["unchanged"] == pages - 1, f"yalnızca değişen sayfa güncellendi: {stats}")
+        check("sürüm 2" in changed["short_desc"], "güncel içerik yazıldı")
+
+        site.version[CURATED_PATH] = 2
+        ingest_links.ingest(links, out, state, workers=8, rate=rate)
+        ingest_links.ingest(links, out, state, workers=8, rate=rate, full=True)
+        check(curated_kept(out), "sayfa değişince ve --full ile yeniden çekilince elle düzenlenmiş satır korundu")
+        site.version["/cozumler-urunler/su/kazan/maks-5/"] = 3
+        ingest_links.ingest(links, out, state, workers=8, rate=rate, full=True)
+        changed = next(r for r in map(json.loads, open(out, encoding="utf-8")) if r["url"].endswith("maks-5/"))
+        check("sürüm 3" in changed["short_desc"], "--full ile sayfadan gelen içerik güncellendi")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
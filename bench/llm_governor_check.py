@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""LLM governor kontrolü: hata enjekte eden sahte OpenAI sunucusuna karşı
+governor kapalı / açık karşılaştırması.
+
+  kota       sunucu aynı anda `--capacity` isteği kabul eder, fazlasına 429 +
+             Retry-After döner; ani yükte AIMD sınırı kotaya iner, 429'lar
+             yeniden denenir
+  kesinti    sunucu yanıt vermez (gecikme > süre bütçesi); devre açılınca
+             kalan istekler beklemeden yedek yanıta düşer
+  toparlanma kesinti bitince soğuma sonrası tek deneme çağrısı devreyi kapatır,
+             ardından gelen istekler upstream'e gider
+  geçici     isteklerin bir kısmı 503 döner; yeniden denemeler çoğunu kurtarır,
+             toplam yeniden deneme bütçeyi aşmaz
+
+    python -m bench.llm_governor_check [--burst 60] [--capacity 4]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+from bench.stub_openai import StubState, run_in_thread
+
+PRODUCTS = [{"product_name": "MAKS 101", "category": "Su Şartlandırma", "applications": ["Soğutma kuleleri"],
+             "problems_solved": ["kireçlenme"], "key_params": ["pH 7-9"], "short_desc": "Kireç önleyici"}]
+
+
+def make_processor(governor: bool, **overrides):
+    from llm import LLMProcessor
+    from llm_governor import UpstreamGovernor
+
+    llm = LLMProcessor()
+    llm.governor = UpstreamGovernor(**overrides) if governor else None
+    return llm
+
+
+async def burst(llm, n: int, concurrency: int, timeout: Optional[float] = None) -> Dict:
+    """n isteği en fazla `concurrency` eşzamanlı gönder; sonuç ve süreleri topla"""
+    import metrics
+    from llm import FALLBACK_ANALYSIS
+
+    gate = asyncio.Semaphore(concurrency)
+    fallbacks_before = sum(metrics.LLM_FALLBACKS.value(reason=r) for r in FALLBACK_REASONS)
+
+    async def one(i: int):
+        async with gate:
+            start = time.perf_counter()
+            analysis = await llm.analyze_recommendations_async(f"istek {i}", PRODUCTS, timeout=timeout)
+            return time.perf_counter() - start, analysis["summary"] != FALLBACK_ANALYSIS["summary"]
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(n)))
+    wall = time.perf_counter() - started
+    await llm.aclose()
+    latencies = sorted(r[0] for r in results)
+    return {
+        "ok": sum(r[1] for r in results),
+        "n": n,
+        "wall": wall,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "fallbacks": sum(metrics.LLM_FALLBACKS.value(reason=r) for r in FALLBACK_REASONS) - fallbacks_before,
+    }
+
+
+FALLBACK_REASONS = ("timeout", "error", "circuit_open", "throttled")
+
+
+def row(name: str, r: Dict, state: StubState, extra: str = "") -> str:
+    return (f"  {name:<8} | başarılı {r['ok']:3d}/{r['n']:<3d} | p50 {r['p50'] * 1000:7.0f} ms | "
+            f"p95 {r['p95'] * 1000:7.0f} ms | toplam {r['wall']:5.1f} s | upstream {state.calls:3d} çağrı, "
+            f"429 {state.rate_limited:3d}, hata {state.errors:3d}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM governor kontrolü")
+    parser.add_argument("--burst", type=int, default=60, help="kota senaryosunda aynı anda gelen istek")
+    parser.add_argument("--capacity", type=int, default=4, help="sahte sunucunun eşzamanlı kota sınırı")
+    parser.add_argument("--latency", type=float, default=0.3, help="sahte LLM gecikmesi (saniye)")
+    parser.add_argument("--error-rate", type=float, default=0.15, help="geçici hata senaryosunda 503 oranı")
+    args = parser.parse_args()
+
+    state = StubState(args.latency, retry_after=0.5)
+    os.environ["OPENAI_BASE_URL"] = run_in_thread(state)
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+
+    import metrics
+
+    errors: List[str] = []
+    # Senaryolar kısa sürsün diye soğuma süreleri kısaltılır; diğer ayarlar varsayılan
+    tuned = dict(rate=50, burst=50, breaker_cooldown=1.0)
+
+    print(f"▶ Kota: {args.burst} eşzamanlı istek, sunucu kotası {args.capacity}, gecikme {args.latency}s")
+    results = {}
+    for name, governed in (("kapalı", False), ("açık", True)):
+        state.reset()
+        state.capacity = args.capacity
+        llm = make_processor(governed, **tuned)
+        results[name] = r = asyncio.run(burst(llm, args.burst, args.burst))
+        extra = f", son sınır {llm.governor.limiter.limit:.1f}" if llm.governor else ""
+        print(row(name, r, state, extra))
+        if state.max_in_flight > args.capacity:
+            errors.append("sahte sunucu kotayı aşan isteği işledi")
+    if results["açık"]["ok"] < 0.9 * args.burst:
+        errors.append(f"governor açıkken kota senaryosunda başarı düşük ({results['açık']['ok']}/{args.burst})")
+    state.capacity = 0
+
+    print("▶ Kesinti: sunucu yanıt vermiyor (gecikme 5s, bütçe 1s), 40 istek, 4 eşzamanlı")
+    state.latency = 5.0
+    outage = {}
+    for name, governed in (("kapalı", False), ("açık", True)):
+        state.reset()
+        llm = make_processor(governed, **tuned)
+        outage[name] = r = asyncio.run(burst(llm, 40, 4, timeout=1.0))
+        print(row(name, r, state, f", devre {llm.governor.breaker.state}" if llm.governor else ""))
+        if governed:
+            governed_llm = llm
+            if state.calls > 2 * governed_llm.governor.breaker.failure_threshold:
+                errors.append(f"devre açılmadı, kesintide {state.calls} upstream çağrısı yapıldı")
+    if outage["açık"]["wall"] > outage["kapalı"]["wall"] / 2:
+        errors.append("devre kesici kesinti süresini kısaltmadı")
+
+    print("▶ Toparlanma: kesinti bitti, soğuma sonrası yeni istekler")
+    state.latency = args.latency
+    state.reset()
+    breaker = governed_llm.governor.breaker
+    time.sleep(breaker.cooldown)
+    # Yarı açık devre tek deneme çağrısına izin verir; başarılı olunca trafik normale döner
+    probe = asyncio.run(burst(governed_llm, 1, 1))
+    r = asyncio.run(burst(governed_llm, 20, 4))
+    print(row("açık", r, state, f", devre {breaker.state}"))
+    if breaker.state != breaker.CLOSED or probe["ok"] != 1 or r["ok"] != 20:
+        errors.append(f"devre toparlanmadı ({breaker.state}, {r['ok']}/20)")
+
+    print(f"▶ Geçici hata: isteklerin %{args.error_rate * 100:.0f}'i 503, 200 istek, 10 eşzamanlı")
+    state.error_rate = args.error_rate
+    transient = {}
+    for name, governed in (("kapalı", False), ("açık", True)):
+        state.reset()
+        retries = metrics.LLM_RETRIES.value(reason="server_error")
+        llm = make_processor(governed, **tuned)
+        transient[name] = r = asyncio.run(burst(llm, 200, 10))
+        spent = metrics.LLM_RETRIES.value(reason="server_error") - retries
+        print(row(name, r, state, f", yeniden deneme {spent:.0f}" if governed else ""))
+        if governed:
+            budget = llm.governor.retry_budget
+            windows = r["wall"] / budget.window + 1
+            if spent > budget.ratio * r["n"] + budget.min_retries * windows:
+                errors.append(f"yeniden denemeler bütçeyi aştı ({spent:.0f})")
+    if transient["açık"]["ok"] <= transient["kapalı"]["ok"]:
+        errors.append("yeniden denemeler geçici hataları kurtarmadı")
+
+    if errors:
+        for e in errors:
+            print("❌", e)
+        sys.exit(1)
+    print("✅ Kota aşımı yeniden denemeyle karşılandı, devre kesinti boyunca kısa devre yaptı ve toparlandı")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""/api/recommend için eşzamanlılık yük testi.
+
+Sahte OpenAI sunucusunu başlatır, N isteği aynı anda ASGI uygulamasına gönderir
+ve LLM çağrılarının sırayla değil üst üste (overlap) çalıştığını doğrular.
+
+    python -m bench.load_recommend -n 20 --latency 1.0
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+from bench.stub_openai import StubState, run_in_thread
+
+PROMPTS = [
+    "ters osmoz membranında kireçlenme",
+    "kazan taşı oluşumu",
+    "soğutma kulesinde korozyon",
+    "şeker evaporatörü birikinti",
+    "soğutma suyunda mikroorganizma",
+]
+
+
+async def run(n: int, app) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        async def one(i: int):
+            start = time.perf_counter()
+            r = await client.post("/api/recommend", json={"prompt": PROMPTS[i % len(PROMPTS)]})
+            return start, time.perf_counter(), r.status_code
+
+        return await asyncio.gather(*(one(i) for i in range(n)))
+
+
+def max_overlap(spans: list) -> int:
+    events = sorted([(s, 1) for s, _, _ in spans] + [(e, -1) for _, e, _ in spans])
+    cur = best = 0
+    for _, d in events:
+        cur += d
+        best = max(best, cur)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/api/recommend eşzamanlılık testi")
+    parser.add_argument("-n", type=int, default=20, help="eşzamanlı istek sayısı")
+    parser.add_argument("--latency", type=float, default=1.0, help="sahte LLM gecikmesi (saniye)")
+    args = parser.parse_args()
+
+    state = StubState(args.latency)
+    os.environ["OPENAI_BASE_URL"] = run_in_thread(state)
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    # Önbellek / istek birleştirme açık olursa tekrarlayan promptlar LLM'e hiç gitmez; burada upstream eşzamanlılığı ölçülüyor
+    os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+    os.environ.setdefault("QUERY_CACHE_SIZE", "0")
+    os.environ.setdefault("LLM_GOVERNOR_ENABLED", "0")
+    os.environ.setdefault("COALESCE_ENABLED", "0")
+
+    import main as app_module
+    # ASGITransport lifespan çalıştırmaz: indeks ve LLM istemcisi burada kurulur
+    app_module.warm_up()
+
+    t0 = time.perf_counter()
+    spans = asyncio.run(run(args.n, app_module.app))
+    wall = time.perf_counter() - t0
+
+    ok = sum(1 for *_, code in spans if code == 200)
+    serial = args.n * args.latency
+    print(f"İstek: {args.n} | başarılı: {ok} | toplam süre: {wall:.2f}s | sıralı olsaydı: ~{serial:.2f}s")
+    print(f"İstemci tarafı en fazla üst üste istek: {max_overlap(spans)} | stub'da en fazla eşzamanlı LLM çağrısı: {state.max_in_flight}")
+
+    if ok != args.n or state.max_in_flight < min(args.n, 2) or wall >= serial:
+        print("❌ İstekler üst üste çalışmadı")
+        sys.exit(1)
+    print("✅ LLM çağrıları eşzamanlı çalıştı")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""pdf_extract_links.py için klasör modu kontrolü.
+
+Örnek katalogdan çoğaltılmış PDF'lerle geçici bir klasör kurulur. Doğrulananlar:
+filtrelenen bağlantıların eski iki geçişli yöntemle aynı olması, paralel ve
+sıralı çıkarımın aynı sonucu vermesi, ikinci çalıştırmada hiçbir PDF'in
+ayrıştırılmaması ve çıktı dosyasına tekrarlı satır yazılmaması.
+
+    python -m bench.pdf_links_check [--copies 6] [--repeat 20] [--workers 4]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+from pypdf import PdfReader, PdfWriter
+
+import pdf_extract_links as pel
+
+
+def legacy_extract(path: str):
+    """Değişiklik öncesi extract_urls_from_pdf: tüm sayfalarda önce link nesneleri, sonra metin.
+
+    Eski kod dolaylı URI nesnelerini çözmediği için keep_url tüm link nesnelerini
+    eliyordu; karşılaştırma anlamlı olsun diye burada çözülür.
+    """
+    reader = PdfReader(path)
+    urls = set()
+    for page in reader.pages:
+        if "/Annots" in page:
+            for annot in page["/Annots"]:
+                try:
+                    uri = annot.get_object().get("/A", {}).get("/URI")
+                    if uri:
+                        urls.add(str(uri.get_object()))
+                except Exception:
+                    continue
+    url_re = re.compile(r"https?://[\w\-\.\/%\?=&#:+~]+", re.IGNORECASE)
+    for page in reader.pages:
+        try:
+            urls.update(url_re.findall(page.extract_text() or ""))
+        except Exception:
+            continue
+    return urls
+
+
+def build_catalogs(src: str, out_dir: str, copies: int, repeat: int):
+    """Kaynak PDF'in sayfalarını repeat kez tekrarlayan copies adet PDF (her biri farklı içerik)"""
+    reader = PdfReader(src)
+    for c in range(copies):
+        writer = PdfWriter()
+        for _ in range(repeat):
+            for page in reader.pages:
+                writer.add_page(page)
+        writer.add_metadata({"/Title": f"katalog {c}"})
+        sub = os.path.join(out_dir, "alt" if c % 2 else "")
+        os.makedirs(sub, exist_ok=True)
+        with open(os.path.join(sub, f"katalog_{c}.pdf"), "wb") as f:
+            writer.write(f)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF bağlantı çıkarımı kontrolü")
+    parser.add_argument("--pdf", default=pel.PDF_PATH)
+    parser.add_argument("--copies", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=20, help="PDF başına kaynak sayfaların tekrar sayısı")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    errors = []
+    old = {u for u in legacy_extract(args.pdf) if pel.keep_url(u)}
+    new = {u for u in pel.extract_urls_from_pdf(args.pdf) if pel.keep_url(u)}
+    print(f"örnek PDF: eski {len(old)} | yeni {len(new)} filtrelenmiş bağlantı")
+    if old != new:
+        errors.append(f"eski yöntemle fark: {len(old ^ new)} bağlantı")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_dir = os.path.join(tmp, "pdfs")
+        build_catalogs(args.pdf, pdf_dir, args.copies, args.repeat)
+        pdfs = pel.find_pdfs([pdf_dir])
+        pages = sum(len(PdfReader(p).pages) for p in pdfs)
+        print(f"▶ {len(pdfs)} PDF, {pages} sayfa")
+
+        _, t_old = timed(lambda: [legacy_extract(p) for p in pdfs])
+        (seq, _), t_seq = timed(lambda: pel.extract_from_paths(pdfs, {}, workers=1))
+        cache = {}
+        (par, stats), t_par = timed(lambda: pel.extract_from_paths(pdfs, cache, workers=args.workers))
+        (again, stats2), t_again = timed(lambda: pel.extract_from_paths(pdfs, cache, workers=args.workers))
+        print(f"  eski iki geçiş      {t_old:7.2f} s")
+        print(f"  tek geçiş (sıralı)  {t_seq:7.2f} s")
+        print(f"  tek geçiş ({args.workers} süreç) {t_par:7.2f} s | ayrıştırılan: {stats['parsed']}")
+        print(f"  ikinci çalıştırma   {t_again:7.2f} s | önbellekten: {stats2['cached']}, ayrıştırılan: {stats2['parsed']}")
+        if seq != par or par != again:
+            errors.append("sıralı, paralel ve önbellekli sonuçlar farklı")
+        if stats2["parsed"] or stats2["cached"] != len(pdfs):
+            errors.append("değişmeyen PDF'ler yeniden ayrıştırıldı")
+
+        out = os.path.join(tmp, "links.txt")
+        kept = [u for p in pdfs for u in par[p] if pel.keep_url(u)]
+        first = pel.write_links(iter(kept), out)
+        second = pel.write_links(iter(kept), out)
+        with open(out, encoding="utf-8") as f:
+            lines = [line.strip() for line in f if line.strip()]
+        print(f"  çıktı: {first} eklendi, tekrar çalıştırmada {second}")
+        if second or len(lines) != len(set(lines)) or set(lines) != old:
+            errors.append("çıktı dosyasında tekrar veya eksik bağlantı")
+
+    if errors:
+        for e in errors:
+            print("❌", e)
+        sys.exit(1)
+    print("✅ Bağlantılar aynı, önbellek ve tekrarsız yazma çalışıyor")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Ürün listesinin bellek maliyeti: dict listesi ve sütunlu depo (ProductStore).
+
+Her boyut için sentetik katalog yüklenir; tracemalloc ile tutulan bellek,
+mmap ile açılan deponun süreç başına ek yükü ve ilk k sonucun çözülme
+süresi ölçülür.
+
+    python -m bench.product_memory --sizes 10000 100000
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Tuple
+
+from bench.catalog import write_catalog
+
+
+def traced(fn: Callable[[], Any]) -> Tuple[Any, int]:
+    """fn()'in döndürdüğü nesnenin tuttuğu bellek (geçici ayırmalar hariç)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        value = fn()
+        gc.collect()
+        return value, tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+
+
+def measure(size: int, tmp: str) -> Dict[str, Any]:
+    from product_store import ProductStore
+
+    path = write_catalog(os.path.join(tmp, f"products_{size}.jsonl"), size)
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    dicts, dict_bytes = traced(lambda: [json.loads(line) for line in lines])
+    store, store_bytes = traced(lambda: ProductStore.from_dicts(dicts))
+    assert store.to_dict(size // 2) == dicts[size // 2]
+
+    store_dir = os.path.join(tmp, f"store_{size}")
+    os.makedirs(store_dir)
+    store.save(store_dir)
+    # mmap: dizi verisi sayfa önbelleğinde, worker'lar arasında paylaşılır
+    mapped, mapped_bytes = traced(lambda: ProductStore.load(store_dir))
+
+    picks = [(i * 7919) % size for i in range(3000)]
+    t0 = time.perf_counter()
+    for i in picks:
+        mapped.to_dict(i)
+    decode_us = (time.perf_counter() - t0) / len(picks) * 1e6
+    return {
+        "products": size,
+        "dicts_mb": dict_bytes / 2 ** 20,
+        "store_mb": store_bytes / 2 ** 20,
+        "mmap_private_mb": mapped_bytes / 2 ** 20,
+        "arrays_mb": store.nbytes() / 2 ** 20,
+        "decode_us": decode_us,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ürün deposu bellek ölçümü")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            r = measure(size, tmp)
+            print(f"▶ {size} ürün")
+            print(f"  dict listesi     {r['dicts_mb']:8.1f} MB")
+            print(f"  sütunlu depo     {r['store_mb']:8.1f} MB ({r['dicts_mb'] / r['store_mb']:.1f}x daha az)")
+            print(f"  mmap ile açılan  {r['mmap_private_mb']:8.2f} MB süreç başına "
+                  f"(+{r['arrays_mb']:.1f} MB paylaşılan sayfa)")
+            print(f"  ürün çözme       {r['decode_us']:8.1f} µs / ürün (to_dict)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Prompt raporu: eski prompt oluşturma ile token bütçeli PromptBuilder'ın
+sahte OpenAI sunucusuna karşı karşılaştırması.
+
+Her iki mod da aynı arama sonuçlarıyla (top 3) aynı istekleri gönderir. Sahte
+sunucunun gecikmesi token sayısına bağlıdır (sabit + prefill * prompt token +
+decode * completion token). JSON modu istenmeyen yanıtların bir kısmı
+```json ... ``` içinde döner (gpt-4o-mini'nin JSON modu kapalıyken sık yaptığı gibi).
+
+  kısa      sentetik katalog, normal açıklamalar
+  uzun      aynı ürünler, PDF'ten gelmiş gibi ~1500 karakterlik açıklamalarla
+
+Raporlanan: ortalama prompt / completion token (sunucunun usage alanı ve
+yerel tahmin), ortalama ve p95 gecikme, ham yanıtın JSON olarak okunamama
+oranı, bütçe aşımı. Son olarak LLM analiz önbelleği anahtarının model, prompt sürümü
+ve aynı URL'deki ürün metni değişince değiştiği kontrol edilir.
+
+    python -m bench.prompt_report [--requests 100] [--products 2000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from bench.catalog import sample_queries, write_catalog
+from bench.stub_openai import StubState, run_in_thread
+
+# Değişiklik öncesi llm.py'deki prompt ve istek parametreleri (karşılaştırma referansı)
+LEGACY_SYSTEM_PROMPT = """Sen bir kimya şirketi için ürün öneren uzman asistanısın.
+Müşterinin ihtiyacına göre önerilen ürünleri analiz et ve yapılandırılmış bir yanıt ver.
+
+Yanıtını şu JSON formatında ver:
+{
+    "summary": "Müşterinin ihtiyacının kısa özeti ve önerilen çözüm",
+    "safety": "Güvenlik uyarıları ve dikkat edilmesi gerekenler",
+    "follow_up": "Sonraki adımlar ve öneriler"
+}
+
+Önemli noktalar:
+- Teknik terimleri açıkla
+- Güvenlik konularına özel dikkat göster
+- Pratik öneriler ver
+- Türkçe yanıt ver
+"""
+
+
+def legacy_messages(prompt: str, products: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    products_text = ""
+    for i, product in enumerate(products, 1):
+        products_text += f"""
+Ürün {i}: {product['product_name']}
+Kategori: {product['category']}
+Uygulamalar: {', '.join(product['applications'])}
+Çözülen Problemler: {', '.join(product['problems_solved'])}
+Önemli Parametreler: {', '.join(product['key_params'])}
+Kısa Açıklama: {product['short_desc']}
+"""
+    user_prompt = f"""
+Müşteri İhtiyacı: {prompt}
+
+Önerilen Ürünler:
+{products_text}
+
+Lütfen bu ürünleri analiz et ve yukarıdaki formatta yanıt ver.
+"""
+    return [{"role": "system", "content": LEGACY_SYSTEM_PROMPT}, {"role": "user", "content": user_prompt}]
+
+
+def make_processors():
+    from llm import LLMProcessor
+
+    class Recording(LLMProcessor):
+        """Gönderilen mesajları ve ham yanıtları saklar"""
+
+        def __init__(self):
+            super().__init__()
+            self.governor = None
+            self.sent: List[List[Dict[str, str]]] = []
+            self.raw: List[str] = []
+
+        async def _complete(self, messages: List[Dict[str, str]]) -> str:
+            self.sent.append(messages)
+            content = await super()._complete(messages)
+            self.raw.append(content)
+            return content
+
+    class Legacy(Recording):
+        def _build_messages(self, prompt, products):
+            return legacy_messages(prompt, products)
+
+        def _payload(self, messages, stream=False):
+            return {"model": self.model, "messages": messages, "temperature": 0.7, "max_tokens": 1000}
+
+    return {"eski": Legacy(), "yeni": Recording()}
+
+
+async def run_mode(llm, requests: List[tuple], concurrency: int) -> List[float]:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(prompt, products):
+        async with gate:
+            start = time.perf_counter()
+            await llm.analyze_recommendations_async(prompt, products)
+            return time.perf_counter() - start
+
+    latencies = await asyncio.gather(*(one(p, prods) for p, prods in requests))
+    await llm.aclose()
+    return list(latencies)
+
+
+def raw_json_ok(content: str) -> bool:
+    try:
+        return isinstance(json.loads(content), dict)
+    except json.JSONDecodeError:
+        return False
+
+
+def report(name: str, llm, latencies: List[float], usage: Dict[str, float], budget: int) -> Dict[str, float]:
+    from prompt_builder import count_tokens
+
+    n = len(latencies)
+    estimates = [sum(count_tokens(m["content"]) for m in messages) for messages in llm.sent]
+    prefixes = {messages[0]["content"] for messages in llm.sent}
+    row = {
+        "prompt": usage["prompt"] / n,
+        "estimate": statistics.mean(estimates),
+        "completion": usage["completion"] / n,
+        "mean": statistics.mean(latencies),
+        "p95": sorted(latencies)[int(0.95 * (n - 1))],
+        "not_json": sum(not raw_json_ok(c) for c in llm.raw) / n,
+        "over_budget": sum(e > budget for e in estimates) / n,
+    }
+    print(f"  {name:<5} | prompt {row['prompt']:6.0f} tok (tahmin {row['estimate']:6.0f}) | completion "
+          f"{row['completion']:4.0f} tok | gecikme ort. {row['mean'] * 1000:5.0f} ms, p95 {row['p95'] * 1000:5.0f} ms | "
+          f"ham JSON değil {row['not_json']:5.1%} | bütçe aşımı {row['over_budget']:5.1%} | "
+          f"farklı sistem öneki {len(prefixes)}")
+    return row
+
+
+def check_cache_key(products: List[Dict[str, Any]]) -> List[str]:
+    """Eski promptla / başka modelle / eski ürün metniyle üretilmiş analiz önbellekten dönmemeli"""
+    import llm
+    from cache import analysis_key
+
+    processor = llm.LLMProcessor()
+    key = analysis_key("Kazan taşı sorunu", products, processor.cache_version)
+    changed = dict(products[0], short_desc=str(products[0].get("short_desc") or "") + " (güncellendi)")
+    version = llm.PROMPT_VERSION
+    llm.PROMPT_VERSION = version + 1
+    try:
+        newer_prompt = llm.LLMProcessor().cache_version
+    finally:
+        llm.PROMPT_VERSION = version
+    cases = {
+        "aynı prompt (büyük harf, noktalama)": (analysis_key("KAZAN TAŞI SORUNU?", products, processor.cache_version), True),
+        "prompt sürümü": (analysis_key("Kazan taşı sorunu", products, newer_prompt), False),
+        "model": (analysis_key("Kazan taşı sorunu", products, processor.cache_version.replace(
+            processor.model, processor.model + "-yeni")), False),
+        "aynı URL'de ürün metni": (analysis_key("Kazan taşı sorunu", [changed] + products[1:],
+                                                processor.cache_version), False),
+    }
+    errors = []
+    print(f"▶ analiz önbelleği anahtarı ({processor.cache_version}):")
+    for name, (other, same) in cases.items():
+        ok = (other == key) == same
+        print(f"  {name:<36} {'aynı' if other == key else 'farklı'} anahtar {'✓' if ok else '✗'}")
+        if not ok:
+            errors.append(f"analiz önbelleği anahtarı: {name} {'eşleşmedi' if same else 'eşleşti'}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt token/gecikme raporu")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="sabit gecikme (saniye)")
+    parser.add_argument("--prefill", type=float, default=0.0002, help="prompt token başına gecikme (saniye)")
+    parser.add_argument("--decode", type=float, default=0.01, help="completion token başına gecikme (saniye)")
+    parser.add_argument("--fence-rate", type=float, default=0.3, help="JSON modu kapalıyken ```json``` oranı")
+    args = parser.parse_args()
+
+    state = StubState(args.latency, prefill=args.prefill, decode=args.decode, fence_rate=args.fence_rate)
+    os.environ["OPENAI_BASE_URL"] = run_in_thread(state)
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    os.environ["LLM_GOVERNOR_ENABLED"] = "0"
+
+    import metrics
+    from search import ProductSearch
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_catalog(os.path.join(tmp, "products.jsonl"), args.products)
+        search = ProductSearch(path, index_dir=None, query_cache_size=0)
+        queries = sample_queries(args.requests, seed=5)
+        short = [(q, search.search(q, top_k=3)) for q in queries]
+    long_desc = [(q, [dict(p, short_desc=(p["short_desc"] + " ") * 20) for p in prods]) for q, prods in short]
+
+    errors: List[str] = []
+    for scenario, requests in (("kısa", short), ("uzun", long_desc)):
+        print(f"▶ {scenario} açıklamalar: {len(requests)} istek, {args.concurrency} eşzamanlı, "
+              f"stub {args.latency}s + {args.prefill * 1000:.2f} ms/prompt tok + {args.decode * 1000:.0f} ms/completion tok")
+        rows = {}
+        for name, llm in make_processors().items():
+            before = {k: metrics.LLM_TOKENS.value(kind=k) for k in ("prompt", "completion")}
+            latencies = asyncio.run(run_mode(llm, requests, args.concurrency))
+            usage = {k: metrics.LLM_TOKENS.value(kind=k) - v for k, v in before.items()}
+            rows[name] = report(name, llm, latencies, usage, llm.prompt_builder.budget)
+        saved = 1 - rows["yeni"]["prompt"] / rows["eski"]["prompt"]
+        print(f"  prompt token tasarrufu {saved:.0%}, ortalama gecikme "
+              f"{(rows['eski']['mean'] - rows['yeni']['mean']) * 1000:+.0f} ms")
+        if rows["yeni"]["prompt"] >= rows["eski"]["prompt"]:
+            errors.append(f"{scenario}: yeni prompt daha kısa değil")
+        if rows["yeni"]["over_budget"] or rows["yeni"]["not_json"]:
+            errors.append(f"{scenario}: bütçe aşıldı ya da JSON dışı yanıt geldi")
+
+    from prompt_builder import PROMPT_CACHE_MIN_TOKENS, PromptBuilder
+
+    builder = PromptBuilder.from_env()
+    print(f"▶ sistem öneki {builder.system_tokens} token, bütçe {builder.budget} token; OpenAI prompt önbelleği "
+          f"{PROMPT_CACHE_MIN_TOKENS}+ tokenlık promptlarda çalışır -> "
+          f"{'devreye girebilir' if builder.budget >= PROMPT_CACHE_MIN_TOKENS else 'bu bütçede devreye girmez'}")
+
+    errors.extend(check_cache_key(short[0][1]))
+    if errors:
+        for e in errors:
+            print("❌", e)
+        sys.exit(1)
+    print("✅ Prompt bütçe içinde, yanıtlar JSON modunda, analiz önbelleği prompt / model / ürün metnine bağlı")
+
+
+if __name__ == "__main__":
+    main()
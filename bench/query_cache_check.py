@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Anlamsal sorgu önbelleği: isabet oranı, isabetlerin doğruluğu ve gecikme.
+
+Sentetik katalogda, az sayıda temel sorgunun yeniden ifade edilmiş (ek, sıra,
+büyük harf, dolgu kelime farkı) hallerinden oluşan bir trafik üretilir. Her
+eşik için isabet oranı ve önbellekten dönen sonuçların taze aramayla ne kadar
+örtüştüğü raporlanır. Ardından LRU sınırı ve indeks yenilenince önbelleğin
+boşaltılması doğrulanır. Yalnızca ürün kodunda ayrılan sorguların ("MAKS 1234" /
+"MAKS 2345") birbirinin sonucunu almadığı da kontrol edilir.
+
+    python -m bench.query_cache_check --products 20000 --requests 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from typing import List
+
+from bench.catalog import sample_queries, write_catalog
+from bench.search_latency import percentiles, time_queries
+
+SUFFIXES = {"kireçlenme": "kireçlenmesi", "korozyon": "korozyonu", "biyofilm": "biyofilmi",
+            "kazanları": "kazanlarında", "kuleleri": "kulelerinde", "sistemleri": "sistemlerinde"}
+FILLERS = ["sorunu", "için", "ürün", "önerisi", "yaşıyoruz", "çözümü"]
+
+
+def paraphrase(query: str, rng: random.Random) -> str:
+    words = query.split()
+    if rng.random() < 0.5:
+        words = [SUFFIXES.get(w, w) for w in words]
+    if rng.random() < 0.3:
+        rng.shuffle(words)
+    if rng.random() < 0.5:
+        words.append(rng.choice(FILLERS))
+    text = " ".join(words)
+    return text.upper() if rng.random() < 0.2 else text
+
+
+def workload(n: int, bases: int, seed: int = 11) -> List[str]:
+    """Zipf benzeri dağılım: popüler sorgular daha sık, her seferinde farklı ifade"""
+    rng = random.Random(seed)
+    base = sample_queries(bases, seed=seed)
+    weights = [1 / (i + 1) for i in range(bases)]
+    return [paraphrase(q, rng) for q in rng.choices(base, weights=weights, k=n)]
+
+
+def urls(results) -> List[str]:
+    return [r["url"] for r in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anlamsal sorgu önbelleği kontrolü")
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--bases", type=int, default=200, help="farklı temel sorgu sayısı")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.9, 0.95, 0.99])
+    args = parser.parse_args()
+
+    import metrics
+    from bm25_index import product_codes
+    from query_cache import QUERY_CACHE_THRESHOLD, QueryCache
+    from search import ProductSearch
+
+    errors = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_catalog(os.path.join(tmp, "products.jsonl"), args.products)
+        search = ProductSearch(path, index_dir=None)
+        queries = workload(args.requests, args.bases)
+        fresh = {q: urls(search._search(search.snapshot, q, 3, None)) for q in dict.fromkeys(queries)}
+
+        print(f"▶ {args.products} ürün, {args.requests} istek ({len(fresh)} farklı metin, {args.bases} temel sorgu)")
+        print(f"  {'eşik':>5} | {'isabet':>7} | {'ilk sonuç aynı':>14} | {'ilk 3 örtüşme':>13}")
+        for threshold in args.thresholds:
+            search.snapshot.query_cache = QueryCache(1024, threshold)
+            hits = top1 = overlap = 0
+            before = metrics.QUERY_CACHE_LOOKUPS.value(result="hit")
+            for q in queries:
+                got = urls(search.search(q))
+                now = metrics.QUERY_CACHE_LOOKUPS.value(result="hit")
+                if now > before:
+                    hits += 1
+                    top1 += got[:1] == fresh[q][:1]
+                    overlap += len(set(got) & set(fresh[q])) / max(1, len(fresh[q]))
+                before = now
+            print(f"  {threshold:5.2f} | {hits / len(queries):7.1%} | {top1 / max(1, hits):14.1%} | "
+                  f"{overlap / max(1, hits):13.1%}")
+            if threshold == QUERY_CACHE_THRESHOLD and top1 / max(1, hits) < 0.95:
+                errors.append(f"varsayılan eşikte isabetlerin ilk sonucu taze aramadan farklı ({top1}/{hits})")
+
+        # Yalnızca sözlük dışı terimde (ürün kodu) ayrılan sorgular birbirinin sonucunu almamalı:
+        # TF-IDF sözlüğü sınırlı olduğundan "MAKS 1234" ile "MAKS 2345" aynı vektöre düşer
+        names = [p["product_name"] for p in search.products]
+        codes = list(dict.fromkeys(c for n in names for c in product_codes(n)))[:100]
+        code_queries = [f"MAKS {c[4:]}" for c in codes if c.startswith("maks")]
+        search.snapshot.query_cache = QueryCache()
+        wrong = sum(urls(search.search(q)) != urls(search._search(search.snapshot, q, 3, None))
+                    for q in code_queries)
+        print(f"  ürün kodu sorguları: {len(code_queries)} sorgu, önbellekten yanlış sonuç {wrong}")
+        if wrong:
+            errors.append(f"yalnızca ürün kodu farklı sorgular önbellekte çakıştı ({wrong}/{len(code_queries)})")
+
+        # Gecikme: önbelleksiz, isabet ve ıska ayrı ölçülür
+        search.snapshot.query_cache = None
+        p50_off, p99_off = percentiles(time_queries(search.search, queries[:300], rounds=1))
+        search.snapshot.query_cache = QueryCache()
+        misses = list(dict.fromkeys(queries))[:300]
+        p50_miss, _ = percentiles(time_queries(search.search, misses, rounds=1))
+        p50_hit, p99_hit = percentiles(time_queries(search.search, misses, rounds=1))
+        print(f"  önbelleksiz p50 {p50_off:.3f} ms (p99 {p99_off:.3f}) | ıska p50 {p50_miss:.3f} ms | "
+              f"isabet p50 {p50_hit:.3f} ms (p99 {p99_hit:.3f})")
+
+        # LRU sınırı
+        small = search.snapshot.query_cache = QueryCache(max_entries=16)
+        evicted = metrics.QUERY_CACHE_EVICTIONS.value()
+        for q in misses[:200]:
+            search.search(q)
+        print(f"  LRU: {len(small)} kayıt (sınır 16), {metrics.QUERY_CACHE_EVICTIONS.value() - evicted:.0f} tahliye")
+        if len(small) > 16:
+            errors.append("önbellek sınırı aşıldı")
+
+        # İndeks yenilenince eski sonuçlar dönmemeli
+        invalidated = metrics.QUERY_CACHE_INVALIDATIONS.value()
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"product_name": "MAKS 999 YENİ", "url": "https://www.bimakskimya.com.tr/cozumler-urunler/a/b/maks-999/"}\n')
+        search.reload()
+        old_cache = small
+        if len(old_cache) or metrics.QUERY_CACHE_INVALIDATIONS.value() != invalidated + 1:
+            errors.append("yeniden yüklemede önbellek boşaltılmadı")
+        if search.snapshot.query_cache is None or len(search.snapshot.query_cache):
+            errors.append("yeni indeks boş önbellekle başlamadı")
+        print(f"  yenileme sonrası: eski önbellek {len(old_cache)} kayıt, yeni {len(search.snapshot.query_cache)} kayıt")
+        print(f"  /api/cache/stats: {search.query_cache_stats()}")
+
+    if errors:
+        for e in errors:
+            print("❌", e)
+        sys.exit(1)
+    print("✅ Önbellek isabetleri taze aramayla uyumlu, LRU ve geçersizleştirme çalışıyor")
+
+
+if __name__ == "__main__":
+    main()
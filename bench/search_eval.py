@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Etiketli Türkçe sorgu seti üzerinde arama isabeti ve analizci maliyeti.
+
+Her sorgu için ilgili ürünler URL'ye uyan bir regex ile etiketlenir
+(bench/queries_tr.jsonl). Mevcut Türkçe analizcili arama, eski
+(str.lower + varsayılan token deseni) TF-IDF ile karşılaştırılır.
+
+    python -m bench.search_eval [--data data/products.jsonl] [--k 3] [--queries bench/queries_intent.jsonl]
+
+queries_intent.jsonl ihtiyacı ürün metninde geçmeyen kelimelerle anlatan
+sorgulardır (borularda kireç -> antiskalant); dense motoru için.
+embedding.CONCEPTS bu sorgulara bakılarak yazıldığından genelleme
+queries_intent_holdout.jsonl (ona bakmadan yazılmış) ile ölçülür.
+"""
+import argparse
+import json
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+QUERIES_FILE = os.path.join(os.path.dirname(__file__), "queries_tr.jsonl")
+
+
+def load_queries(path: str = QUERIES_FILE) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def legacy_ranker(search, k: int) -> Callable[[str], List[str]]:
+    """Analizci öncesi davranış: str.lower() + sklearn varsayılan token deseni"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    products = search.products
+    texts = [t.lower() for t in search._search_texts(products)]
+    vectorizer = TfidfVectorizer(max_features=1000, ngram_range=(1, 2))
+    matrix = vectorizer.fit_transform(texts)
+
+    def rank(query: str) -> List[str]:
+        scores = (vectorizer.transform([query.lower()]) @ matrix.T).toarray().ravel()
+        order = np.lexsort((np.arange(len(scores)), -scores))
+        return [products[i].get("url", "") for i in order[:k] if scores[i] > 0]
+
+    return rank
+
+
+def evaluate(rank: Callable[[str], List[str]], queries: List[Dict[str, Any]], urls: List[str], k: int) -> Dict[str, float]:
+    """recall@k: ilk k sonuçtaki ilgili ürünler / min(k, katalogdaki ilgili ürün sayısı)"""
+    recalls, hits, misses = [], 0, []
+    for item in queries:
+        pattern = re.compile(item["relevant"])
+        n_relevant = sum(1 for u in urls if pattern.search(u))
+        if not n_relevant:
+            continue
+        found = sum(1 for u in rank(item["query"]) if pattern.search(u))
+        recalls.append(found / min(k, n_relevant))
+        hits += found > 0
+        if not found:
+            misses.append(item["query"])
+    return {"queries": len(recalls), "recall": float(np.mean(recalls)) if recalls else 0.0,
+            "hit_rate": hits / len(recalls) if recalls else 0.0, "misses": misses}
+
+
+def analyzer_cost(queries: List[str], rounds: int = 200) -> Dict[str, float]:
+    """Sorgu başına analiz süresi (µs): eski regex+lower, önbelleksiz ve önbellekli analizci"""
+    from text_analysis import TOKEN_PATTERN, TurkishAnalyzer
+
+    token_re = re.compile(TOKEN_PATTERN)
+
+    def per_query(fn) -> float:
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for q in queries:
+                fn(q)
+        return (time.perf_counter() - t0) / (rounds * len(queries)) * 1e6
+
+    legacy = per_query(lambda q: token_re.findall(q.lower()))
+    cold = per_query(TurkishAnalyzer(cache_size=0).analyze)
+    warm_analyzer = TurkishAnalyzer()
+    warm = per_query(warm_analyzer.analyze)
+    info = warm_analyzer.cache_info()
+    return {"legacy_us": legacy, "uncached_us": cold, "cached_us": warm,
+            "cache_hit_rate": info.hits / max(1, info.hits + info.misses)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Etiketli sorgularla arama isabeti ölçümü")
+    parser.add_argument("--data", default=os.path.join("data", "products.jsonl"))
+    parser.add_argument("--queries", default=QUERIES_FILE)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    from search import DEFAULT_BACKEND, SEARCH_BACKENDS, ProductSearch
+
+    # Yoğun vektörler de kurulsun (dense motoru); önbellek motorlar arasında sonuç taşımasın
+    search = ProductSearch(args.data, index_dir=None, backend="dense", query_cache_size=0)
+    queries = load_queries(args.queries)
+    urls = [p.get("url", "") for p in search.products]
+
+    legacy = evaluate(legacy_ranker(search, args.k), queries, urls, args.k)
+    print(f"\n{legacy['queries']} etiketli sorgu, k={args.k}")
+    print(f"eski analiz (tfidf) recall@{args.k}: {legacy['recall']:.3f} | isabet: {legacy['hit_rate']:.3f}")
+    # Aynı anlık görüntü üzerinde sıralama motorları karşılaştırılır
+    configured = os.getenv("SEARCH_BACKEND", DEFAULT_BACKEND)
+    for backend in SEARCH_BACKENDS:
+        search.backend = backend
+        result = evaluate(lambda q: [r["url"] for r in search.search(q, top_k=args.k)], queries, urls, args.k)
+        marker = " (varsayılan)" if backend == configured else ""
+        print(f"{backend:<19} recall@{args.k}: {result['recall']:.3f} | isabet: {result['hit_rate']:.3f}{marker}")
+        if result["misses"]:
+            print("   ℹ️ Bulunamayanlar:", ", ".join(result["misses"]))
+    search.backend = configured
+
+    cost = analyzer_cost([q["query"] for q in queries])
+    print(f"\nAnaliz maliyeti / sorgu: eski {cost['legacy_us']:.1f} µs | "
+          f"önbelleksiz {cost['uncached_us']:.1f} µs | önbellekli {cost['cached_us']:.1f} µs "
+          f"(token önbellek isabeti {cost['cache_hit_rate']:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""ProductSearch.search için p50/p99 sorgu gecikmesi mikrobenchmark'ı.
+
+Sentetik katalog üzerinde mevcut motoru, eski (yoğun cosine_similarity +
+üç kez tam argsort) yöntemle karşılaştırır. Ardından her sıralama motorunda
+search_batch'in (filtresiz ve filtreli) sorgu başına süresi ölçülür; sonuçları
+tek tek aramayla birebir aynı olmalıdır.
+
+    python -m bench.search_latency --products 100000 --queries 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench.catalog import write_catalog, sample_queries
+
+
+def legacy_search(search, query: str, top_k: int = 3):
+    """Değişiklik öncesi arama yolu (karşılaştırma için)"""
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    query_vector = search.vectorizer.transform([query.lower()])
+    similarities = cosine_similarity(query_vector, search.product_vectors).flatten()
+    top_indices = np.argsort(similarities)[::-1][:max(top_k * 5, top_k)]
+    results = []
+    for idx in top_indices:
+        if similarities[idx] > 0:
+            product = dict(search.products[idx])
+            if search._is_valid_product(product):
+                product['similarity_score'] = float(similarities[idx])
+                product['reason'] = search._reason(product, query, product['similarity_score'])
+                results.append(product)
+        if len(results) >= top_k:
+            break
+    return results
+
+
+def percentiles(samples):
+    arr = np.array(samples) * 1000
+    return np.percentile(arr, 50), np.percentile(arr, 99)
+
+
+def time_queries(fn, queries, rounds: int = 3):
+    samples = []
+    for _ in range(rounds):
+        for q in queries:
+            t0 = time.perf_counter()
+            fn(q)
+            samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def batch_report(search, queries, batch_size: int = 64) -> int:
+    """Motor ve filtre başına tekli / toplu arama süresi; sonucu farklı sorgu sayısını döndürür"""
+    queries = list(dict.fromkeys(queries))
+    first = search.products[0]
+    wrong = 0
+    for backend in ("tfidf", "bm25", "hybrid"):
+        search.backend = backend
+        for filters in (None, {"category": [first["category"]]}):
+            search.search_batch(queries[:batch_size], filters=filters)
+            t0 = time.perf_counter()
+            single = [search.search(q, filters=filters) for q in queries]
+            t1 = time.perf_counter()
+            batch = [r for i in range(0, len(queries), batch_size)
+                     for r in search.search_batch(queries[i:i + batch_size], filters=filters)]
+            t2 = time.perf_counter()
+            diff = sum([r["url"] for r in a] != [r["url"] for r in b] for a, b in zip(single, batch))
+            wrong += diff
+            label = "filtreli" if filters else "filtresiz"
+            print(f"  {backend:<6} {label:<9} tekli {(t1 - t0) / len(queries) * 1000:6.3f} ms/sorgu | "
+                  f"toplu ({batch_size}) {(t2 - t1) / len(queries) * 1000:6.3f} ms/sorgu | farklı sonuç {diff}")
+    search.backend = "hybrid"
+    return wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arama gecikmesi mikrobenchmark'ı")
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--no-legacy", action="store_true", help="eski yöntemi ölçme")
+    args = parser.parse_args()
+
+    from search import ProductSearch
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_catalog(os.path.join(tmp, "products.jsonl"), args.products)
+        t0 = time.perf_counter()
+        search = ProductSearch(path, index_dir=None, query_cache_size=0)
+        print(f"İndeks: {len(search.products)} ürün, {time.perf_counter() - t0:.2f}s")
+
+    queries = sample_queries(args.queries)
+    for q in queries[:20]:
+        search.search(q)
+
+    p50, p99 = percentiles(time_queries(search.search, queries))
+    print(f"search()        p50: {p50:7.3f} ms | p99: {p99:7.3f} ms")
+    if not args.no_legacy:
+        p50, p99 = percentiles(time_queries(lambda q: legacy_search(search, q), queries))
+        print(f"eski yöntem     p50: {p50:7.3f} ms | p99: {p99:7.3f} ms")
+
+    print("search_batch:")
+    if batch_report(search, queries):
+        print("❌ search_batch tek tek aramadan farklı sonuç döndürdü")
+        sys.exit(1)
+    print("✅ search_batch sonuçları tek tek aramayla aynı")
+
+
+if __name__ == "__main__":
+    main()
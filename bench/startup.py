@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Soğuk başlangıç ölçümü: import süresi ve ilk yanıta kadar geçen süre.
+
+Geçici bir çalışma klasöründe (sentetik katalog + templates bağlantısı) her
+ölçüm yeni bir süreçte yapılır:
+
+  import     `import main` süresi ve import sonrası yüklü ağır modüller
+  anahtarsız OPENAI_API_KEY yokken uygulamanın ayağa kalkıp kalkmadığı
+  sunucu     uvicorn başlatıldıktan sonra /health, / (statik sayfa) ve aramanın
+             hazır olduğu an (/ready 200; uç nokta yoksa /health ile aynı an)
+
+    python -m bench.startup --products 20000 [--runs 3] [--no-artifact]
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+from bench.catalog import write_catalog
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("numpy", "scipy", "sklearn", "openai", "httpx", "dotenv")
+IMPORT_SNIPPET = (
+    "import sys, time, json; t = time.perf_counter(); import main; "
+    "print(json.dumps({'seconds': time.perf_counter() - t, "
+    f"'loaded': [m for m in {HEAVY!r} if m in sys.modules]}}))"
+)
+
+
+def workdir(tmp: str, products: int, artifact: bool) -> str:
+    os.makedirs(os.path.join(tmp, "data"))
+    os.symlink(os.path.join(REPO, "templates"), os.path.join(tmp, "templates"))
+    path = os.path.join(tmp, "data", "products.jsonl")
+    if products:
+        write_catalog(path, products)
+    else:
+        shutil.copy(os.path.join(REPO, "data", "products.jsonl"), path)
+    if artifact:
+        # Render build adımındaki gibi indeks önceden derlenir
+        subprocess.run([sys.executable, os.path.join(REPO, "search_index.py")], cwd=tmp, env=environ(),
+                       check=True, capture_output=True)
+    return tmp
+
+
+def environ(api_key: bool = True) -> Dict[str, str]:
+    env = dict(os.environ, PYTHONPATH=REPO, INDEX_WATCH_INTERVAL="0", LLM_CACHE_ENABLED="0")
+    env.pop("OPENAI_API_KEY", None)
+    if api_key:
+        env["OPENAI_API_KEY"] = "startup-bench"
+    return env
+
+
+def measure_import(cwd: str, api_key: bool = True) -> Optional[Dict]:
+    r = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=cwd, env=environ(api_key),
+                       capture_output=True, text=True)
+    if r.returncode != 0:
+        return None
+    return json.loads(r.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get(port: int, path: str) -> Optional[int]:
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+        conn.request("GET", path)
+        status = conn.getresponse().status
+        conn.close()
+        return status
+    except OSError:
+        return None
+
+
+def measure_server(cwd: str, api_key: bool = True, timeout: float = 120) -> Dict[str, Optional[float]]:
+    """Süreç başlangıcından itibaren: /health 200, / 200, arama hazır (saniye)"""
+    port = free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                            cwd=cwd, env=environ(api_key), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    times: Dict[str, Optional[float]] = {"health": None, "static": None, "ready": None}
+    try:
+        while time.perf_counter() - t0 < timeout and proc.poll() is None:
+            if times["health"] is None and get(port, "/health") == 200:
+                times["health"] = time.perf_counter() - t0
+            if times["health"] is not None and times["static"] is None and get(port, "/") == 200:
+                times["static"] = time.perf_counter() - t0
+            if times["health"] is not None:
+                status = get(port, "/ready")
+                if status == 200 or status == 404:
+                    # /ready olmayan sürümde indeks import sırasında kurulur: sağlıklı = hazır
+                    times["ready"] = time.perf_counter() - t0 if status == 200 else times["health"]
+            if all(v is not None for v in times.values()):
+                break
+            time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return times
+
+
+def median(values) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
+
+
+def fmt(seconds: Optional[float]) -> str:
+    return f"{seconds * 1000:8.0f} ms" if seconds is not None else "   yanıt yok"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soğuk başlangıç ölçümü")
+    parser.add_argument("--products", type=int, default=20_000, help="0: data/products.jsonl kullanılır")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--no-artifact", action="store_true", help="indeks artefaktı derlenmez (canlı fit)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = workdir(tmp, args.products, not args.no_artifact)
+        imports = [measure_import(cwd) for _ in range(args.runs)]
+        servers = [measure_server(cwd) for _ in range(args.runs)]
+        keyless_import = measure_import(cwd, api_key=False)
+        keyless = measure_server(cwd, api_key=False, timeout=30)
+
+    ok = [i for i in imports if i]
+    print(f"▶ {args.products or 'data/products.jsonl'} ürün, artefakt: {'yok' if args.no_artifact else 'var'}, {args.runs} tekrar (medyan)")
+    print(f"  import main        {fmt(median(i['seconds'] for i in ok))} | yüklenen: {', '.join(ok[0]['loaded']) if ok else '-'}")
+    print(f"  ilk /health        {fmt(median(s['health'] for s in servers))}")
+    print(f"  ilk / (statik)     {fmt(median(s['static'] for s in servers))}")
+    print(f"  arama hazır        {fmt(median(s['ready'] for s in servers))}")
+    print(f"  OPENAI_API_KEY yok: import {'başarılı' if keyless_import else 'HATA'}, /health {fmt(keyless['health']).strip()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""/api/recommend ile /api/recommend/stream için ilk faydalı byte süresini karşılaştır.
+
+    python -m bench.stream_ttfb --latency 2.0
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from bench.stub_openai import StubState, run_in_thread, free_port
+
+PROMPTS = ["ters osmoz membranında kireçlenme", "kazan taşı oluşumu", "soğutma kulesinde korozyon"]
+
+
+def serve_app(app) -> str:
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def measure_stream(client: httpx.Client, prompt: str) -> dict:
+    marks = {}
+    start = time.perf_counter()
+    with client.stream("POST", "/api/recommend/stream", json={"prompt": prompt}) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if line.startswith("event:"):
+                event = line[6:].strip()
+                if event == "products":
+                    marks.setdefault("products", time.perf_counter() - start)
+                elif event == "delta":
+                    marks.setdefault("first_token", time.perf_counter() - start)
+                elif event == "done":
+                    marks["done"] = time.perf_counter() - start
+    return marks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE ilk byte süresi ölçümü")
+    parser.add_argument("--latency", type=float, default=2.0, help="sahte LLM gecikmesi (saniye)")
+    args = parser.parse_args()
+
+    os.environ["OPENAI_BASE_URL"] = run_in_thread(StubState(args.latency))
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+    os.environ.setdefault("QUERY_CACHE_SIZE", "0")
+    os.environ.setdefault("LLM_GOVERNOR_ENABLED", "0")
+
+    import main as app_module
+    # Lifespan'daki arka plan kurulumunu beklemeden ilk istekler ölçülebilsin
+    app_module.warm_up()
+    base_url = serve_app(app_module.app)
+
+    blocking, streamed = [], []
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        for prompt in PROMPTS:
+            start = time.perf_counter()
+            client.post("/api/recommend", json={"prompt": prompt}).raise_for_status()
+            blocking.append(time.perf_counter() - start)
+            streamed.append(measure_stream(client, prompt))
+
+    ms = lambda xs: f"{statistics.median(xs) * 1000:.0f} ms"
+    print(f"/api/recommend        -> ilk byte (tam yanıt): {ms(blocking)}")
+    print(f"/api/recommend/stream -> ürünler: {ms([m['products'] for m in streamed])} | "
+          f"ilk token: {ms([m['first_token'] for m in streamed])} | tamamlandı: {ms([m['done'] for m in streamed])}")
+
+
+if __name__ == "__main__":
+    main()
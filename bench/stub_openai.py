@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Yerel, OpenAI uyumlu sahte sunucu (yük testleri için).
+
+Hata enjeksiyonu (governor/devre kesici denemeleri için):
+  capacity     aynı anda bundan fazla istek gelirse 429 + Retry-After (kota aşımı)
+  error_rate   isteklerin bu oranı error_status (varsayılan 503) ile döner
+  outage       True iken tüm istekler error_status ile döner
+  jitter       gecikmeye eklenen rastgele süre üst sınırı (saniye)
+
+Gecikme modeli (prompt raporu için): latency + prefill * prompt token +
+decode * completion token. JSON modu (response_format) istenmemişse
+yanıtların fence_rate kadarı ```json ... ``` içinde döner.
+
+Kullanım:
+    python -m bench.stub_openai --port 9100 --latency 1.0 [--capacity 4] [--error-rate 0.1]
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 python main.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STUB_CONTENT = {
+    "summary": "Sahte özet: önerilen ürünler ihtiyaca uygundur.",
+    "safety": "Sahte güvenlik notu: KKD kullanın.",
+    "follow_up": "Sahte sonraki adım: teknik ekiple görüşün."
+}
+
+
+class StubState:
+    def __init__(self, latency: float = 1.0, capacity: int = 0, error_rate: float = 0.0,
+                 error_status: int = 503, retry_after: float = 1.0, jitter: float = 0.0, seed: int = 7,
+                 prefill: float = 0.0, decode: float = 0.0, fence_rate: float = 0.0):
+        self.latency = latency
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.jitter = jitter
+        self.prefill = prefill
+        self.decode = decode
+        self.fence_rate = fence_rate
+        self.outage = False
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    def delay(self, usage: dict = None) -> float:
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if usage:
+            delay += self.prefill * usage["prompt_tokens"] + self.decode * usage["completion_tokens"]
+        return delay
+
+    def content(self, body: dict) -> str:
+        content = json.dumps(STUB_CONTENT, ensure_ascii=False)
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        if not json_mode and self.fence_rate and self.rng.random() < self.fence_rate:
+            content = f"```json\n{content}\n```"
+        return content
+
+    def fault(self):
+        """Enjekte edilecek hata yanıtı; yoksa None"""
+        if self.capacity and self.in_flight >= self.capacity:
+            self.rate_limited += 1
+            return JSONResponse({"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                                status_code=429, headers={"Retry-After": f"{self.retry_after:g}"})
+        if self.outage or (self.error_rate and self.rng.random() < self.error_rate):
+            self.errors += 1
+            return JSONResponse({"error": {"message": "Service unavailable", "type": "server_error"}},
+                                status_code=self.error_status)
+        return None
+
+
+def usage_for(body: dict, content: str) -> dict:
+    """Kabaca 4 karakter = 1 token; gerçek tokenizer gerekmez, sayaçların aktığını görmek yeter"""
+    prompt_chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    prompt_tokens, completion_tokens = max(1, prompt_chars // 4), max(1, len(content) // 4)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def create_app(state: StubState) -> FastAPI:
+    app = FastAPI(title="OpenAI stub")
+
+    async def stream_chunks(body: dict, content: str, delay: float):
+        # İçeriği parçalara bölüp gecikme boyunca yay (ilk token da gecikmeli gelir)
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+        try:
+            for i, piece in enumerate(pieces):
+                await asyncio.sleep(delay / len(pieces))
+                chunk = {
+                    "id": f"stub-{state.calls}",
+                    "object": "chat.completion.chunk",
+                    "model": body.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"content": piece},
+                                 "finish_reason": "stop" if i == len(pieces) - 1 else None}]
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                chunk = {"id": f"stub-{state.calls}", "object": "chat.completion.chunk",
+                         "model": body.get("model", "stub"), "choices": [], "usage": usage_for(body, content)}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+        finally:
+            state.in_flight -= 1
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        state.calls += 1
+        fault = state.fault()
+        if fault is not None:
+            return fault
+        content = state.content(body)
+        usage = usage_for(body, content)
+        if body.get("stream"):
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            return StreamingResponse(stream_chunks(body, content, state.delay(usage)), media_type="text/event-stream")
+        state.in_flight += 1
+        state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            await asyncio.sleep(state.delay(usage))
+        finally:
+            state.in_flight -= 1
+        return {
+            "id": f"stub-{state.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": state.calls, "in_flight": state.in_flight, "max_in_flight": state.max_in_flight,
+                "rate_limited": state.rate_limited, "errors": state.errors, "outage": state.outage}
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_in_thread(state: StubState, port: int = 0) -> str:
+    """Stub'ı arka plan thread'inde başlat, base URL döndür"""
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(state), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started and time.time() < deadline:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI uyumlu sahte sunucu")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("STUB_PORT", "9100")))
+    parser.add_argument("--latency", type=float, default=1.0, help="yanıt başına gecikme (saniye)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="gecikmeye eklenen rastgele süre üst sınırı")
+    parser.add_argument("--capacity", type=int, default=0, help="eşzamanlı istek kotası, aşılınca 429 (0: sınırsız)")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 yanıtlarındaki Retry-After")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="hata dönen isteklerin oranı")
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+    state = StubState(args.latency, capacity=args.capacity, error_rate=args.error_rate,
+                      error_status=args.error_status, retry_after=args.retry_after, jitter=args.jitter)
+    uvicorn.run(create_app(state), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""Tekrarlanabilir performans ölçüm paketi (ağ gerektirmez).
+
+Her katalog boyutu için ölçülenler:
+  build      ProductSearch indeks kurulum süresi, RSS artışı ve indeks dizilerinin boyutu
+  search     tek sorgu gecikmesi (p50/p95/p99)
+  batch      search_batch ile toplu sorgu gecikmesi (sorgu başına)
+  recommend  ASGI uygulaması üzerinden uçtan uca /api/recommend verimi
+             (sahte, gecikmesi ayarlanabilir LLM ile)
+
+Sonuçlar commit'ler arasında karşılaştırılabilir JSON olarak yazılır:
+
+    python -m bench.suite                               # 1k, 10k, 100k
+    python -m bench.suite --sizes 1000 10000 --out bench/results/yerel.json
+    python -m bench.suite --compare eski.json yeni.json [--threshold 0.2]
+
+Karşılaştırma yalnızca gürültüye dayanıklı ölçülerde (tur medyanlarının en
+iyisi, verim, kurulum süresi, indeks boyutu) eşik aşılırsa 1 ile çıkar.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from bench.catalog import sample_queries, write_catalog
+
+SIZES = [1000, 10_000, 100_000]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+# Anahtar adında bunlar geçiyorsa büyük değer daha iyidir; geri kalan tüm sayılarda küçük
+HIGHER_IS_BETTER = ("rps",)
+# Karşılaştırmada kötüleşme sayılan (gürültüye dayanıklı) ölçüler; diğerleri yalnızca gösterilir
+GATED = ("best_p50_ms", "rps", "build.seconds", "index_bytes")
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def latency_summary(samples: List[float], rounds: int = 1) -> Dict[str, float]:
+    arr = np.asarray(samples) * 1000
+    # Tur başına medyanların en iyisi: paylaşılan makinelerdeki gürültüden en az etkilenen ölçü
+    per_round = np.array_split(arr, rounds) if rounds > 1 else [arr]
+    return {
+        "best_p50_ms": round(float(min(np.percentile(r, 50) for r in per_round)), 4),
+        "p50_ms": round(float(np.percentile(arr, 50)), 4),
+        "p95_ms": round(float(np.percentile(arr, 95)), 4),
+        "p99_ms": round(float(np.percentile(arr, 99)), 4),
+        "mean_ms": round(float(arr.mean()), 4),
+    }
+
+
+def index_bytes(index) -> int:
+    total = index.row_hashes.nbytes + np.asarray(index.vectorizer.idf_).nbytes
+    for matrix in (index.counts, index.matrix, index.postings):
+        total += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    if index.bm25 is not None:
+        total += index.bm25.nbytes()
+    return int(total)
+
+
+def bench_build(path: str):
+    from search import ProductSearch
+
+    gc.collect()
+    rss0 = rss_bytes()
+    t0 = time.perf_counter()
+    search = ProductSearch(path, index_dir=None, query_cache_size=0)
+    seconds = time.perf_counter() - t0
+    gc.collect()
+    return search, {
+        "products": len(search.products),
+        "seconds": round(seconds, 4),
+        "rss_delta_bytes": rss_bytes() - rss0,
+        "index_bytes": index_bytes(search.snapshot.index),
+    }
+
+
+def bench_search(search, queries: List[str], rounds: int) -> Dict[str, float]:
+    for q in queries[:20]:
+        search.search(q)
+    samples = []
+    for _ in range(rounds):
+        for q in queries:
+            t0 = time.perf_counter()
+            search.search(q)
+            samples.append(time.perf_counter() - t0)
+    return latency_summary(samples, rounds)
+
+
+def bench_batch(search, queries: List[str], batch_size: int, rounds: int) -> Dict[str, float]:
+    batches = [queries[i:i + batch_size] for i in range(0, len(queries), batch_size)]
+    samples = []
+    for _ in range(rounds):
+        for batch in batches:
+            t0 = time.perf_counter()
+            search.search_batch(batch)
+            samples.append((time.perf_counter() - t0) / len(batch))
+    return {"batch_size": batch_size, **latency_summary(samples, rounds)}
+
+
+async def _fire(app, prompts: List[str], concurrency: int) -> Tuple[float, List[float], int]:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    errors = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def one(prompt: str):
+            nonlocal errors
+            async with semaphore:
+                t0 = time.perf_counter()
+                r = await client.post("/api/recommend", json={"prompt": prompt})
+                samples.append(time.perf_counter() - t0)
+                errors += r.status_code != 200
+
+        await asyncio.gather(*(one(p) for p in prompts[:concurrency]))  # ısınma
+        samples.clear()
+        errors = 0
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(p) for p in prompts))
+        return time.perf_counter() - t0, samples, errors
+
+
+def bench_recommend(search, prompts: List[str], concurrency: int, latency: float) -> Dict[str, Any]:
+    import main as app_module
+    from bench.fake_llm import make_fake_processor
+
+    app_module.product_search = search
+    app_module.llm_processor = make_fake_processor(latency)
+    # Tekrarlayan sorgular birleştirilirse verim LLM çağrısı yerine birleştirme oranını ölçer
+    app_module.COALESCE_ENABLED = False
+    wall, samples, errors = asyncio.run(_fire(app_module.app, prompts, concurrency))
+    return {
+        "requests": len(prompts),
+        "concurrency": concurrency,
+        "llm_latency_s": latency,
+        "errors": errors,
+        "rps": round(len(prompts) / wall, 2),
+        **latency_summary(samples),
+    }
+
+
+def git_revision() -> Dict[str, Any]:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": sha, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def environment() -> Dict[str, Any]:
+    import scipy
+    import sklearn
+
+    return {
+        **git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    queries = sample_queries(args.queries, seed=args.seed)
+    report: Dict[str, Any] = {"meta": environment(), "params": vars(args).copy(), "results": {}}
+    report["params"].pop("compare", None)
+    # Sıralama motoru sonuçları doğrudan etkiler; karşılaştırmada parametre farkı olarak görünsün
+    from search import DEFAULT_BACKEND
+    report["params"]["search_backend"] = os.getenv("SEARCH_BACKEND", DEFAULT_BACKEND)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            print(f"\n▶ {size} ürün")
+            path = write_catalog(os.path.join(tmp, f"products_{size}.jsonl"), size, seed=args.seed)
+            search, build = bench_build(path)
+            print(f"  build     {build['seconds']:.2f}s | RSS +{build['rss_delta_bytes'] / 2**20:.1f} MB | "
+                  f"indeks {build['index_bytes'] / 2**20:.1f} MB")
+            single = bench_search(search, queries, args.rounds)
+            print(f"  search    p50 {single['p50_ms']:.3f} ms | p99 {single['p99_ms']:.3f} ms")
+            batch = bench_batch(search, queries, args.batch_size, args.rounds)
+            print(f"  batch     p50 {batch['p50_ms']:.3f} ms/sorgu (batch={args.batch_size})")
+            entry = {"build": build, "search": single, "batch": batch}
+            if not args.no_recommend:
+                prompts = [queries[i % len(queries)] for i in range(args.requests)]
+                rec = bench_recommend(search, prompts, args.concurrency, args.llm_latency)
+                print(f"  recommend {rec['rps']:.1f} istek/s | p50 {rec['p50_ms']:.1f} ms | hata {rec['errors']}")
+                entry["recommend"] = rec
+            report["results"][str(size)] = entry
+            del search
+    return report
+
+
+def flatten(tree: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in tree.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    """İki sonuç dosyasını karşılaştır; eşikten fazla kötüleşen ölçü sayısını döndür"""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    skip = {"out", "compare", "threshold"}
+    for key in sorted((old["params"].keys() | new["params"].keys()) - skip):
+        if old["params"].get(key) != new["params"].get(key):
+            print(f"⚠️ Parametre farklı: {key} {old['params'].get(key)} -> {new['params'].get(key)}")
+    old_flat, new_flat = flatten(old["results"]), flatten(new["results"])
+    regressions = 0
+    for key in sorted(old_flat.keys() & new_flat.keys()):
+        a, b = old_flat[key], new_flat[key]
+        if key.endswith(("products", "requests", "concurrency", "batch_size", "llm_latency_s")) or a == 0:
+            continue
+        change = (b - a) / abs(a)
+        worse = -change if any(h in key for h in HIGHER_IS_BETTER) else change
+        gated = any(g in key for g in GATED)
+        if not gated:
+            mark = "  "
+        else:
+            mark = "❌" if worse > threshold else ("✅" if worse < -threshold else "  ")
+            regressions += worse > threshold
+        print(f"{mark} {key:40s} {a:>12.4f} -> {b:>12.4f} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tekrarlanabilir performans ölçüm paketi")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--queries", type=int, default=200, help="ölçülen farklı sorgu sayısı")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200, help="uçtan uca /api/recommend istek sayısı")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="sahte LLM gecikmesi (saniye)")
+    parser.add_argument("--no-recommend", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="sonuç JSON yolu (varsayılan bench/results/<commit>-<zaman>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("ESKI", "YENI"))
+    parser.add_argument("--threshold", type=float, default=0.2, help="kötüleşme eşiği (oran)")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    # Ağ yok: gerçek anahtar gerekmez, kalıcı önbellek sonuçları bozmasın
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    os.environ["QUERY_CACHE_SIZE"] = "0"
+    os.environ["LLM_GOVERNOR_ENABLED"] = "0"
+    os.environ["INDEX_WATCH_INTERVAL"] = "0"
+
+    report = run(args)
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"{report['meta']['commit'] or 'local'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ Sonuçlar yazıldı -> {out}")
+
+
+if __name__ == "__main__":
+    main()
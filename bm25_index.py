@@ -0,0 +1,402 @@
+"""Alan ağırlıklı BM25 (BM25F) ters indeksi, sıkıştırılmış posting listeleri.
+
+TF-IDF'teki max_features sınırı yoktur; ürün kodları ("MAKS 804") gibi nadir
+ama ayırt edici terimler de indekse girer.
+
+Posting düzeni (terim başına, doküman sırasına göre):
+  gaps      doküman numarası farkları; terim başına en küçük genişlikte
+            (1/2/4 bayt) tek bir bayt tamponunda
+  impacts   BM25 katkısı, terimin en büyük katkısına göre uint8'e nicemlenmiş
+  blocks    her BLOCK_SIZE posting için ilk/son doküman ve en büyük katkı;
+            yalnızca bazı dokümanlara bakılacaksa blok atlamayı sağlar
+
+En iyi k araması MaxScore (WAND ailesi) ile yapılır: terimler üst sınıra göre
+sıralanır, zorunlu terimler yoğun bir toplayıcıda birleştirilir; k'ıncı skoru
+geçemeyecek terimler yalnızca mevcut adayların bloklarını açar. Toplu
+sorgular (score_batch) ise posting listelerinden bir kez açılan (terim x
+doküman) katkı matrisiyle tek seyrek çarpımda skorlanır.
+"""
+import os
+import re
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from text_analysis import fold, get_analyzer, turkish_lower
+
+# Alan ağırlıkları: ad > uygulamalar/problemler > parametreler > açıklama
+FIELD_BOOSTS = {
+    "product_name": 3.0,
+    "applications": 2.0,
+    "problems_solved": 2.0,
+    "key_params": 1.5,
+    "category": 1.0,
+    "short_desc": 1.0,
+}
+K1 = 1.2
+B = 0.75
+BLOCK_SIZE = 128
+# Aday araması bundan fazla blok açacaksa posting listesi tümüyle çözülür
+MAX_BLOCK_LOOKUPS = 4
+# Katlanmış, küçük harfli metinde ürün kodu: "maks 804", "MAKS-1200u", "aqua 10"
+CODE_RE = re.compile(r"\b(maks|aqua)[\s\-]*(\d{2,5}[a-z]?)\b")
+_ARRAYS = ("post_ptr", "gap_offset", "gap_width", "gaps", "impacts", "term_max",
+           "block_ptr", "block_first", "block_last", "block_max", "code_ptr", "code_docs")
+
+
+def product_codes(text: str) -> List[str]:
+    folded = fold(turkish_lower(text))
+    return list(dict.fromkeys(prefix + number for prefix, number in CODE_RE.findall(folded)))
+
+
+def field_text(product: Dict[str, Any], field: str) -> str:
+    value = product.get(field) or ""
+    return " ".join(value) if isinstance(value, list) else str(value)
+
+
+class BM25Index:
+    """Sıkıştırılmış posting'li BM25F indeksi; diziler mmap ile de açılabilir"""
+
+    def __init__(self, vocabulary: Dict[str, int], codes: Dict[str, int], n_docs: int, arrays: Dict[str, np.ndarray]):
+        self.vocabulary = vocabulary
+        self.codes = codes
+        self.n_docs = n_docs
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self._analyzer = get_analyzer((1, 1))
+        self._weights: Optional[sp.csr_matrix] = None
+
+    # --- kurulum -------------------------------------------------------------
+
+    @classmethod
+    def build(cls, products: List[Dict[str, Any]]) -> "BM25Index":
+        analyzer = get_analyzer((1, 1))
+        vocabulary: Dict[str, int] = {}
+        n_docs = len(products)
+        weighted = None
+        for field, boost in FIELD_BOOSTS.items():
+            rows: List[int] = []
+            cols: List[int] = []
+            lengths = np.zeros(n_docs, dtype=np.float64)
+            for doc, product in enumerate(products):
+                tokens = analyzer.tokenize(field_text(product, field))
+                lengths[doc] = len(tokens)
+                rows.extend([doc] * len(tokens))
+                for token in tokens:
+                    t = vocabulary.get(token)
+                    if t is None:
+                        t = vocabulary[token] = len(vocabulary)
+                    cols.append(t)
+            tf = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n_docs, len(vocabulary) or 1))
+            # BM25F: alan uzunluğuna göre normalize edilmiş, ağırlıklı terim frekansı
+            avg = lengths.mean() if n_docs and lengths.mean() > 0 else 1.0
+            norm = boost / (1 - B + B * lengths / avg)
+            tf = (sp.diags(norm) @ tf).tocsr()
+            if weighted is None:
+                weighted = tf
+            else:
+                weighted.resize(tf.shape)
+                weighted = weighted + tf
+        n_terms = len(vocabulary)
+        weighted = weighted.tocsc() if weighted is not None else sp.csc_matrix((n_docs, 0))
+        weighted.resize((n_docs, n_terms))
+        weighted.sort_indices()
+
+        df = np.diff(weighted.indptr)
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        term_of = np.repeat(np.arange(n_terms), df)
+        impact = idf[term_of] * weighted.data * (K1 + 1) / (K1 + weighted.data)
+
+        codes: Dict[str, List[int]] = {}
+        for doc, product in enumerate(products):
+            for code in product_codes(f"{product.get('product_name', '')} {product.get('url', '')}"):
+                codes.setdefault(code, []).append(doc)
+        return cls._compress(vocabulary, codes, n_docs, weighted.indptr, weighted.indices, impact)
+
+    @classmethod
+    def _compress(cls, vocabulary: Dict[str, int], codes: Dict[str, List[int]], n_docs: int,
+                  post_ptr: np.ndarray, docs: np.ndarray, impact: np.ndarray) -> "BM25Index":
+        n_terms = len(post_ptr) - 1
+        post_ptr = np.asarray(post_ptr, dtype=np.int64)
+        docs = np.asarray(docs, dtype=np.int64)
+        lengths = np.diff(post_ptr)
+        nonempty = lengths > 0
+        term_of = np.repeat(np.arange(n_terms), lengths)
+
+        term_max = np.zeros(n_terms, dtype=np.float64)
+        if len(docs):
+            term_max[nonempty] = np.maximum.reduceat(impact, post_ptr[:-1][nonempty])
+        scale = np.where(term_max > 0, 255.0 / np.where(term_max > 0, term_max, 1.0), 0.0)
+        impacts = np.rint(impact * scale[term_of]).clip(1, 255).astype(np.uint8)
+
+        # Her terimin ilk posting'i doküman numarasının kendisi, sonrakiler bir öncekine farktır
+        gaps = np.diff(docs, prepend=0)
+        gaps[post_ptr[:-1][nonempty]] = docs[post_ptr[:-1][nonempty]]
+        widest = np.zeros(n_terms, dtype=np.int64)
+        if len(docs):
+            widest[nonempty] = np.maximum.reduceat(gaps, post_ptr[:-1][nonempty])
+        gap_width = np.where(widest < 2 ** 8, 1, np.where(widest < 2 ** 16, 2, 4)).astype(np.uint8)
+        gap_offset = np.zeros(n_terms + 1, dtype=np.int64)
+        gap_offset[1:] = np.cumsum(lengths * gap_width)
+        buffer = np.zeros(int(gap_offset[-1]), dtype=np.uint8)
+        byte_at = gap_offset[term_of] + (np.arange(len(docs)) - post_ptr[term_of]) * gap_width[term_of]
+        for width in (1, 2, 4):
+            sel = gap_width[term_of] == width
+            if sel.any():
+                raw = gaps[sel].astype(f"<u{width}").view(np.uint8).reshape(-1, width)
+                buffer[byte_at[sel][:, None] + np.arange(width)] = raw
+
+        # Blok sınırları: her terim kendi posting'lerini BLOCK_SIZE'lık dilimlere böler
+        n_blocks = -(-lengths // BLOCK_SIZE)
+        block_ptr = np.zeros(n_terms + 1, dtype=np.int64)
+        block_ptr[1:] = np.cumsum(n_blocks)
+        block_term = np.repeat(np.arange(n_terms), n_blocks)
+        block_start = post_ptr[block_term] + (np.arange(len(block_term)) - block_ptr[block_term]) * BLOCK_SIZE
+        block_end = np.minimum(block_start + BLOCK_SIZE, post_ptr[block_term + 1])
+        block_max = np.maximum.reduceat(impacts, block_start) if len(block_start) else np.zeros(0, dtype=np.uint8)
+
+        code_names = sorted(codes)
+        code_ptr = np.zeros(len(code_names) + 1, dtype=np.int64)
+        code_ptr[1:] = np.cumsum([len(codes[c]) for c in code_names])
+        arrays = {
+            "post_ptr": post_ptr,
+            "gap_offset": gap_offset,
+            "gap_width": gap_width,
+            "gaps": buffer,
+            "impacts": impacts,
+            "term_max": term_max.astype(np.float32),
+            "block_ptr": block_ptr,
+            "block_first": docs[block_start].astype(np.uint32),
+            "block_last": docs[block_end - 1].astype(np.uint32),
+            "block_max": block_max.astype(np.uint8),
+            "code_ptr": code_ptr,
+            "code_docs": np.asarray([doc for c in code_names for doc in codes[c]], dtype=np.uint32),
+        }
+        return cls(vocabulary, {c: i for i, c in enumerate(code_names)}, n_docs, arrays)
+
+    # --- kaydetme / yükleme -------------------------------------------------------
+
+    def save(self, directory: str):
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"bm25_{name}.npy"), getattr(self, name))
+        terms = [""] * len(self.vocabulary)
+        for term, t in self.vocabulary.items():
+            terms[t] = term
+        codes = [""] * len(self.codes)
+        for code, c in self.codes.items():
+            codes[c] = code
+        with open(os.path.join(directory, "bm25_meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"n_docs": self.n_docs, "terms": terms, "codes": codes,
+                       "field_boosts": FIELD_BOOSTS, "k1": K1, "b": B}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        meta_path = os.path.join(directory, "bm25_meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("field_boosts") != FIELD_BOOSTS or meta.get("k1") != K1 or meta.get("b") != B:
+            return None
+        arrays = {name: np.load(os.path.join(directory, f"bm25_{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+        return cls({t: i for i, t in enumerate(meta["terms"])}, {c: i for i, c in enumerate(meta["codes"])},
+                   meta["n_docs"], arrays)
+
+    def nbytes(self) -> int:
+        return int(sum(getattr(self, name).nbytes for name in _ARRAYS))
+
+    # --- sorgu ---------------------------------------------------------------
+
+    def _gaps(self, t: int, lo: int, hi: int) -> np.ndarray:
+        """Terimin [lo, hi) posting aralığındaki doküman farkları"""
+        width = int(self.gap_width[t])
+        offset = int(self.gap_offset[t]) + lo * width
+        return np.asarray(self.gaps[offset:offset + (hi - lo) * width]).view(f"<u{width}")
+
+    def postings(self, t: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Terimin tüm posting listesi: (doküman numaraları, katkılar)"""
+        start, end = int(self.post_ptr[t]), int(self.post_ptr[t + 1])
+        docs = np.cumsum(self._gaps(t, 0, end - start), dtype=np.int64)
+        return docs, self.impacts[start:end] * (self.term_max[t] / 255.0)
+
+    def _lookup(self, t: int, candidates: np.ndarray) -> np.ndarray:
+        """Sıralı aday dokümanlar için terimin katkısı; yalnızca adayları içeren bloklar açılır"""
+        start, end = int(self.post_ptr[t]), int(self.post_ptr[t + 1])
+        b0, b1 = int(self.block_ptr[t]), int(self.block_ptr[t + 1])
+        out = np.zeros(len(candidates), dtype=np.float64)
+        if not len(candidates):
+            return out
+        # Her bloğa düşen aday dilimi: [bounds[b], bounds[b + 1])
+        bounds = np.searchsorted(candidates, self.block_first[b0:b1])
+        bounds = np.append(bounds, np.searchsorted(candidates, self.block_last[b1 - 1], side="right"))
+        blocks = np.flatnonzero(np.diff(bounds) > 0)
+        if not len(blocks):
+            return out
+        scale = self.term_max[t] / 255.0
+        if len(blocks) > MAX_BLOCK_LOOKUPS:
+            # Çok blok gerekiyorsa listeyi tek vektör işlemiyle açmak daha ucuz
+            docs, impact = self.postings(t)
+            pos = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            hit = docs[pos] == candidates
+            out[hit] = impact[pos[hit]]
+            return out
+        for b in blocks:
+            lo = int(b) * BLOCK_SIZE
+            hi = min(lo + BLOCK_SIZE, end - start)
+            first = int(self.block_first[b0 + b])
+            docs = np.cumsum(self._gaps(t, lo, hi), dtype=np.int64)
+            docs += first - docs[0]
+            c0, c1 = int(bounds[b]), int(bounds[b + 1])
+            pos = np.minimum(np.searchsorted(docs, candidates[c0:c1]), len(docs) - 1)
+            hit = docs[pos] == candidates[c0:c1]
+            out[c0:c1][hit] = self.impacts[start + lo + pos[hit]] * scale
+        return out
+
+    @property
+    def weights(self) -> sp.csr_matrix:
+        """(terim x doküman) BM25 katkı matrisi; ilk toplu sorguda posting listelerinden bir kez açılır"""
+        if self._weights is None:
+            post_ptr = np.asarray(self.post_ptr, dtype=np.int64)
+            lengths = np.diff(post_ptr)
+            term_of = np.repeat(np.arange(len(lengths)), lengths)
+            gaps = np.zeros(len(term_of), dtype=np.int64)
+            width_of = np.asarray(self.gap_width)[term_of]
+            byte_at = np.asarray(self.gap_offset)[term_of] + (np.arange(len(term_of)) - post_ptr[term_of]) * width_of
+            for width in (1, 2, 4):
+                sel = width_of == width
+                if sel.any():
+                    raw = np.asarray(self.gaps)[byte_at[sel][:, None] + np.arange(width)]
+                    gaps[sel] = raw.view(f"<u{width}").ravel()
+            # Terim içinde farkların kümülatif toplamı doküman numarasıdır
+            total = np.cumsum(gaps)
+            docs = total - np.repeat(np.concatenate(([0], total))[post_ptr[:-1]], lengths)
+            # postings() ile aynı nicemleme: katkı * (terimin en büyük katkısı / 255)
+            scale = np.asarray(self.term_max) / 255.0
+            impact = np.asarray(self.impacts) * scale[term_of]
+            self._weights = sp.csr_matrix((impact, docs.astype(np.int32), post_ptr),
+                                          shape=(len(lengths), self.n_docs))
+        return self._weights
+
+    def query_terms(self, query: str) -> Dict[int, int]:
+        counts: Dict[int, int] = {}
+        for token in self._analyzer.tokenize(query):
+            t = self.vocabulary.get(token)
+            if t is not None:
+                counts[t] = counts.get(t, 0) + 1
+        return counts
+
+    def code_matches(self, query: str) -> np.ndarray:
+        docs = [self.code_docs[self.code_ptr[c]:self.code_ptr[c + 1]]
+                for c in (self.codes.get(code) for code in product_codes(query)) if c is not None]
+        return np.unique(np.concatenate(docs).astype(np.int64)) if docs else np.zeros(0, dtype=np.int64)
+
+    def score(self, query: str, docs: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Verilen (sıralı) dokümanların tam skoru ve skor üst sınırı; seçici filtreler için.
+
+        Posting listeleri yalnızca bu dokümanları içeren bloklarda açılır.
+        """
+        terms = self.query_terms(query)
+        docs = np.asarray(docs, dtype=np.int64)
+        upper = float(sum(self.term_max[t] * c for t, c in terms.items()))
+        scores = np.zeros(len(docs), dtype=np.float64)
+        for t, c in terms.items():
+            scores += self._lookup(t, docs) * c
+        code_docs = self.code_matches(query)
+        code_bonus = max(upper, 1.0) if len(code_docs) else 0.0
+        if len(code_docs):
+            scores[np.isin(docs, code_docs)] += code_bonus
+        return scores, upper + code_bonus
+
+    def score_batch(self, queries: List[str], allowed: Optional[np.ndarray] = None) -> Tuple[sp.csr_matrix, np.ndarray]:
+        """Sorguların tüm dokümanlardaki skoru tek seyrek çarpımla: (sorgu x doküman skorları, skor üst sınırları).
+
+        Skorlar top_k ile aynıdır (kod bonusu ve allowed maskesi dahil); satır başına ilk k'yı çağıran seçer.
+        """
+        rows: List[int] = []
+        cols: List[int] = []
+        counts: List[int] = []
+        uppers = np.zeros(len(queries), dtype=np.float64)
+        bonus_rows: List[np.ndarray] = []
+        bonus_docs: List[np.ndarray] = []
+        bonus_values: List[np.ndarray] = []
+        for i, query in enumerate(queries):
+            terms = self.query_terms(query)
+            rows.extend([i] * len(terms))
+            cols.extend(terms)
+            counts.extend(terms.values())
+            upper = float(np.sum([self.term_max[t] * c for t, c in terms.items()], dtype=np.float64))
+            code_docs = self.code_matches(query)
+            if allowed is not None:
+                code_docs = code_docs[allowed[code_docs]]
+            code_bonus = max(upper, 1.0) if len(code_docs) else 0.0
+            uppers[i] = upper + code_bonus
+            if len(code_docs):
+                bonus_rows.append(np.full(len(code_docs), i))
+                bonus_docs.append(code_docs)
+                bonus_values.append(np.full(len(code_docs), code_bonus))
+        shape = (len(queries), self.n_docs)
+        weights = self.weights
+        terms_matrix = sp.csr_matrix((np.asarray(counts, dtype=np.float64), (rows, cols)),
+                                     shape=(len(queries), weights.shape[0]))
+        scores = (terms_matrix @ weights).tocsr()
+        if allowed is not None:
+            scores.data *= allowed[scores.indices]
+            scores.eliminate_zeros()
+        if bonus_rows:
+            scores = scores + sp.csr_matrix((np.concatenate(bonus_values),
+                                             (np.concatenate(bonus_rows), np.concatenate(bonus_docs))), shape=shape)
+        return scores, uppers
+
+    def top_k(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, float]:
+        """(doküman numaraları, skorlar, skor üst sınırı); skora göre azalan ilk k aday.
+
+        Sorgudaki ürün koduyla birebir eşleşen ürünler kod bonusuyla en üste çıkar.
+        allowed (bool maske) verilirse yalnızca izin verilen dokümanlar skorlanır.
+        """
+        terms = self.query_terms(query)
+        code_docs = self.code_matches(query)
+        if allowed is not None:
+            code_docs = code_docs[allowed[code_docs]]
+        order = sorted(terms, key=lambda t: -self.term_max[t] * terms[t])
+        bounds = np.array([self.term_max[t] * terms[t] for t in order], dtype=np.float64)
+        upper = float(bounds.sum())
+        # Kod eşleşmesi metin skorundan bağımsız olarak öne geçsin
+        code_bonus = max(upper, 1.0) if len(code_docs) else 0.0
+        remaining = np.concatenate((np.cumsum(bounds[::-1])[::-1], [0.0]))
+
+        # Zorunlu terimler yoğun bir toplayıcıya yazılır (sıralı birleştirme yerine tek
+        # vektör toplaması); kalan terimlerin üst sınırı eşiğin altına düşünce yalnızca
+        # ilk k'ya girebilecek adaylar için posting blokları açılır
+        acc = np.zeros(self.n_docs, dtype=np.float64)
+        acc[code_docs] = code_bonus
+        cand: Optional[np.ndarray] = None
+        threshold = 0.0
+        for i, t in enumerate(order):
+            if cand is None:
+                docs, impact = self.postings(t)
+                if allowed is not None:
+                    impact = impact * allowed[docs]
+                acc[docs] += impact * terms[t]
+                if remaining[i + 1] == 0:
+                    break
+                # Bu terimin dokümanları içindeki k'ıncı skor, gerçek eşiğin alt sınırıdır
+                touched = acc[docs]
+                if len(touched) >= k and touched.max() > remaining[i + 1]:
+                    threshold = float(np.partition(touched, len(touched) - k)[len(touched) - k])
+                    if remaining[i + 1] < threshold:
+                        cand = np.flatnonzero(acc)
+                        scores = acc[cand]
+            else:
+                alive = scores + remaining[i] >= threshold
+                cand, scores = cand[alive], scores[alive]
+                scores = scores + self._lookup(t, cand) * terms[t]
+                threshold = float(np.partition(scores, len(scores) - k)[len(scores) - k])
+        if cand is None:
+            cand = np.flatnonzero(acc)
+            scores = acc[cand]
+        if not len(cand):
+            return cand, scores, upper + code_bonus
+        top = np.lexsort((cand, -scores))[:k]
+        return cand[top], scores[top], upper + code_bonus
@@ -8,6 +8,11 @@ echo "======================================"
 # Python paketlerini yükle
 pip install -r requirements.txt
 
+# Kanonik kataloğu üret (normalizasyon + tekilleştirme), ardından arama indeksini önceden derle
+# (worker'lar mmap ile paylaşır, import'ta fit yapılmaz)
+python catalog_compact.py
+python search_index.py
+
 # Uygulamayı başlat
 echo "✅ Uygulama başlatılıyor..."
 gunicorn main:app -w 4 -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:$PORT
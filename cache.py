@@ -0,0 +1,185 @@
+import os
+import re
+import asyncio
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+
+from prompt_builder import PRODUCT_FIELDS
+from text_analysis import turkish_lower
+
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Türkçe büyük/küçük harf, noktalama ve boşluk farklarını yok say"""
+    text = turkish_lower(prompt)
+    text = _PUNCT_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+def _product_digest(product: Dict[str, Any]) -> str:
+    """Modele giden ürün alanlarının özeti: URL aynı kalsa da metin değişince anahtar değişir"""
+    fields = {field: product.get(field) for field in PRODUCT_FIELDS}
+    raw = json.dumps(fields, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def analysis_key(prompt: str, products: List[Dict[str, Any]], version: str = "") -> str:
+    """Normalize prompt + sıralı ürün URL'leri ve metin özetlerinden önbellek anahtarı üret.
+
+    version: analizi üreten model ve prompt sürümü (bkz. LLMProcessor.cache_version);
+    değişince eski analizler eşleşmez.
+    """
+    entries = sorted(f"{p.get('url') or ''} {_product_digest(p)}" for p in products)
+    raw = version + "\n" + normalize_prompt(prompt) + "\n" + "\n".join(entries)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """LLM analizleri için SQLite tabanlı, TTL + LRU tahliyeli kalıcı önbellek.
+
+    Dosya tüm gunicorn worker'ları arasında paylaşılır (WAL modu); hit/miss
+    sayaçları da aynı dosyada tutulduğundan tüm worker'ların toplamını verir.
+    """
+
+    def __init__(self, path: str = "data/llm_cache.sqlite3", ttl: float = 7 * 24 * 3600,
+                 max_entries: int = 5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["AnalysisCache"]:
+        if os.getenv("LLM_CACHE_ENABLED", "1") == "0":
+            return None
+        return cls(
+            path=os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite3"),
+            ttl=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # gunicorn fork sonrası bağlantı paylaşılmamalı: her süreç kendi bağlantısını açar
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS analyses_accessed ON analyses(accessed_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO stats(name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _bump(self, conn: sqlite3.Connection, name: str, n: int = 1):
+        conn.execute("UPDATE stats SET value = value + ? WHERE name = ?", (n, name))
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created_at FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                    self._bump(conn, "evictions")
+                self._bump(conn, "misses")
+                return None
+            conn.execute("UPDATE analyses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._bump(conn, "hits")
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict[str, str]):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses(key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            # Süresi dolanları ve LRU sırasına göre fazlalıkları at
+            expired = conn.execute("DELETE FROM analyses WHERE created_at < ?", (now - self.ttl,)).rowcount
+            count = conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+            overflow = max(0, count - self.max_entries)
+            if overflow:
+                conn.execute(
+                    "DELETE FROM analyses WHERE key IN "
+                    "(SELECT key FROM analyses ORDER BY accessed_at ASC LIMIT ?)", (overflow,)
+                )
+            if expired or overflow:
+                self._bump(conn, "evictions", expired + overflow)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._connect()
+            counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "hit_rate": round(counters.get("hits", 0) / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM analyses")
+            conn.execute("UPDATE stats SET value = 0")
+
+
+class SingleFlight:
+    """Aynı anahtarlı eşzamanlı async işleri worker içinde tek hesaplamada birleştirir.
+
+    İlk gelen işi başlatır, aynı anahtarla gelenler onun sonucunu (ya da
+    hatasını) bekler. İş ayrı bir task olarak çalışır; bekleyenlerden biri
+    iptal edilirse (istemci koptu) diğerleri etkilenmez.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Tüm bekleyenler iptal edildiyse "exception was never retrieved" uyarısı çıkmasın
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.executions + self.coalesced
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "coalesce_rate": round(self.coalesced / requests, 4) if requests else 0.0,
+        }
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""Katalog sıkıştırma: products.jsonl (+ paralel CSV kopyaları) -> tek kanonik katalog.
+
+Sunucu her açılışta her worker'da aynı temizliği yapmak yerine bu çıktıyı
+olduğu gibi yükler. Aşamalar:
+
+  1. okuma       JSONL / CSV kaynakları (CSV'de liste alanları virgülle ayrılır)
+  2. normalize   geçersiz URL'li satırlar atılır, jenerik adlar URL'den türetilir,
+                 menü metni ("HAKKIMIZDA...") açıklamalar temizlenir
+  3. URL         kanonik URL'si aynı satırlar birleştirilir (şema/host harfi,
+                 sorgu, fragment, sondaki / farkları)
+  4. içerik      MinHash + LSH ile neredeyse aynı içerikli satırlar bulunur,
+                 gerçek Jaccard benzerliğiyle doğrulanır; yalnızca aynı ürün
+                 koduna (MAKS 804) ya da aynı sayfa adına (farklı kategori
+                 yolunda aynı ürün) sahip olanlar birleştirilir
+  5. yazma       data/catalog.jsonl, data/catalog.meta.json (kaynak ve çıktı
+                 hash'leri, kural sürümü; sunucu kataloğun güncelliğini buradan
+                 okur, aynı girdide bayt bayt aynıdır) ve data/catalog_report.json
+                 (atılan ve birleştirilen her satır; derleme çıktısı, repoda tutulmaz)
+
+Birleştirmede en dolu satır esas alınır; boş alanlar diğerlerinden
+tamamlanır, liste alanları sırası korunarak birleştirilir.
+
+    python catalog_compact.py [kaynaklar...] [--out data/catalog.jsonl] [--threshold 0.85]
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import numpy as np
+
+from bm25_index import product_codes
+from text_analysis import fold, turkish_lower
+
+# Normalizasyon / tekilleştirme kuralları değişince artırılır: eski sürümle üretilmiş katalog yeniden temizlenir
+# 2: içerik karşılaştırması text_analysis.fold ile, ürün kodları bm25_index.product_codes ile
+RULES_VERSION = 2
+SOURCE_PATH = os.path.join("data", "products.jsonl")
+CATALOG_PATH = os.path.join("data", "catalog.jsonl")
+DEFAULT_SOURCES = (SOURCE_PATH, os.path.join("data", "products.csv"), os.path.join("data", "products_old.csv"))
+LIST_FIELDS = ("applications", "problems_solved", "key_params")
+TEXT_FIELDS = ("product_name", "category", "short_desc", "url", "doc_url")
+NEAR_DUP_THRESHOLD = 0.85
+NUM_PERM = 128
+BANDS = 16
+SHINGLE = 5
+MAX_BUCKET = 200
+_MERSENNE = (1 << 61) - 1
+_BOILERPLATE = ('hakkımızda', 'sertifikalar', 'gizlilik', 'politikası', 'insan kaynakları', 'arges')
+
+
+# --- normalizasyon (ProductSearch ham katalogda aynı kuralları kullanır) ------
+
+def is_valid_url(url: Optional[str]) -> bool:
+    url = (url or '').lower()
+    if not url.startswith('http'):
+        return False
+    if 'info@' in url:
+        return False
+    # Sadece gerçekten kötü URL'leri filtrele
+    banned = ('urun-gruplar', 'urun-gruplari', 'hammaddeler', 'haberler', 'etkinlik', 'iletisim', 'bulten')
+    if any(b in url for b in banned):
+        return False
+    # Daha esnek filtreleme - çoğu URL'yi kabul et
+    return True
+
+
+def is_generic_name(name: str) -> bool:
+    n = (name or '').strip().lower()
+    if len(n) <= 8:
+        return True
+    generic_keys = (
+        'hakkımızda', 'sertifikalar', 'insan kaynakları', 'gizlilik', 'politikası',
+        'ürün grupları', 'ürün grubu', 'soğutma suyu ıslahı', 'su ve proses',
+        'haberler', 'etkinlik', 'teknik', 'e-bülten', 'endüstriyel su hazırlama sistemleri'
+    )
+    if any(k in n for k in generic_keys):
+        return True
+    if 'ürünleri' in n and 'maks' not in n:
+        return True
+    category_like = (
+        'ters osmoz', 'kazan', 'soğutma suyu', 'temizlik ürünleri', 'mikroorganizma kontrol',
+    )
+    if any(k in n for k in category_like):
+        if not any(x in n for x in ('maks', 'antiskal', 'temizleyici', 'inhibitör', 'inhibitor', 'biyosit')):
+            return True
+    return False
+
+
+def name_from_url(url: str) -> str:
+    try:
+        slug = (url or '').rstrip('/').rsplit('/', 1)[-1]
+        name = slug.replace('-', ' ').strip()
+        # Özel durumlar için düzeltmeler
+        if 'maks' in name.lower():
+            # MAKS 804 ANTİSKALANT gibi formatlar için
+            parts = name.split()
+            if len(parts) >= 2 and parts[0].upper() == 'MAKS':
+                return f"MAKS {parts[1]} {' '.join(parts[2:]).upper()}"
+        return name.upper()
+    except Exception:
+        return ''
+
+
+def normalize_product(p: Dict[str, Any]) -> Dict[str, Any]:
+    """Jenerik adı URL'den türet, menü metni açıklamaları temizle (yerinde)"""
+    name = p.get('product_name') or ''
+    if is_generic_name(name):
+        fallback = name_from_url(p.get('url', ''))
+        if fallback:
+            p['product_name'] = fallback
+    # short_desc temizle ve kısalt
+    short_desc = (p.get('short_desc') or '').strip()
+    # Gereksiz metinleri temizle
+    if any(word in short_desc.lower() for word in _BOILERPLATE):
+        short_desc = ''
+    if not short_desc or len(short_desc) < 5:
+        p['short_desc'] = p['product_name']
+    else:
+        p['short_desc'] = short_desc
+    return p
+
+
+# --- okuma / yazma -------------------------------------------------------------
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_source(path: str) -> List[Dict[str, Any]]:
+    if not path.endswith(".csv"):
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    rows = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            product = {k: (row.get(k) or "").strip() for k in TEXT_FIELDS}
+            for k in LIST_FIELDS:
+                product[k] = [v.strip() for v in (row.get(k) or "").split(",") if v.strip()]
+            rows.append(product)
+    return rows
+
+
+def write_atomic(path: str, text: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def meta_path(catalog_path: str) -> str:
+    return os.path.splitext(catalog_path)[0] + ".meta.json"
+
+
+def is_compacted(catalog_path: str, source_hash: Optional[str]) -> bool:
+    """Dosya bu kural sürümüyle üretilmiş ve sonradan değişmemiş bir kanonik katalog mu?"""
+    try:
+        with open(meta_path(catalog_path), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get("rules_version") == RULES_VERSION and meta.get("catalog_hash") == source_hash
+
+
+def stale_sources(catalog_path: str) -> List[str]:
+    """Katalog üretildikten sonra içeriği değişmiş kaynaklar (meta yoksa boş)"""
+    try:
+        with open(meta_path(catalog_path), encoding="utf-8") as f:
+            sources = json.load(f).get("sources") or {}
+    except (OSError, ValueError):
+        return []
+    changed = []
+    for path, digest in sources.items():
+        try:
+            if file_hash(path) != digest:
+                changed.append(path)
+        except OSError:
+            # Silinmiş kaynak katalogdakinden yeni veri getirmez
+            continue
+    return changed
+
+
+def default_catalog_path() -> str:
+    """CATALOG_PATH > data/catalog.jsonl (varsa ve kaynaklarla güncelse) > data/products.jsonl
+
+    ingest_links.py products.jsonl'i güncelleyip katalog yeniden üretilmediyse
+    eski katalog sunulmaz: uyarı verilir ve products.jsonl yüklenir (açılışta
+    normalize edilir, yalnızca tekilleştirme eksik kalır).
+    """
+    path = os.getenv("CATALOG_PATH")
+    if path:
+        return path
+    if not os.path.exists(CATALOG_PATH):
+        return SOURCE_PATH
+    changed = stale_sources(CATALOG_PATH)
+    if changed and os.path.exists(SOURCE_PATH):
+        print(f"⚠️ Kanonik katalog kaynaklardan eski ({', '.join(changed)} değişti); {SOURCE_PATH} yükleniyor. "
+              f"Güncellemek için: python catalog_compact.py")
+        return SOURCE_PATH
+    return CATALOG_PATH
+
+
+def catalog_watch_paths() -> List[str]:
+    """default_catalog_path'in sonucunu değiştirebilecek dosyalar (canlı yenileme izler)"""
+    paths = [os.getenv("CATALOG_PATH") or CATALOG_PATH, meta_path(CATALOG_PATH), *DEFAULT_SOURCES]
+    return list(dict.fromkeys(paths))
+
+
+# --- birleştirme ----------------------------------------------------------------
+
+def canonical_url(url: str) -> str:
+    parts = urlsplit((url or "").strip())
+    scheme = "https" if parts.scheme.lower() in ("http", "https") else parts.scheme.lower()
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if not path.endswith("/") and "." not in path.rsplit("/", 1)[-1]:
+        path += "/"
+    return urlunsplit((scheme, parts.netloc.lower(), path, "", ""))
+
+
+def richness(p: Dict[str, Any]) -> Tuple[int, int]:
+    filled = sum(bool(p.get(k)) for k in TEXT_FIELDS + LIST_FIELDS)
+    return filled, sum(len(p.get(k) or []) for k in LIST_FIELDS) + len(p.get("short_desc") or "")
+
+
+def merge_group(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """En dolu satırı esas al; boş metin alanlarını tamamla, listeleri birleştir"""
+    ordered = sorted(rows, key=richness, reverse=True)
+    merged = dict(ordered[0])
+    for other in ordered[1:]:
+        for k in TEXT_FIELDS:
+            if not merged.get(k) and other.get(k):
+                merged[k] = other[k]
+        for k in LIST_FIELDS:
+            seen = {turkish_lower(v) for v in merged.get(k) or []}
+            extra = [v for v in other.get(k) or [] if turkish_lower(v) not in seen]
+            if extra:
+                merged[k] = list(merged.get(k) or []) + extra
+    return merged
+
+
+def content_text(p: Dict[str, Any]) -> str:
+    parts = [p.get("product_name") or "", p.get("category") or "", p.get("short_desc") or ""]
+    parts += [" ".join(p.get(k) or []) for k in LIST_FIELDS]
+    # Büyük harfle yazılmış sayfalarda i/ı ayrımı kaybolur: karşılaştırma ASCII üzerinden yapılır
+    text = fold(turkish_lower(" ".join(parts)))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def shingles(text: str) -> set:
+    if len(text) <= SHINGLE:
+        return {text}
+    return {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def minhash_signatures(sets: List[set], num_perm: int = NUM_PERM, seed: int = 1):
+    """Her küme için num_perm uzunluğunda MinHash imzası (h(x) = (a*x + b) mod 2^61-1)"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(sets), num_perm), dtype=np.uint64)
+    for i, items in enumerate(sets):
+        x = np.fromiter((int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                         for s in items), dtype=np.uint64, count=len(items))
+        # a, x < 2^32: çarpım uint64'e taşmadan sığar
+        signatures[i] = ((a[:, None] * x[None, :] + b[:, None]) % _MERSENNE).min(axis=1)
+    return signatures
+
+
+def identity(p: Dict[str, Any]) -> Tuple[set, str]:
+    """Ürün kodları (MAKS 804 -> "maks804", arama indeksiyle aynı kural) ve URL'nin son parçası"""
+    slug = urlsplit(p.get("url") or "").path.rstrip("/").rsplit("/", 1)[-1].lower()
+    text = f"{p.get('product_name') or ''} {slug.replace('-', ' ')}"
+    return set(product_codes(text)), slug
+
+
+def near_duplicate_pairs(products: List[Dict[str, Any]], threshold: float) -> Tuple[List[Tuple[int, int, float]], int]:
+    """LSH adaylarından Jaccard >= threshold olan çiftler ve ürün kodu farkı yüzünden atlanan aday sayısı"""
+    sets = [shingles(content_text(p)) for p in products]
+    if len(sets) < 2:
+        return [], 0
+    signatures = minhash_signatures(sets)
+    rows = NUM_PERM // BANDS
+    identities = [identity(p) for p in products]
+    candidates = set()
+    for band in range(BANDS):
+        buckets: Dict[bytes, List[int]] = {}
+        for i, key in enumerate(map(bytes, signatures[:, band * rows:(band + 1) * rows])):
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) > MAX_BUCKET:
+                # Şablon metinli büyük kovada tüm çiftler karesel büyür; yalnızca
+                # zaten birleşebilecek (ortak kod / aynı sayfa adı) çiftler aday olur
+                keyed: Dict[str, List[int]] = {}
+                for i in members:
+                    codes, slug = identities[i]
+                    for key in {f"s:{slug}"} | {f"c:{c}" for c in codes}:
+                        keyed.setdefault(key, []).append(i)
+                groups = [g for g in keyed.values() if len(g) > 1]
+            else:
+                groups = [members]
+            for group in groups:
+                candidates.update((x, y) for n, x in enumerate(group) for y in group[n + 1:])
+
+    pairs, skipped = [], 0
+    if not candidates:
+        return pairs, skipped
+    ordered = np.array(sorted(candidates), dtype=np.int64)
+    # İmzadaki eşit değer oranı Jaccard tahminidir; belirgin biçimde eşiğin altındakiler
+    # gerçek küme karşılaştırmasına girmez
+    estimate = np.concatenate([(signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+                               for chunk in np.array_split(ordered, max(1, len(ordered) // 50000))])
+    for i, j in ordered[estimate >= threshold - 0.15].tolist():
+        jaccard = len(sets[i] & sets[j]) / len(sets[i] | sets[j])
+        if jaccard < threshold:
+            continue
+        (codes_i, slug_i), (codes_j, slug_j) = identities[i], identities[j]
+        # Kazınmış sayfaların çoğu aynı menü metnini taşır: içerik benzerliği tek başına yetmez,
+        # aynı ürün kodu ya da farklı kategori yolunda aynı sayfa adı gerekir
+        if not (codes_i & codes_j or slug_i == slug_j):
+            skipped += 1
+            continue
+        pairs.append((i, j, round(jaccard, 3)))
+    return pairs, skipped
+
+
+def compact(sources: List[str], threshold: float = NEAR_DUP_THRESHOLD) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    report: Dict[str, Any] = {"sources": {}, "dropped": [], "url_merges": [], "content_merges": []}
+    rows: List[Tuple[str, Dict[str, Any]]] = []
+    for path in sources:
+        source_rows = read_source(path)
+        report["sources"][path] = len(source_rows)
+        rows.extend((path, r) for r in source_rows)
+
+    # 1) normalize: geçersizler atılır
+    valid: List[Tuple[str, Dict[str, Any]]] = []
+    for path, row in rows:
+        if not is_valid_url(row.get("url")):
+            report["dropped"].append({"source": path, "url": row.get("url"), "product_name": row.get("product_name"),
+                                      "reason": "invalid_url"})
+            continue
+        row = dict(row)
+        for k in LIST_FIELDS:
+            row[k] = list(row.get(k) or [])
+        valid.append((path, normalize_product(row)))
+
+    # 2) kanonik URL ile birleştir (ilk görülme sırası korunur)
+    groups: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+    for path, row in valid:
+        groups.setdefault(canonical_url(row["url"]), []).append((path, row))
+    by_url: List[Dict[str, Any]] = []
+    for url, members in groups.items():
+        merged = merge_group([r for _, r in members])
+        merged["url"] = url
+        by_url.append(merged)
+        if len(members) > 1:
+            report["url_merges"].append({"url": url, "rows": len(members),
+                                         "sources": sorted({p for p, _ in members}),
+                                         "variants": sorted({r["url"] for _, r in members} - {url})})
+
+    # 3) neredeyse aynı içerik: union-find ile kümele
+    pairs, skipped = near_duplicate_pairs(by_url, threshold)
+    parent = list(range(len(by_url)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    similarity: Dict[Tuple[int, int], float] = {}
+    for i, j, jaccard in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+        similarity[(i, j)] = jaccard
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(by_url)):
+        clusters.setdefault(find(i), []).append(i)
+    products: List[Dict[str, Any]] = []
+    for root in sorted(clusters):
+        members = clusters[root]
+        merged = merge_group([by_url[i] for i in members])
+        products.append(merged)
+        if len(members) > 1:
+            report["content_merges"].append({
+                "kept": merged["url"], "product_name": merged["product_name"],
+                "merged": [by_url[i]["url"] for i in members if by_url[i]["url"] != merged["url"]],
+                "min_jaccard": min(s for (i, j), s in similarity.items() if i in members and j in members),
+            })
+
+    report["summary"] = {
+        "input_rows": len(rows),
+        "dropped_invalid": len(report["dropped"]),
+        "merged_by_url": len(valid) - len(by_url),
+        "merged_by_content": len(by_url) - len(products),
+        "near_duplicates_kept_apart": skipped,
+        "output_rows": len(products),
+        "threshold": threshold,
+    }
+    return products, report
+
+
+def write_catalog(products: List[Dict[str, Any]], report: Dict[str, Any], out: str, sources: List[str]) -> str:
+    fields = TEXT_FIELDS[:3] + LIST_FIELDS + TEXT_FIELDS[3:]
+    text = "".join(json.dumps({k: p.get(k, [] if k in LIST_FIELDS else "") for k in fields}, ensure_ascii=False) + "\n"
+                   for p in products)
+    write_atomic(out, text)
+    meta = {
+        "rules_version": RULES_VERSION,
+        "catalog_hash": file_hash(out),
+        "sources": {path: file_hash(path) for path in sources},
+        "products": len(products),
+    }
+    write_atomic(meta_path(out), json.dumps(meta, ensure_ascii=False, indent=2) + "\n")
+    report_path = os.path.splitext(out)[0] + "_report.json"
+    write_atomic(report_path, json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+    return report_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kanonik katalog üret (normalizasyon + tekilleştirme)")
+    parser.add_argument("sources", nargs="*", help=f"JSONL/CSV kaynaklar (varsayılan: {', '.join(DEFAULT_SOURCES)})")
+    parser.add_argument("--out", default=CATALOG_PATH)
+    parser.add_argument("--threshold", type=float, default=NEAR_DUP_THRESHOLD, help="içerik benzerliği (Jaccard) eşiği")
+    args = parser.parse_args()
+
+    sources = args.sources or [p for p in DEFAULT_SOURCES if os.path.exists(p)]
+    t0 = time.perf_counter()
+    products, report = compact(sources, args.threshold)
+    report_path = write_catalog(products, report, args.out, sources)
+    s = report["summary"]
+    print(f"✅ {s['input_rows']} satır -> {s['output_rows']} ürün ({time.perf_counter() - t0:.2f}s): "
+          f"{s['dropped_invalid']} geçersiz atıldı, {s['merged_by_url']} URL tekrarı, "
+          f"{s['merged_by_content']} içerik tekrarı birleştirildi, "
+          f"{s['near_duplicates_kept_apart']} benzer içerikli farklı ürün çifti ayrı tutuldu")
+    print(f"ℹ️ Katalog -> {args.out}, rapor -> {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Yoğun vektör indeksi: nicemlenmiş ürün vektörleri + IVF yaklaşık en yakın komşu araması.
+
+Vektörler (bkz. embedding.py) diskte iki biçimden birinde tutulur:
+  int8      boyut başına ölçekle simetrik nicemleme (varsayılan, float32'nin 1/4'ü)
+  float16   ölçeksiz, yarı hassasiyet
+Sorgu vektörü ölçekle çarpılıp doğrudan nicemlenmiş satırlarla iç çarpılır.
+
+IVF (inverted file): ürünler k-means merkezlerine atanır ve diskte küme
+sırasıyla dizilir; her küme tek bir bitişik dilimdir. Sorguda sorguya en yakın
+`nprobe` kümenin dilimleri taranır. IVF_MIN_ROWS'tan küçük kataloglarda küme
+kurulmaz, tüm satırlar taranır (tam arama).
+
+Dosyalar (artefakt dizininde, hepsi mmap ile açılır):
+  dense_vectors.npy    küme sırasına göre vektörler (int8 / float16)
+  dense_scale.npy      boyut başına ölçek (float16'da 1)
+  dense_ids.npy        satır -> ürün numarası
+  dense_rows.npy       ürün numarası -> satır
+  dense_centroids.npy / dense_list_ptr.npy   küme merkezleri ve dilim sınırları
+  dense_meta.json + dense_encoder.json / dense_idf.npy / dense_components.npy
+"""
+import os
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from embedding import EMBEDDING_VERSION, fit_encoder, load_encoder
+
+DENSE_DTYPES = ("int8", "float16")
+# Bundan küçük kataloglarda IVF kurulmaz (tam tarama zaten hızlı)
+IVF_MIN_ROWS = 20000
+KMEANS_ITERATIONS = 8
+KMEANS_SAMPLE = 50000
+DEFAULT_NPROBE = 12
+# Tek seferde taranan satır sayısı (geçici float32 kopyası bellekte küçük kalsın)
+SCAN_CHUNK = 65536
+_ARRAYS = ("vectors", "scale", "ids", "rows", "centroids", "list_ptr")
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.ones(vectors.shape[1], dtype=np.float32)
+    scale = np.abs(vectors).max(axis=0) / 127
+    scale[scale == 0] = 1
+    return np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8), scale.astype(np.float32)
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Küresel k-means (kosinüs): normalize merkezler"""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), KMEANS_SAMPLE), replace=False)]
+    centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=k) == 0
+        # Boş kalan küme rastgele bir örnekle yeniden başlar
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class DenseIndex:
+    """Kodlayıcı + nicemlenmiş vektörler + (büyük kataloglarda) IVF kümeleri"""
+
+    def __init__(self, encoder, arrays: Dict[str, np.ndarray], dtype: str, nprobe: int = DEFAULT_NPROBE):
+        self.encoder = encoder
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self.dtype = dtype
+        self.nprobe = nprobe
+
+    # --- kurulum -------------------------------------------------------------
+
+    @classmethod
+    def build(cls, texts: List[str], encoder=None, dtype: Optional[str] = None) -> "DenseIndex":
+        """Ürün metinlerinden indeks; encoder verilirse (artımlı yenileme) yeniden fit edilmez"""
+        dtype = dtype or os.getenv("DENSE_DTYPE", "int8")
+        if dtype not in DENSE_DTYPES:
+            raise ValueError(f"Bilinmeyen vektör tipi: {dtype} (seçenekler: {', '.join(DENSE_DTYPES)})")
+        encoder = encoder or fit_encoder(texts)
+        vectors = encoder.encode(texts)
+        n = len(vectors)
+        if n >= IVF_MIN_ROWS:
+            centroids = kmeans(vectors, int(np.sqrt(n)))
+            assign = np.empty(n, dtype=np.int64)
+            for start in range(0, n, SCAN_CHUNK):
+                assign[start:start + SCAN_CHUNK] = np.argmax(vectors[start:start + SCAN_CHUNK] @ centroids.T, axis=1)
+            ids = np.argsort(assign, kind="stable")
+            list_ptr = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+        else:
+            centroids = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            ids = np.arange(n)
+            list_ptr = np.array([0, n])
+        rows = np.empty(n, dtype=np.int64)
+        rows[ids] = np.arange(n)
+        quantized, scale = quantize(vectors[ids], dtype)
+        return cls(encoder, {"vectors": quantized, "scale": scale, "ids": ids.astype(np.int32),
+                             "rows": rows.astype(np.int32), "centroids": centroids,
+                             "list_ptr": list_ptr.astype(np.int64)}, dtype,
+                   int(os.getenv("DENSE_NPROBE", str(DEFAULT_NPROBE))))
+
+    def save(self, directory: str):
+        self.encoder.save(directory)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"dense_{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "dense_meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": EMBEDDING_VERSION, "dtype": self.dtype, "n_docs": len(self.ids),
+                       "dim": int(self.vectors.shape[1]), "lists": len(self.centroids)}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["DenseIndex"]:
+        meta_path = os.path.join(directory, "dense_meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != EMBEDDING_VERSION:
+            return None
+        encoder = load_encoder(directory)
+        if encoder is None:
+            return None
+        arrays = {name: np.load(os.path.join(directory, f"dense_{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+        return cls(encoder, arrays, meta["dtype"], int(os.getenv("DENSE_NPROBE", str(DEFAULT_NPROBE))))
+
+    def nbytes(self) -> int:
+        return int(sum(getattr(self, name).nbytes for name in _ARRAYS))
+
+    # --- sorgu ---------------------------------------------------------------
+
+    def encode_query(self, query: str) -> np.ndarray:
+        return self.encoder.encode_query(query)
+
+    def _scan(self, query: np.ndarray, lo: int, hi: int) -> np.ndarray:
+        # Ölçek sorguya uygulanır: satırlar nicemlenmiş hâliyle okunur
+        scaled = (query * self.scale).astype(np.float32)
+        out = np.empty(hi - lo, dtype=np.float32)
+        for start in range(lo, hi, SCAN_CHUNK):
+            end = min(hi, start + SCAN_CHUNK)
+            out[start - lo:end - lo] = self.vectors[start:end].astype(np.float32) @ scaled
+        return out
+
+    def score(self, query: np.ndarray, docs: np.ndarray) -> np.ndarray:
+        """Verilen ürünlerin (nicemlenmiş vektörle) kosinüs benzerliği"""
+        scaled = (query * self.scale).astype(np.float32)
+        return np.asarray(self.vectors[np.asarray(self.rows)[docs]], dtype=np.float32) @ scaled
+
+    def search(self, query: np.ndarray, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Yaklaşık en yakın k ürün ve skorları (azalan); allowed: ürün başına bool maske"""
+        if not len(self.ids) or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        n_lists = len(self.list_ptr) - 1
+        order = np.argsort(-(self.centroids @ query)) if len(self.centroids) else np.arange(1)
+        probe = min(self.nprobe, n_lists) if len(self.centroids) else 1
+        while True:
+            lists = np.sort(order[:probe])
+            docs_parts, score_parts = [], []
+            for lst in lists.tolist():
+                lo, hi = int(self.list_ptr[lst]), int(self.list_ptr[lst + 1])
+                if hi > lo:
+                    docs_parts.append(np.asarray(self.ids[lo:hi]))
+                    score_parts.append(self._scan(query, lo, hi))
+            docs = np.concatenate(docs_parts) if docs_parts else np.zeros(0, dtype=np.int32)
+            scores = np.concatenate(score_parts) if score_parts else np.zeros(0, dtype=np.float32)
+            if allowed is not None:
+                keep = allowed[docs]
+                docs, scores = docs[keep], scores[keep]
+            # Filtre kümelerin çoğunu boşalttıysa daha fazla küme açılır
+            if len(docs) >= k or probe >= n_lists:
+                break
+            probe = min(n_lists, probe * 2)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[top], scores[top]
+        best = np.lexsort((docs, -scores))
+        return docs[best].astype(np.int64), scores[best]
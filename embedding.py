@@ -0,0 +1,334 @@
+"""Deneysel dense motoru için yerel, yalnızca CPU'da çalışan metin kodlayıcıları.
+
+İki kodlayıcı vardır; ikisi de ağ erişimi olmadan derlenir ve sorgulanır:
+
+  lsa        yerleşik yedek; gömme modeli değil, eş anlamlı genişleticidir. İki parçalı vektör:
+             - biçim benzerliği: token + karakter n-gram'larının (kireç /
+               kireçlenme ortak parçalar taşır) TF-IDF'ine kesik SVD (LSA).
+               Yalnızca katalog metninden fit edilir, eş anlamlı bilmez
+             - elle yazılmış eş anlamlı genişletme: CONCEPTS sözlüğündeki her
+               kavram bir boyut; "kireç", "kabuk", "antiskalant" aynı boyutu
+               etkinleştirir. Katalogda geçmeyen kelimeyle sorulan ihtiyaç
+               (borularda kireç -> antiskalant) yalnızca kelime bu sözlükteyse
+               eşleşir; sözlük dışındaki eş anlamlılar için kazanç küçüktür
+               (bench/queries_intent_holdout.jsonl)
+  sentence   anlamsal arama için gereken kodlayıcı: EMBEDDING_MODEL yerel bir
+             sentence-transformers model dizinini gösteriyorsa (ör.
+             paraphrase-multilingual-MiniLM-L12-v2) o model; paket kurulu
+             değilse ya da dizin yoksa uyarıyla lsa kullanılır
+
+Vektörler L2 normalize edilir; iç çarpım kosinüs benzerliğidir.
+"""
+import os
+import json
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from text_analysis import get_analyzer, normalize_token
+
+# Kodlama kuralları / kavram sözlüğü değişince artırılır: eski yoğun indeks yeniden derlenir
+EMBEDDING_VERSION = 1
+LSA_DIM = 128
+CHAR_NGRAM = (3, 5)
+# SVD en fazla bu kadar ürünle fit edilir; tüm ürünler sonra bu uzaya izdüşürülür
+FIT_SAMPLE = 20000
+# Kavram boyutlarının kosinüsteki payı (geri kalanı LSA)
+CONCEPT_WEIGHT = 0.5
+
+# Su şartlandırma alanında aynı ihtiyacı anlatan kelimeler; elle yazılmıştır
+# (bench/queries_intent.jsonl bu tabloya bakılarak yazıldığından isabeti
+# ayrılmış set üzerinden ölçülür). Terimler token
+# gibi normalize edilir; 4+ karakterli terimler önek olarak da eşleşir
+# (kireç -> kireçlenme, kule -> kulesinde)
+CONCEPTS: Dict[str, Tuple[str, ...]] = {
+    "kireç": ("kireç", "kireçlenme", "kabuk", "kabuklaşma", "tortu", "birikinti", "birikme", "antiskalant",
+              "taşlaşma", "çökelti", "silis", "kalsiyum", "sertlik"),
+    "korozyon": ("korozyon", "pas", "paslanma", "aşınma", "inhibitör", "oksidasyon", "çürüme", "pasivasyon"),
+    "oksijen": ("oksijen", "çözünmüş", "deoksijenasyon", "hidrazin", "sülfit"),
+    "mikroorganizma": ("mikroorganizma", "mikrop", "bakteri", "yosun", "alg", "biyosit", "biyofilm", "lejyonella",
+                       "legionella", "küf", "balçık", "sanitasyon", "dezenfeksiyon", "dekstran"),
+    "köpük": ("köpük", "köpürme", "köpüklenme", "antifoam"),
+    "membran": ("membran", "osmoz", "ozmoz", "tıkanma", "fouling", "ultrafiltrasyon", "nanofiltrasyon"),
+    "tuz": ("tuz", "tuzlu", "tuzsuzlaştırma", "desalinasyon", "deniz", "elektrodiyaliz", "arındırma"),
+    "sertlik": ("sertlik", "sert", "yumuşatma", "reçine", "kalsiyum"),
+    "yağ": ("yağ", "yağlı", "gres", "çözücü", "hidrokarbon"),
+    "temizlik": ("temizlik", "temizleyici", "temizleme", "yıkama", "kir", "kirli", "parlatıcı", "kaynatma"),
+    "kazan": ("kazan", "buhar", "kondens", "kondensat", "besleme"),
+    "soğutma": ("soğutma", "kule", "eşanjör", "chiller"),
+    "çöktürme": ("flokülant", "koagülant", "polielektrolit", "polimer", "çöktürme", "bulanıklık", "durultma",
+                 "çamur", "askıda", "berraklaştırma", "tufal"),
+    "kükürt": ("h2s", "hidrojen", "sülfür", "kükürt", "koku", "merkaptan"),
+    "emülsiyon": ("emülsiyon", "ayrıştırma", "ayrışma", "demülsifiyer"),
+    "petrol": ("petrol", "rafineri", "distilasyon", "petrokimya"),
+    "şeker": ("şeker", "evaporatör", "pancar", "şurup", "şerbet", "melas"),
+    "asit": ("asit", "asidik", "alkali", "kostik", "ph", "nötralizasyon"),
+}
+CONCEPT_NAMES = tuple(CONCEPTS)
+
+
+def _concept_terms() -> Dict[str, List[int]]:
+    terms: Dict[str, List[int]] = {}
+    for c, name in enumerate(CONCEPT_NAMES):
+        for word in CONCEPTS[name]:
+            terms.setdefault(normalize_token(word), []).append(c)
+    return terms
+
+
+_CONCEPT_TERMS = _concept_terms()
+
+
+def _stem_prefixes() -> Dict[Tuple[str, int], List[str]]:
+    prefixes: Dict[Tuple[str, int], List[str]] = {}
+    for term in _CONCEPT_TERMS:
+        for extra in (1, 2):
+            if len(term) - extra >= 4:
+                prefixes.setdefault((term[:-extra], extra), []).append(term)
+    return prefixes
+
+
+_STEM_PREFIXES = _stem_prefixes()
+
+
+@lru_cache(maxsize=50000)
+def token_concepts(token: str) -> Tuple[int, ...]:
+    """Normalize token'ın etkinleştirdiği kavramlar"""
+    found = set(_CONCEPT_TERMS.get(token, ()))
+    # Önek eşleşmesi: kireclenme -> kirec; ek atma fazla kestiyse (kazanda -> kaza) ters yön
+    for length in range(4, len(token)):
+        found.update(_CONCEPT_TERMS.get(token[:length], ()))
+    if len(token) >= 4:
+        for extra in (1, 2):
+            for term in _STEM_PREFIXES.get((token, extra), ()):
+                found.update(_CONCEPT_TERMS[term])
+    return tuple(sorted(found))
+
+
+@lru_cache(maxsize=50000)
+def token_features(token: str) -> Tuple[str, ...]:
+    """Token'ın kendisi ve sınır işaretli karakter n-gram'ları ("<kir", "rec>")"""
+    if any(ch.isdigit() for ch in token):
+        # Ürün kodları parça parça benzemesin: yalnızca tam token
+        return (token,)
+    marked = f"<{token}>"
+    low, high = CHAR_NGRAM
+    grams = [marked[i:i + n] for n in range(low, high + 1) for i in range(len(marked) - n + 1)]
+    return (token,) + tuple(dict.fromkeys(grams))
+
+
+def _l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+class LsaEncoder:
+    """Katalogdan fit edilen LSA uzayı + elle yazılmış eş anlamlı (kavram) boyutları"""
+
+    kind = "lsa"
+
+    def __init__(self, vocabulary: Dict[str, int], idf: np.ndarray, components: np.ndarray,
+                 concept_weight: float = CONCEPT_WEIGHT):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        # (özellik, boyut): token/n-gram TF-IDF'inden LSA uzayına izdüşüm
+        self.components = components
+        self.concept_weight = concept_weight
+        self._analyzer = get_analyzer((1, 1))
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[1] + len(CONCEPT_NAMES)
+
+    # --- fit -----------------------------------------------------------------
+
+    @classmethod
+    def fit(cls, texts: List[str], dim: int = LSA_DIM, seed: int = 0) -> "LsaEncoder":
+        from sklearn.utils.extmath import randomized_svd
+
+        encoder = cls({}, np.ones(0), np.zeros((0, 0), dtype=np.float32))
+        docs, tokens = encoder._documents(texts)
+        for token in tokens:
+            for feature in token_features(token):
+                encoder.vocabulary.setdefault(feature, len(encoder.vocabulary))
+        counts = (docs @ encoder._feature_matrix(tokens)).tocsr()
+        df = np.bincount(counts.indices, minlength=len(encoder.vocabulary))
+        encoder.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        weighted = encoder._weigh(counts)
+        if len(texts) > FIT_SAMPLE:
+            rows = np.random.default_rng(seed).choice(len(texts), FIT_SAMPLE, replace=False)
+            weighted = weighted[np.sort(rows)]
+        dim = max(1, min(dim, weighted.shape[0] - 1, weighted.shape[1] - 1))
+        _, _, vt = randomized_svd(weighted, dim, n_iter=5, random_state=seed)
+        # Diskteki float16 hassasiyetine yuvarlanır: canlı fit ile yüklenen artefakt aynı sıralamayı verir
+        encoder.components = np.ascontiguousarray(vt.T.astype(np.float16), dtype=np.float32)
+        return encoder
+
+    # --- kodlama ---------------------------------------------------------------
+
+    def _documents(self, texts: List[str]) -> Tuple[sp.csr_matrix, List[str]]:
+        """Metin x token sayı matrisi ve sütun sırasıyla tokenlar"""
+        token_ids: Dict[str, int] = {}
+        cols: List[int] = []
+        indptr = [0]
+        for text in texts:
+            cols.extend(token_ids.setdefault(t, len(token_ids)) for t in self._analyzer.tokenize(text))
+            indptr.append(len(cols))
+        docs = sp.csr_matrix((np.ones(len(cols), dtype=np.float32), np.array(cols, dtype=np.int64),
+                              np.array(indptr, dtype=np.int64)), shape=(len(texts), len(token_ids)))
+        docs.sum_duplicates()
+        return docs, list(token_ids)
+
+    def _feature_matrix(self, tokens: List[str]) -> sp.csr_matrix:
+        """Token x özellik (token + karakter n-gram'ları) ikili matrisi; sözlük dışı özellikler atlanır"""
+        vocabulary = self.vocabulary
+        rows: List[int] = []
+        cols: List[int] = []
+        for t, token in enumerate(tokens):
+            ids = [vocabulary[f] for f in token_features(token) if f in vocabulary]
+            cols.extend(ids)
+            rows.extend([t] * len(ids))
+        return sp.csr_matrix((np.ones(len(cols), dtype=np.float32), (rows, cols)), shape=(len(tokens), len(vocabulary)))
+
+    def _concept_matrix(self, tokens: List[str]) -> sp.csr_matrix:
+        rows: List[int] = []
+        cols: List[int] = []
+        for t, token in enumerate(tokens):
+            found = token_concepts(token)
+            cols.extend(found)
+            rows.extend([t] * len(found))
+        return sp.csr_matrix((np.ones(len(cols), dtype=np.float32), (rows, cols)),
+                             shape=(len(tokens), len(CONCEPT_NAMES)))
+
+    def _weigh(self, counts: sp.csr_matrix) -> sp.csr_matrix:
+        """Logaritmik TF x IDF, satır başına L2 normalize"""
+        weighted = counts.copy()
+        weighted.data = (np.log1p(weighted.data) * self.idf[weighted.indices]).astype(np.float32)
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        # float32 kalmalı: float64 satır float32 bileşen matrisini her çarpımda tümüyle kopyalatır
+        return (sp.diags((1 / norms).astype(np.float32)) @ weighted).tocsr()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        docs, tokens = self._documents(texts)
+        counts = (docs @ self._feature_matrix(tokens)).tocsr()
+        lsa = np.asarray(self._weigh(counts) @ self.components, dtype=np.float32)
+        # Kavram sayımında her token metin başına bir kez sayılır
+        present = docs.copy()
+        present.data[:] = 1
+        return self._combine(lsa, (present @ self._concept_matrix(tokens)).toarray())
+
+    def encode_query(self, text: str) -> np.ndarray:
+        """Tek metin: seyrek matris kurmadan, yalnızca geçen özelliklerin bileşen satırları okunur"""
+        tokens = self._analyzer.tokenize(text)
+        counts: Dict[int, int] = {}
+        for token in tokens:
+            for feature in token_features(token):
+                i = self.vocabulary.get(feature)
+                if i is not None:
+                    counts[i] = counts.get(i, 0) + 1
+        concepts = np.zeros((1, len(CONCEPT_NAMES)), dtype=np.float32)
+        for token in set(tokens):
+            for c in token_concepts(token):
+                concepts[0, c] += 1
+        ids = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        weights = (np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts))) * self.idf[ids])
+        # Satır normu sonuçta yeniden normalize edildiği için burada atlanır
+        lsa = weights.astype(np.float32) @ self.components[ids]
+        return self._combine(lsa[None, :], concepts)[0]
+
+    def _combine(self, lsa: np.ndarray, concepts: np.ndarray) -> np.ndarray:
+        # Kavram bulunmayan metinde vektör yalnızca LSA kısmından oluşur
+        vectors = np.hstack([_l2_normalize(lsa) * np.sqrt(1 - self.concept_weight),
+                             _l2_normalize(concepts) * np.sqrt(self.concept_weight)])
+        return _l2_normalize(vectors).astype(np.float32)
+
+    # --- kalıcılık ---------------------------------------------------------------
+
+    def save(self, directory: str, prefix: str = "dense_"):
+        terms = [""] * len(self.vocabulary)
+        for term, i in self.vocabulary.items():
+            terms[i] = term
+        np.save(os.path.join(directory, f"{prefix}idf.npy"), self.idf.astype(np.float32))
+        np.save(os.path.join(directory, f"{prefix}components.npy"), self.components.astype(np.float16))
+        with open(os.path.join(directory, f"{prefix}encoder.json"), "w", encoding="utf-8") as f:
+            json.dump({"kind": self.kind, "version": EMBEDDING_VERSION, "concepts": CONCEPTS,
+                       "concept_weight": self.concept_weight, "terms": terms}, f, ensure_ascii=False)
+
+    @classmethod
+    def from_meta(cls, directory: str, meta: Dict, prefix: str = "dense_") -> Optional["LsaEncoder"]:
+        # JSON'da tuple'lar listeye döner
+        if meta.get("concepts") != {k: list(v) for k, v in CONCEPTS.items()}:
+            return None
+        idf = np.load(os.path.join(directory, f"{prefix}idf.npy"))
+        # Sorguda yalnızca birkaç satır okunur; float32'ye bir kez çevrilir (küçük matris)
+        components = np.load(os.path.join(directory, f"{prefix}components.npy")).astype(np.float32)
+        return cls({t: i for i, t in enumerate(meta["terms"])}, idf, components, meta["concept_weight"])
+
+
+class SentenceEncoder:
+    """Yerel dizinden yüklenen sentence-transformers modeli (isteğe bağlı bağımlılık)"""
+
+    kind = "sentence"
+
+    def __init__(self, model_path: str, query_prefix: str = "", doc_prefix: str = ""):
+        # Hub'a gidilmesin: yalnızca yerel dosyalar
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+        from sentence_transformers import SentenceTransformer
+
+        self.model_path = model_path
+        self.query_prefix = query_prefix
+        self.doc_prefix = doc_prefix
+        self.model = SentenceTransformer(model_path, device="cpu")
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+
+    def encode(self, texts: List[str], query: bool = False) -> np.ndarray:
+        prefix = self.query_prefix if query else self.doc_prefix
+        vectors = self.model.encode([prefix + t for t in texts], batch_size=64, normalize_embeddings=True,
+                                    convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def encode_query(self, text: str) -> np.ndarray:
+        return self.encode([text], query=True)[0]
+
+    def save(self, directory: str, prefix: str = "dense_"):
+        with open(os.path.join(directory, f"{prefix}encoder.json"), "w", encoding="utf-8") as f:
+            json.dump({"kind": self.kind, "version": EMBEDDING_VERSION, "model": self.model_path,
+                       "query_prefix": self.query_prefix, "doc_prefix": self.doc_prefix}, f, ensure_ascii=False)
+
+
+def fit_encoder(texts: List[str]):
+    """EMBEDDING_MODEL yerel bir model dizini ise onu, değilse katalogdan LSA kodlayıcıyı kur"""
+    model_path = os.getenv("EMBEDDING_MODEL", "")
+    if model_path:
+        try:
+            return SentenceEncoder(model_path, os.getenv("EMBEDDING_QUERY_PREFIX", ""),
+                                   os.getenv("EMBEDDING_DOC_PREFIX", ""))
+        except Exception as e:
+            # Paket kurulu değil / model dizini yok: yerleşik modele düş
+            print(f"⚠️ Gömme modeli yüklenemedi ({model_path}): {e}; yerleşik LSA kodlayıcı kullanılıyor")
+    else:
+        print("ℹ️ EMBEDDING_MODEL verilmedi: dense motoru (deneysel) LSA + eş anlamlı sözlüğüyle çalışıyor, "
+              "gömme modeli değil")
+    return LsaEncoder.fit(texts)
+
+
+def load_encoder(directory: str, prefix: str = "dense_"):
+    """Artefakttaki kodlayıcıyı aç; sürüm/sözlük uyuşmuyorsa ya da model yoksa None"""
+    path = os.path.join(directory, f"{prefix}encoder.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != EMBEDDING_VERSION:
+        return None
+    if meta.get("kind") == "sentence":
+        try:
+            return SentenceEncoder(meta["model"], meta.get("query_prefix", ""), meta.get("doc_prefix", ""))
+        except Exception as e:
+            print(f"⚠️ Gömme modeli yüklenemedi ({meta['model']}): {e}")
+            return None
+    return LsaEncoder.from_meta(directory, meta, prefix)
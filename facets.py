@@ -0,0 +1,153 @@
+"""Ürün alanları için önceden hesaplanmış faset (filtre) indeksi.
+
+Her faset değeri için ürün numaralarının sıralı dizisi tutulur (değer -> ID
+listesi). Sorgu anında seçilen değerlerden katalog boyunda bir bool maske
+kurulur: aynı alandaki değerler VEYA, farklı alanlar VE ile birleşir. Faset
+sayımları için ayrıca ürün -> değerler (ileri) dizisi tutulur; sayım yalnızca
+filtreye uyan ürünlerin değerleri üzerinde tek bincount'tur, değer sayısı
+artsa da Python döngüsüne düşülmez.
+
+    facets.select({"category": ["Soğutma Suyu Islahı"]})  # -> sıralı ürün numaraları
+    facets.counts({"applications": ["buhar kazanları"]})   # -> alan başına değer/adet
+"""
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from product_store import ProductStore
+from text_analysis import fold, turkish_lower
+
+FACET_FIELDS = ("category", "applications", "problems_solved", "key_params")
+
+
+def facet_key(value: Any) -> str:
+    """Filtre eşleştirmesi için normalize değer: Türkçe küçük harf, ASCII katlama, tek boşluk"""
+    return " ".join(fold(turkish_lower(str(value))).split())
+
+
+def _values(value: Any) -> Iterable[str]:
+    if not value:
+        return ()
+    return value if isinstance(value, list) else (value,)
+
+
+def _column(products: Sequence[Mapping], field: str) -> List[Any]:
+    if isinstance(products, ProductStore):
+        return products.column(field)
+    return [p.get(field) for p in products]
+
+
+class FacetField:
+    """Tek alanın değer -> ürün numaraları eşlemesi (CSR düzeninde)"""
+
+    __slots__ = ("labels", "keys", "ptr", "docs", "doc_ptr", "doc_values")
+
+    def __init__(self, labels: List[str], keys: Dict[str, int], ptr: np.ndarray, docs: np.ndarray, n_docs: int):
+        # Gösterim için ilk görülen yazım; eşleştirme normalize anahtarla
+        self.labels = labels
+        self.keys = keys
+        self.ptr = ptr
+        self.docs = docs
+        # Aynı eşlemenin ürün sırasına göre hâli: ürünün değerleri doc_values[doc_ptr[d]:doc_ptr[d + 1]]
+        value_of = np.repeat(np.arange(len(labels), dtype=np.int32), np.diff(ptr))
+        order = np.argsort(docs, kind="stable")
+        self.doc_values = value_of[order]
+        self.doc_ptr = np.zeros(n_docs + 1, dtype=np.int64)
+        self.doc_ptr[1:] = np.cumsum(np.bincount(docs, minlength=n_docs))
+
+    def count(self, selected: np.ndarray) -> np.ndarray:
+        """Seçili (sıralı) ürünlerde değer başına adet"""
+        starts, ends = self.doc_ptr[selected], self.doc_ptr[selected + 1]
+        lengths = ends - starts
+        # Seçili ürünlerin değer dilimlerini tek dizin dizisinde birleştir
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        values = self.doc_values[offsets + np.arange(int(lengths.sum()))]
+        return np.bincount(values, minlength=len(self.labels))
+
+    def ids(self, value: str) -> np.ndarray:
+        v = self.keys.get(facet_key(value))
+        if v is None:
+            return self.docs[:0]
+        return self.docs[self.ptr[v]:self.ptr[v + 1]]
+
+
+class FacetIndex:
+    """Anlık görüntü başına kurulan, salt okunur faset indeksi"""
+
+    def __init__(self, n_docs: int, fields: Dict[str, FacetField], searchable: Optional[np.ndarray] = None):
+        self.n_docs = n_docs
+        self.fields = fields
+        # Filtre yokken "toplam" aranabilir ürün sayısıdır
+        self.searchable = searchable if searchable is not None else np.ones(n_docs, dtype=bool)
+
+    @classmethod
+    def build(cls, products: Sequence[Mapping], valid: Optional[np.ndarray] = None) -> "FacetIndex":
+        """Geçerli ürünlerden faset indeksi kur (geçersiz ürünler aramada da gösterilmez)"""
+        fields: Dict[str, FacetField] = {}
+        # Katalogda aynı değerler çok tekrar eder: normalizasyon değer başına bir kez
+        normalized: Dict[str, str] = {}
+        for field in FACET_FIELDS:
+            labels: List[str] = []
+            keys: Dict[str, int] = {}
+            members: List[List[int]] = []
+            for doc, raw in enumerate(_column(products, field)):
+                if valid is not None and not valid[doc]:
+                    continue
+                for value in _values(raw):
+                    key = normalized.get(value)
+                    if key is None:
+                        key = normalized[value] = facet_key(value)
+                    if not key:
+                        continue
+                    v = keys.get(key)
+                    if v is None:
+                        v = keys[key] = len(labels)
+                        labels.append(str(value).strip())
+                        members.append([])
+                    # Aynı ürün listede bir değeri iki kez taşıyabilir
+                    if not members[v] or members[v][-1] != doc:
+                        members[v].append(doc)
+            ptr = np.zeros(len(labels) + 1, dtype=np.int64)
+            ptr[1:] = np.cumsum([len(m) for m in members])
+            docs = np.fromiter((doc for m in members for doc in m), dtype=np.int32, count=int(ptr[-1]))
+            fields[field] = FacetField(labels, keys, ptr, docs, len(products))
+        return cls(len(products), fields, valid)
+
+    def _check(self, filters: Dict[str, List[str]]):
+        unknown = [f for f in filters if f not in self.fields]
+        if unknown:
+            raise ValueError(f"Bilinmeyen filtre alanı: {', '.join(unknown)} (seçenekler: {', '.join(FACET_FIELDS)})")
+
+    def mask(self, filters: Optional[Dict[str, List[str]]]) -> Optional[np.ndarray]:
+        """Filtreye uyan ürünler için bool maske; filtre yoksa None"""
+        filters = {f: v for f, v in (filters or {}).items() if v}
+        if not filters:
+            return None
+        self._check(filters)
+        result: Optional[np.ndarray] = None
+        for field, values in filters.items():
+            facet = self.fields[field]
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            for value in ([values] if isinstance(values, str) else values):
+                allowed[facet.ids(value)] = True
+            result = allowed if result is None else result & allowed
+        return result
+
+    def select(self, filters: Optional[Dict[str, List[str]]]) -> Optional[np.ndarray]:
+        """Filtreye uyan ürün numaraları (sıralı); filtre yoksa None"""
+        mask = self.mask(filters)
+        return None if mask is None else np.flatnonzero(mask)
+
+    def counts(self, filters: Optional[Dict[str, List[str]]] = None, limit: int = 20) -> Dict[str, Any]:
+        """Filtreye uyan ürünlerde alan başına değer sayıları (adede göre azalan, alan başına en çok limit)"""
+        selected = self.select(filters)
+        total = int(self.searchable.sum()) if selected is None else len(selected)
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        for field, facet in self.fields.items():
+            counts = np.diff(facet.ptr) if selected is None else facet.count(selected)
+            order = np.lexsort((np.arange(len(counts)), -counts))
+            order = order[counts[order] > 0][:limit]
+            result[field] = [{"value": facet.labels[v], "count": int(counts[v])} for v in order]
+        return {"total": total, "facets": result}
+
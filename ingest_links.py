@@ -1,20 +1,36 @@
 #!/usr/bin/env python3
+"""Ürün sayfalarını çekip data/products.jsonl'e URL'ye göre upsert eder.
+
+    python ingest_links.py [--workers 8] [--rate 3] [--full]
+
+- Sınırlı eşzamanlılık: thread başına keep-alive bağlantılı requests.Session
+- Host başına hız sınırı (sabit time.sleep yerine)
+- Koşullu istekler: ETag / Last-Modified data/ingest_state.json'da tutulur,
+  değişmeyen sayfalar (304) atlanır
+- Çıktı URL anahtarlı upsert; tekrar çalıştırmak satır çoğaltmaz
+- Elle düzenlenmiş alanlar korunur: sayfadan okunan değer yalnızca alan boşsa ya
+  da son çekimde sayfadan okunan değerle aynıysa yazılır (bkz. merge_product)
+"""
 import os, json, sys, time
-from typing import Dict
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 
 UA = {"User-Agent": "Mozilla/5.0 (BimaksIngest/1.0)"}
 LINKS_FILE = os.path.join("data","product_links.txt")
 OUT_JSONL = os.path.join("data","products.jsonl")
+STATE_FILE = os.path.join("data","ingest_state.json")
 
 def clean(text: str) -> str:
     return " ".join((text or "").split()).strip()
 
-def parse_product(url: str) -> Dict:
-    r = requests.get(url, headers=UA, timeout=25)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
+def parse_product_html(url: str, html: str) -> Dict:
+    soup = BeautifulSoup(html, "html.parser")
     title_el = soup.select_one("h1") or soup.select_one(".entry-title")
     title = clean(title_el.get_text()) if title_el else url.rstrip("/").rsplit("/",1)[-1].replace("-"," ").upper()
     body_el = soup.select_one(".entry-content") or soup.select_one("main") or soup
@@ -30,25 +46,169 @@ def parse_product(url: str) -> Dict:
         "url": url
     }
 
-def main():
-    if not os.path.exists(LINKS_FILE):
-        print(f"Bulunamadı: {LINKS_FILE}")
-        sys.exit(1)
-    os.makedirs(os.path.dirname(OUT_JSONL), exist_ok=True)
-    added = 0
-    with open(LINKS_FILE, "r", encoding="utf-8") as f, open(OUT_JSONL, "a", encoding="utf-8") as out:
+def parse_product(url: str) -> Dict:
+    r = requests.get(url, headers=UA, timeout=25)
+    r.raise_for_status()
+    return parse_product_html(url, r.text)
+
+
+class HostRateLimiter:
+    """Host başına saniyede en fazla `rate` istek; slotlar thread'ler arasında sırayla dağıtılır"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Fetcher:
+    """Thread başına keep-alive Session ile koşullu GET"""
+
+    def __init__(self, limiter: HostRateLimiter, pool_size: int, timeout: float = 25):
+        self.limiter = limiter
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(UA)
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def fetch(self, url: str, validators: Optional[Dict]) -> Tuple[int, Optional[str], Dict]:
+        """(status, html, yeni doğrulayıcılar) döndürür; 304'te html None"""
+        headers = {}
+        if validators:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+        self.limiter.wait(urlparse(url).netloc)
+        r = self._session().get(url, headers=headers, timeout=self.timeout)
+        if r.status_code == 304:
+            return 304, None, validators or {}
+        r.raise_for_status()
+        new_validators = {
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+        }
+        return r.status_code, r.text, {k: v for k, v in new_validators.items() if v}
+
+
+def read_links(path: str) -> list:
+    links = []
+    with open(path, "r", encoding="utf-8") as f:
         for line in f:
             url = line.strip()
-            if not url or url.startswith("#"): continue
+            if url and not url.startswith("#"):
+                links.append(url)
+    return list(dict.fromkeys(links))
+
+def load_catalog(path: str) -> Dict[str, Dict]:
+    """Mevcut JSONL'i URL anahtarlı sözlüğe oku (eski tekrarlı satırlar burada birleşir)"""
+    catalog: Dict[str, Dict] = {}
+    if not os.path.exists(path):
+        return catalog
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            url = row.get("url") or ""
+            # Eski append-only tekrarları: sonraki satır daha yeni bir çekimdir, boş olmayan alanları geçer
+            catalog[url] = merge_product(catalog.get(url), row, catalog.get(url))
+    return catalog
+
+def merge_product(old: Optional[Dict], new: Dict, scraped: Optional[Dict] = None) -> Dict:
+    """Sayfadan okunan değer yalnızca eldeki alan boşsa ya da eldeki değer son çekimde sayfadan
+    okunanla aynıysa (elle düzenlenmemişse) yazılır; elle zenginleştirilmiş ad, kategori,
+    açıklama ve listeler korunur. scraped: bu URL'de son çekimde sayfadan okunan alanlar"""
+    if not old:
+        return dict(new)
+    scraped = scraped or {}
+    merged = dict(old)
+    for field, value in new.items():
+        if value and (not old.get(field) or (field in scraped and old.get(field) == scraped[field])):
+            merged[field] = value
+    return merged
+
+def write_atomic(path: str, text: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def load_state(path: str) -> Dict[str, Dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def ingest(links_file: str = LINKS_FILE, out_jsonl: str = OUT_JSONL, state_file: str = STATE_FILE,
+           workers: int = 8, rate: float = 3.0, full: bool = False) -> Dict[str, int]:
+    links = read_links(links_file)
+    catalog = load_catalog(out_jsonl)
+    # --full yalnızca koşullu istekleri kapatır; son çekilen alanlar birleştirme için yine okunur
+    state = load_state(state_file)
+    fetcher = Fetcher(HostRateLimiter(rate), pool_size=workers)
+    stats = {"added": 0, "updated": 0, "unchanged": 0, "failed": 0}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fetcher.fetch, url, state.get(url) if url in catalog and not full else None): url
+            for url in links
+        }
+        for future in as_completed(futures):
+            url = futures[future]
             try:
-                time.sleep(0.3)
-                data = parse_product(url)
-                out.write(json.dumps(data, ensure_ascii=False) + "\n")
-                added += 1
+                status, html, validators = future.result()
+                if status == 304:
+                    stats["unchanged"] += 1
+                    continue
+                data = parse_product_html(url, html)
+                stats["updated" if url in catalog else "added"] += 1
+                catalog[url] = merge_product(catalog.get(url), data, (state.get(url) or {}).get("scraped"))
+                scraped = {k: v for k, v in data.items() if v and k != "url"}
+                state[url] = {**validators, "fetched_at": time.time(), "scraped": scraped}
                 print("Eklendi:", data["product_name"])
             except Exception as e:
+                stats["failed"] += 1
                 print("Atlandı:", url, "->", e)
-    print("Toplam eklenen:", added)
+
+    write_atomic(out_jsonl, "".join(json.dumps(p, ensure_ascii=False) + "\n" for p in catalog.values()))
+    write_atomic(state_file, json.dumps(state, ensure_ascii=False, indent=2))
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Ürün sayfalarını products.jsonl'e upsert et")
+    parser.add_argument("--links", default=LINKS_FILE)
+    parser.add_argument("--out", default=OUT_JSONL)
+    parser.add_argument("--state", default=STATE_FILE)
+    parser.add_argument("--workers", type=int, default=8, help="eşzamanlı istek sayısı")
+    parser.add_argument("--rate", type=float, default=3.0, help="host başına saniyedeki en fazla istek")
+    parser.add_argument("--full", action="store_true", help="ETag/Last-Modified durumunu yok say, hepsini yeniden çek")
+    args = parser.parse_args()
+    if not os.path.exists(args.links):
+        print(f"Bulunamadı: {args.links}")
+        sys.exit(1)
+    stats = ingest(args.links, args.out, args.state, args.workers, args.rate, args.full)
+    print("Yeni:", stats["added"], "| Güncellenen:", stats["updated"],
+          "| Değişmeyen:", stats["unchanged"], "| Hatalı:", stats["failed"])
 
 if __name__ == "__main__":
     main()
@@ -1,110 +1,379 @@
 import os
-import openai
-from typing import List, Dict, Any
-from dotenv import load_dotenv
+import json
+import time
+import asyncio
+import httpx
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+
+import metrics
+from cache import AnalysisCache, analysis_key
+from llm_governor import UpstreamGovernor, UpstreamRejected
+from prompt_builder import PROMPT_VERSION, PromptBuilder
+
+# LLM yanıt veremediğinde (hata / zaman aşımı) dönülen sabit metinler
+FALLBACK_ANALYSIS = {
+    "summary": "Ürün analizi tamamlandı.",
+    "safety": "Güvenlik bilgileri için teknik ekibimizle iletişime geçin.",
+    "follow_up": "Detaylı bilgi ve fiyat teklifi için bize ulaşın."
+}
+
+STREAM_FIELDS = ("summary", "safety", "follow_up")
+
+
+class JSONFieldStreamer:
+    """Parça parça gelen JSON çıktısından summary/safety/follow_up değerlerini üretildikçe çıkarır"""
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, fields: Tuple[str, ...] = STREAM_FIELDS):
+        self.fields = set(fields)
+        self.state = "seek_key"
+        self.key = ""
+        self.escape = ""
+        self.high_surrogate = 0
+        self.values: Dict[str, str] = {}
+        self.completed: set = set()
+
+    def _decode(self, ch: str) -> str:
+        """String değeri içindeki tek karakteri çöz (kaçış dizileri dahil)"""
+        if self.escape:
+            self.escape += ch
+            if self.escape[1] != 'u':
+                self.escape, esc = "", self.escape
+                return self._ESCAPES.get(esc[1], esc[1])
+            if len(self.escape) < 6:
+                return ""
+            code = int(self.escape[2:], 16)
+            self.escape = ""
+            if 0xD800 <= code < 0xDC00:
+                self.high_surrogate = code
+                return ""
+            if 0xDC00 <= code < 0xE000 and self.high_surrogate:
+                code = 0x10000 + ((self.high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self.high_surrogate = 0
+            return chr(code)
+        if ch == '\\':
+            self.escape = ch
+            return ""
+        if ch == '"':
+            self.state = "seek_key"
+            if self.key in self.fields:
+                self.completed.add(self.key)
+            return ""
+        return ch
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Yeni parçayı işle, (alan, metin) çiftlerini döndür"""
+        out: List[Tuple[str, str]] = []
+        for ch in chunk:
+            if self.state == "in_value":
+                text = self._decode(ch)
+                if text and self.key in self.fields:
+                    self.values[self.key] = self.values.get(self.key, "") + text
+                    if out and out[-1][0] == self.key:
+                        out[-1] = (self.key, out[-1][1] + text)
+                    else:
+                        out.append((self.key, text))
+            elif self.state == "seek_key":
+                if ch == '"':
+                    self.state, self.key = "in_key", ""
+            elif self.state == "in_key":
+                if ch == '"':
+                    self.state = "seek_colon"
+                else:
+                    self.key += ch
+            elif self.state == "seek_colon":
+                if ch == ':':
+                    self.state = "seek_value"
+                elif not ch.isspace():
+                    self.state = "seek_key"
+            elif self.state == "seek_value":
+                if ch == '"':
+                    self.state = "in_value"
+                elif not ch.isspace():
+                    self.state = "seek_key"
+        return out
 
-# .env dosyasını yükle
-load_dotenv()
 
 class LLMProcessor:
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable bulunamadı!")
-        
-        openai.api_key = self.api_key
+
         self.model = "gpt-4o-mini"
-    
-    def analyze_recommendations(self, prompt: str, products: List[Dict[str, Any]]) -> Dict[str, str]:
-        """Ürün önerilerini analiz et ve yapılandırılmış yanıt oluştur"""
-        
-        # Ürün bilgilerini formatla
-        products_text = ""
-        for i, product in enumerate(products, 1):
-            products_text += f"""
-Ürün {i}: {product['product_name']}
-Kategori: {product['category']}
-Uygulamalar: {', '.join(product['applications'])}
-Çözülen Problemler: {', '.join(product['problems_solved'])}
-Önemli Parametreler: {', '.join(product['key_params'])}
-Kısa Açıklama: {product['short_desc']}
-"""
-        
-        system_prompt = """Sen bir kimya şirketi için ürün öneren uzman asistanısın. 
-Müşterinin ihtiyacına göre önerilen ürünleri analiz et ve yapılandırılmış bir yanıt ver.
-
-Yanıtını şu JSON formatında ver:
-{
-    "summary": "Müşterinin ihtiyacının kısa özeti ve önerilen çözüm",
-    "safety": "Güvenlik uyarıları ve dikkat edilmesi gerekenler",
-    "follow_up": "Sonraki adımlar ve öneriler"
-}
+        # Async yol ayarları: OpenAI uyumlu uç nokta, istek başına süre bütçesi, bağlantı havuzu
+        self.base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+        self.timeout_budget = float(os.getenv("LLM_TIMEOUT_BUDGET", "8"))
+        self.max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+        # Yanıt üç kısa alandan oluşur: düşük sıcaklık, sınırlı çıktı, JSON modu (LLM_JSON_MODE=0 ile kapanır)
+        self.temperature = float(os.getenv("LLM_TEMPERATURE", "0.3"))
+        self.max_tokens = int(os.getenv("LLM_MAX_COMPLETION_TOKENS", "400"))
+        self.json_mode = os.getenv("LLM_JSON_MODE", "1") != "0"
+        self.prompt_builder = PromptBuilder.from_env()
+        self._client: Optional[httpx.AsyncClient] = None
+        # Aynı prompt + ürün kümesi için tekrar completion ödememek adına kalıcı önbellek. Anahtara
+        # çıktıyı değiştiren ayarlar da girer: model, prompt sürümü, token bütçesi, JSON modu
+        self.cache = AnalysisCache.from_env()
+        self.cache_version = (f"{self.model}|prompt v{PROMPT_VERSION}|bütçe {self.prompt_builder.budget}"
+                              f"|json {int(self.json_mode)}")
+        # Hız sınırı, uyarlanır eşzamanlılık, devre kesici ve yeniden deneme (LLM_GOVERNOR_ENABLED=0 ile kapanır)
+        self.governor = UpstreamGovernor.from_env(self.max_connections, self.timeout_budget)
 
-Önemli noktalar:
-- Teknik terimleri açıkla
-- Güvenlik konularına özel dikkat göster
-- Pratik öneriler ver
-- Türkçe yanıt ver
-"""
+    def _build_messages(self, prompt: str, products: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Sistem ve kullanıcı mesajlarını token bütçesi içinde oluştur"""
+        messages, _ = self.prompt_builder.build(prompt, products)
+        return messages
 
-        user_prompt = f"""
-Müşteri İhtiyacı: {prompt}
+    def _parse_content(self, content: str) -> Dict[str, str]:
+        """Model çıktısını summary/safety/follow_up sözlüğüne çevir"""
+        content = (content or "").strip()
+        if content.startswith("```"):
+            # JSON modu kapalıyken model çıktıyı ```json ... ``` içine alabiliyor
+            content = content.strip("`").strip()
+            if content[:4].lower() == "json":
+                content = content[4:].strip()
+        try:
+            result = json.loads(content)
+            return {
+                "summary": result.get("summary", "Analiz tamamlandı."),
+                "safety": result.get("safety", "Güvenlik bilgisi mevcut değil."),
+                "follow_up": result.get("follow_up", "Detaylı bilgi için iletişime geçin.")
+            }
+        except (json.JSONDecodeError, AttributeError):
+            # JSON parse edilemezse manuel parsing
+            metrics.LLM_FALLBACKS.inc(reason="manual_parse")
+            return self._parse_manual_response(content)
 
-Önerilen Ürünler:
-{products_text}
+    def _record_usage(self, usage: Optional[Dict[str, Any]]):
+        if usage:
+            metrics.LLM_TOKENS.inc(usage.get("prompt_tokens") or 0, kind="prompt")
+            metrics.LLM_TOKENS.inc(usage.get("completion_tokens") or 0, kind="completion")
+            # OpenAI prompt caching yalnızca 1024+ tokenlık promptlarda; varsayılan bütçede 0 kalır
+            cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+            if cached:
+                metrics.LLM_TOKENS.inc(cached, kind="cached")
 
-Lütfen bu ürünleri analiz et ve yukarıdaki formatta yanıt ver.
-"""
+    def _count_fallback(self, mode: str, reason: str):
+        metrics.LLM_REQUESTS.inc(mode=mode, outcome=reason)
+        metrics.LLM_FALLBACKS.inc(reason=reason)
 
+    def _cache_get(self, key: str) -> Optional[Dict[str, str]]:
         try:
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1000
-            )
-            
-            # JSON yanıtını parse et
-            content = response.choices[0].message.content.strip()
-            
-            # Basit JSON parsing (gerçek uygulamada daha güvenli parsing kullan)
+            return self.cache.get(key)
+        except Exception as e:
+            print(f"⚠️ Önbellek okuma hatası: {e}")
+            return None
+
+    def _cache_put(self, key: str, analysis: Dict[str, str]):
+        try:
+            self.cache.put(key, analysis)
+        except Exception as e:
+            print(f"⚠️ Önbellek yazma hatası: {e}")
+
+    def analyze_recommendations(self, prompt: str, products: List[Dict[str, Any]]) -> Dict[str, str]:
+        """Ürün önerilerini analiz et ve yapılandırılmış yanıt oluştur.
+
+        Senkron çağıranlar (betikler) için: async yol kendi event loop'unda
+        aynı süre bütçesi, önbellek ve governor ile çalışır. Çalışan bir
+        event loop içinden analyze_recommendations_async kullanılmalı.
+        """
+        async def run() -> Dict[str, str]:
             try:
-                import json
-                result = json.loads(content)
-                return {
-                    "summary": result.get("summary", "Analiz tamamlandı."),
-                    "safety": result.get("safety", "Güvenlik bilgisi mevcut değil."),
-                    "follow_up": result.get("follow_up", "Detaylı bilgi için iletişime geçin.")
-                }
-            except json.JSONDecodeError:
-                # JSON parse edilemezse manuel parsing
-                return self._parse_manual_response(content)
-                
+                return await self.analyze_recommendations_async(prompt, products)
+            finally:
+                # İstemci bu loop'a bağlı; loop kapanmadan bırakılır
+                await self.aclose()
+
+        return asyncio.run(run())
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Worker başına tek, keep-alive bağlantı havuzlu HTTP istemcisi"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=httpx.Timeout(self.timeout_budget)
+            )
+        return self._client
+
+    def _payload(self, messages: List[Dict[str, str]], stream: bool = False) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+        if self.json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        if stream:
+            payload["stream"] = True
+            # Son parçada token kullanımı gelsin (metrikler için)
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    async def _complete(self, messages: List[Dict[str, str]]) -> str:
+        response = await self._get_client().post("/chat/completions", json=self._payload(messages))
+        response.raise_for_status()
+        data = response.json()
+        self._record_usage(data.get("usage"))
+        return data["choices"][0]["message"]["content"]
+
+    async def _stream_content(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """OpenAI stream=True yanıtındaki içerik parçalarını sırayla üret"""
+        async with self._get_client().stream("POST", "/chat/completions", json=self._payload(messages, stream=True)) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                self._record_usage(chunk.get("usage"))
+                choices = chunk.get("choices") or []
+                if choices:
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+
+    async def _governed_complete(self, messages: List[Dict[str, str]], budget: float) -> str:
+        if self.governor is None:
+            return await asyncio.wait_for(self._complete(messages), timeout=budget)
+        return await self.governor.call(lambda: self._complete(messages), time.monotonic() + budget)
+
+    async def analyze_recommendations_async(self, prompt: str, products: List[Dict[str, Any]],
+                                            timeout: Optional[float] = None) -> Dict[str, str]:
+        """analyze_recommendations'ın event loop'u bloklamayan, süre bütçeli sürümü"""
+        key = analysis_key(prompt, products, self.cache_version) if self.cache else None
+        if key:
+            with metrics.span("llm_cache_lookup"):
+                cached = await asyncio.to_thread(self._cache_get, key)
+            if cached:
+                metrics.LLM_REQUESTS.inc(mode="async", outcome="cache_hit")
+                return cached
+        budget = self.timeout_budget if timeout is None else timeout
+        with metrics.span("prompt_build"):
+            messages = self._build_messages(prompt, products)
+        try:
+            with metrics.span("llm_upstream"):
+                content = await self._governed_complete(messages, budget)
+        except UpstreamRejected as e:
+            # Upstream'e hiç gidilmedi: devre açık ya da sıra bütçeye sığmadı
+            print(f"⚠️ LLM çağrısı reddedildi ({e.reason}), varsayılan yanıt dönülüyor")
+            self._count_fallback("async", e.reason)
+            return dict(FALLBACK_ANALYSIS)
+        except asyncio.TimeoutError:
+            print(f"⏱️ LLM süre bütçesi aşıldı ({budget:.1f}s), varsayılan yanıt dönülüyor")
+            self._count_fallback("async", "timeout")
+            return dict(FALLBACK_ANALYSIS)
         except Exception as e:
             print(f"OpenAI API hatası: {e}")
-            return {
-                "summary": "Ürün analizi tamamlandı.",
-                "safety": "Güvenlik bilgileri için teknik ekibimizle iletişime geçin.",
-                "follow_up": "Detaylı bilgi ve fiyat teklifi için bize ulaşın."
-            }
-    
+            self._count_fallback("async", "error")
+            return dict(FALLBACK_ANALYSIS)
+        with metrics.span("llm_parse"):
+            analysis = self._parse_content(content)
+        metrics.LLM_REQUESTS.inc(mode="async", outcome="ok")
+        # Yedek (fallback) yanıtlar önbelleğe yazılmaz, yalnızca gerçek analizler
+        if key:
+            await asyncio.to_thread(self._cache_put, key, analysis)
+        return analysis
+
+    async def analyze_recommendations_stream(self, prompt: str, products: List[Dict[str, Any]],
+                                             timeout: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Analizi model ürettikçe akıt.
+
+        {"type": "delta", "field", "text"} olayları, en sonda tek bir
+        {"type": "done", "analysis"} olayı üretir. Süre bütçesi aşılırsa
+        tamamlanmamış alanlar sabit metinlerle doldurulur.
+        """
+        key = analysis_key(prompt, products, self.cache_version) if self.cache else None
+        if key:
+            with metrics.span("llm_cache_lookup"):
+                cached = await asyncio.to_thread(self._cache_get, key)
+            if cached:
+                metrics.LLM_REQUESTS.inc(mode="stream", outcome="cache_hit")
+                for field in STREAM_FIELDS:
+                    yield {"type": "delta", "field": field, "text": cached[field]}
+                yield {"type": "done", "analysis": cached}
+                return
+
+        budget = self.timeout_budget if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget
+        streamer = JSONFieldStreamer()
+        parts: List[str] = []
+        with metrics.span("prompt_build"):
+            messages = self._build_messages(prompt, products)
+        started = time.perf_counter()
+        if self.governor is None:
+            stream = self._stream_content(messages)
+        else:
+            stream = self.governor.stream(lambda: self._stream_content(messages), time.monotonic() + budget)
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                if not parts:
+                    metrics.observe_stage("llm_first_token", time.perf_counter() - started)
+                parts.append(chunk)
+                for field, text in streamer.feed(chunk):
+                    yield {"type": "delta", "field": field, "text": text}
+        except Exception as e:
+            metrics.observe_stage("llm_upstream", time.perf_counter() - started)
+            if isinstance(e, UpstreamRejected):
+                print(f"⚠️ LLM çağrısı reddedildi ({e.reason}), varsayılan yanıt dönülüyor")
+                self._count_fallback("stream", e.reason)
+            elif isinstance(e, asyncio.TimeoutError):
+                print(f"⏱️ LLM süre bütçesi aşıldı ({budget:.1f}s), varsayılan yanıt dönülüyor")
+                self._count_fallback("stream", "timeout")
+            else:
+                print(f"OpenAI API hatası: {e}")
+                self._count_fallback("stream", "error")
+            yield {"type": "done", "analysis": {
+                field: streamer.values[field] if field in streamer.completed else FALLBACK_ANALYSIS[field]
+                for field in STREAM_FIELDS
+            }}
+            return
+        finally:
+            await stream.aclose()
+
+        metrics.observe_stage("llm_upstream", time.perf_counter() - started)
+        with metrics.span("llm_parse"):
+            analysis = self._parse_content("".join(parts))
+        metrics.LLM_REQUESTS.inc(mode="stream", outcome="ok")
+        if key:
+            await asyncio.to_thread(self._cache_put, key, analysis)
+        yield {"type": "done", "analysis": analysis}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
     def _parse_manual_response(self, content: str) -> Dict[str, str]:
         """JSON parse edilemezse manuel parsing"""
         lines = content.split('\n')
         summary = ""
         safety = ""
         follow_up = ""
-        
+
         current_section = None
-        
+
         for line in lines:
             line = line.strip()
             if not line:
                 continue
-                
+
             if '"summary"' in line or 'summary' in line.lower():
                 current_section = 'summary'
                 summary = line.split(':', 1)[-1].strip().strip('"')
@@ -121,9 +390,9 @@ Lütfen bu ürünleri analiz et ve yukarıdaki formatta yanıt ver.
                     safety += " " + line.strip('"')
                 elif current_section == 'follow_up':
                     follow_up += " " + line.strip('"')
-        
+
         return {
-            "summary": summary or "Ürün analizi tamamlandı.",
-            "safety": safety or "Güvenlik bilgileri için teknik ekibimizle iletişime geçin.",
-            "follow_up": follow_up or "Detaylı bilgi ve fiyat teklifi için bize ulaşın."
+            "summary": summary or FALLBACK_ANALYSIS["summary"],
+            "safety": safety or FALLBACK_ANALYSIS["safety"],
+            "follow_up": follow_up or FALLBACK_ANALYSIS["follow_up"]
         }
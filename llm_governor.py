@@ -0,0 +1,394 @@
+"""LLM upstream çağrılarının yöneticisi: hız sınırı, uyarlanır eşzamanlılık,
+devre kesici ve bütçeli yeniden deneme.
+
+Ani yükte her istek kendi 429'unu / zaman aşımını beklemek yerine:
+
+  TokenBucket       saniyedeki istek sayısını sınırlar (OpenAI RPM kotası)
+  AdaptiveLimiter   eşzamanlı çağrı sınırı AIMD ile ayarlanır: başarılı ve
+                    hedef gecikmenin altındaki her çağrı sınırı ~1/sınır
+                    artırır; 429, zaman aşımı ya da hedefi aşan gecikme
+                    sınırı 0.7 ile çarpar
+  CircuitBreaker    art arda hata eşiği aşılınca devre açılır, çağrılar
+                    upstream'e gitmeden yedek yanıta düşer; soğumadan sonra
+                    tek bir deneme çağrısı (yarı açık) devreyi kapatır
+  RetryBudget       yeniden denemeler son penceredeki isteklerin belli bir
+                    oranıyla sınırlı; bekleme üstel + tam rastgele (jitter),
+                    429'daki Retry-After dikkate alınır
+
+Her çağrı istek başına süre bütçesi (deadline) içinde kalır: sıra bekleme,
+yeniden deneme ve beklemeler bütçeyi aşacaksa çağrı hemen reddedilir.
+Durum yalnızca time.monotonic ve event loop'un kendi future'larıyla
+tutulur; senkron sarmalayıcının açtığı ayrı loop'larda da çalışır.
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+import metrics
+
+# Yeniden denenebilir hata sınıfları (429 dışındakiler devre kesicide hata sayılır)
+RETRYABLE = ("rate_limited", "server_error", "timeout", "connection")
+
+
+class UpstreamRejected(Exception):
+    """Çağrı upstream'e hiç gönderilmedi (devre açık / sıra süre bütçesine sığmadı)"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def classify(error: BaseException) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        if status == 429:
+            return "rate_limited"
+        if status >= 500:
+            return "server_error"
+        return "client_error"
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    if isinstance(error, httpx.TransportError):
+        return "connection"
+    return "error"
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """429/503 yanıtındaki Retry-After (saniye cinsinden) başlığı"""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    try:
+        return max(0.0, float(error.response.headers.get("retry-after", "")))
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float):
+        """429'daki Retry-After tüm çağrılar için geçerli: bu süre boyunca yeni çağrı başlamaz"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, deadline: float):
+        """Jeton gelene kadar bekle; bekleme deadline'ı aşacaksa UpstreamRejected"""
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                if self.paused_until > deadline:
+                    raise UpstreamRejected("throttled")
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            if self.rate <= 0:
+                return
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                raise UpstreamRejected("throttled")
+            await asyncio.sleep(wait)
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: float, min_limit: float, max_limit: float, latency_target: float,
+                 backoff: float = 0.7):
+        self.limit = float(initial)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def _capacity(self) -> int:
+        return max(1, int(self.limit))
+
+    async def acquire(self, deadline: float):
+        if self.in_flight < self._capacity() and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise UpstreamRejected("throttled")
+        except asyncio.CancelledError:
+            # Yer verildiği anda iptal edildiyse yeri geri bırak
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self._capacity():
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def on_success(self, latency: float):
+        if latency > self.latency_target:
+            self._decrease()
+            return
+        # Sınır kadar başarılı çağrıda ~1 artar (TCP'deki gibi toplamsal artış)
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        metrics.LLM_CONCURRENCY_LIMIT.set(self.limit)
+        self._wake()
+
+    def on_drop(self):
+        self._decrease()
+
+    def _decrease(self):
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        metrics.LLM_CONCURRENCY_LIMIT.set(self.limit)
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self._set(self.HALF_OPEN)
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probing:
+            # Yarı açık: tek deneme çağrısı; sonucu devreyi kapatır ya da yeniden açar
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            self._set(self.CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            if self.state != self.OPEN:
+                self._set(self.OPEN)
+
+    def release_probe(self):
+        """Deneme çağrısı sonuç vermeden bittiyse (istemci hatası, iptal) yeni denemeye izin ver"""
+        self._probing = False
+
+    def _set(self, state: str):
+        self.state = state
+        metrics.LLM_BREAKER_STATE.set({self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[state])
+        metrics.LLM_BREAKER_TRANSITIONS.inc(state=state)
+        print(f"⚠️ LLM devre kesici: {state}" if state != self.CLOSED else "✅ LLM devre kesici kapandı")
+
+
+class RetryBudget:
+    """Son `window` saniyedeki isteklerin `ratio` kadarı (en az `min_retries`) yeniden denenebilir"""
+
+    def __init__(self, ratio: float, min_retries: int = 3, window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+
+    def _trim(self, now: float):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self):
+        self._requests.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._trim(now)
+        if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+            return False
+        self._retries.append(now)
+        return True
+
+
+class UpstreamGovernor:
+    def __init__(self, rate: float = 8.0, burst: float = 16.0, initial_limit: float = 8.0, min_limit: float = 1.0,
+                 max_limit: float = 20.0, latency_target: float = 6.0, failure_threshold: int = 5,
+                 breaker_cooldown: float = 10.0, max_retries: int = 2, retry_ratio: float = 0.2,
+                 backoff_base: float = 0.2, backoff_cap: float = 2.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AdaptiveLimiter(min(initial_limit, max_limit), min_limit, max_limit, latency_target)
+        self.breaker = CircuitBreaker(failure_threshold, breaker_cooldown)
+        self.retry_budget = RetryBudget(retry_ratio)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        metrics.LLM_CONCURRENCY_LIMIT.set(self.limiter.limit)
+        metrics.LLM_BREAKER_STATE.set(0)
+
+    @classmethod
+    def from_env(cls, max_connections: int = 20, timeout_budget: float = 8.0) -> Optional["UpstreamGovernor"]:
+        if os.getenv("LLM_GOVERNOR_ENABLED", "1") == "0":
+            return None
+        max_limit = float(os.getenv("LLM_MAX_CONCURRENCY", str(max_connections)))
+        return cls(
+            rate=float(os.getenv("LLM_RATE_LIMIT", "8")),
+            burst=float(os.getenv("LLM_RATE_BURST", "16")),
+            initial_limit=min(8.0, max_limit),
+            max_limit=max_limit,
+            latency_target=float(os.getenv("LLM_LATENCY_TARGET", str(timeout_budget * 0.75))),
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            breaker_cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "10")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+            retry_ratio=float(os.getenv("LLM_RETRY_BUDGET", "0.2")),
+        )
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        hinted = retry_after(error)
+        if hinted is not None:
+            return hinted
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def _admit(self, deadline: float):
+        if not self.breaker.allow():
+            metrics.LLM_REJECTED.inc(reason="circuit_open")
+            raise UpstreamRejected("circuit_open")
+        try:
+            await self.bucket.acquire(deadline)
+            await self.limiter.acquire(deadline)
+        except BaseException as e:
+            self.breaker.release_probe()
+            if isinstance(e, UpstreamRejected):
+                metrics.LLM_REJECTED.inc(reason=e.reason)
+            raise
+
+    def _record(self, error: Optional[BaseException], latency: float) -> str:
+        kind = "ok" if error is None else classify(error)
+        metrics.LLM_UPSTREAM_ATTEMPTS.inc(result=kind)
+        if kind == "ok":
+            self.limiter.on_success(latency)
+            self.breaker.record_success()
+        elif kind == "rate_limited":
+            # Kota baskısı kesinti değildir: eşzamanlılık düşer, Retry-After beklenir
+            self.limiter.on_drop()
+            self.breaker.release_probe()
+            hinted = retry_after(error)
+            if hinted:
+                self.bucket.pause(hinted)
+        elif kind in RETRYABLE:
+            if kind == "timeout":
+                self.limiter.on_drop()
+            self.breaker.record_failure()
+        else:
+            # İstemci hatası upstream sağlığını göstermez
+            self.breaker.release_probe()
+        return kind
+
+    def _retry_delay(self, kind: str, attempt: int, error: BaseException, deadline: float) -> Optional[float]:
+        """Yeniden denenecekse bekleme süresi, denenmeyecekse None"""
+        if kind not in RETRYABLE or attempt >= self.max_retries:
+            return None
+        delay = self._backoff(attempt, error)
+        # Bekleme + makul bir deneme süresi bütçeye sığmıyorsa boşuna bekletme
+        if time.monotonic() + delay + self.backoff_base >= deadline or not self.retry_budget.try_spend():
+            return None
+        metrics.LLM_RETRIES.inc(reason=kind)
+        return delay
+
+    async def call(self, attempt: Callable[[], Awaitable[Any]], deadline: float) -> Any:
+        """attempt()'i yönetilen şekilde çağır; son hata ya da UpstreamRejected yukarı iletilir"""
+        self.retry_budget.record_request()
+        tries = 0
+        while True:
+            await self._admit(deadline)
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(attempt(), max(0.0, deadline - started))
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                kind = self._record(e, time.monotonic() - started)
+                delay = self._retry_delay(kind, tries, e, deadline)
+                if delay is None:
+                    raise
+            else:
+                self._record(None, time.monotonic() - started)
+                return result
+            finally:
+                self.limiter.release()
+            tries += 1
+            await asyncio.sleep(delay)
+
+    async def stream(self, open_stream: Callable[[], AsyncIterator[str]], deadline: float) -> AsyncIterator[str]:
+        """Akışı yönetilen şekilde aç: ilk parça gelene kadarki hatalar yeniden denenir,
+        sonrası olduğu gibi iletilir. Gecikme sinyali ilk parçanın süresidir."""
+        self.retry_budget.record_request()
+        tries = 0
+        while True:
+            await self._admit(deadline)
+            started = time.monotonic()
+            chunks = open_stream()
+            try:
+                try:
+                    first = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - started))
+                except StopAsyncIteration:
+                    self._record(None, time.monotonic() - started)
+                    return
+                except asyncio.CancelledError:
+                    self.breaker.release_probe()
+                    raise
+                except Exception as e:
+                    kind = self._record(e, time.monotonic() - started)
+                    delay = self._retry_delay(kind, tries, e, deadline)
+                    if delay is None:
+                        raise
+                else:
+                    self._record(None, time.monotonic() - started)
+                    yield first
+                    async for chunk in chunks:
+                        yield chunk
+                    return
+            finally:
+                await chunks.aclose()
+                self.limiter.release()
+            tries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "queued": len(self.limiter._waiters),
+            "breaker": self.breaker.state,
+            "rate_limit": self.bucket.rate,
+        }
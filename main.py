@@ -1,15 +1,57 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from typing import List, Optional
-import uvicorn
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
+from pydantic import BaseModel, Field
+from typing import TYPE_CHECKING, List, Optional, Dict, Any
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import os
+import threading
+import time
 
-from search import ProductSearch
-from llm import LLMProcessor
+from cache import normalize_prompt, SingleFlight
+import metrics
 
-app = FastAPI(title="Bimaks Ürün Asistanı", version="1.0.0")
+# numpy/scipy (arama) ve openai/httpx (LLM) import sırasında yüklenmez; bkz. warm_up
+if TYPE_CHECKING:
+    from search import ProductSearch
+    from llm import LLMProcessor
+
+def _load_env_file():
+    """Aşağıdaki ayarlar ve OPENAI_API_KEY .env'den okunabilsin.
+
+    python-dotenv yalnızca .env dosyası varsa import edilir; üretimde ayarlar
+    ortamdan gelir ve import süresine eklenmez. Mevcut ortam değişkenleri ezilmez.
+    """
+    for path in (".env", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")):
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            return
+
+_load_env_file()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # İndeks arka planda kurulur: /health ve statik sayfa hemen yanıt verir, /ready hazır olunca 200 döner
+    async def start():
+        await asyncio.to_thread(warm_up)
+        # products.jsonl değişince indeks worker yeniden başlatılmadan yenilenir
+        if product_search is not None and INDEX_WATCH_INTERVAL > 0:
+            product_search.start_watching(INDEX_WATCH_INTERVAL)
+    warming = asyncio.create_task(start())
+    yield
+    if not warming.done():
+        warming.cancel()
+    if product_search is not None:
+        product_search.stop_watching()
+    # Worker kapanırken LLM bağlantı havuzunu kapat
+    if llm_processor is not None:
+        await llm_processor.aclose()
+
+app = FastAPI(title="Bimaks Ürün Asistanı", version="1.0.0", lifespan=lifespan)
 
 # CORS ayarları (frontend için)
 app.add_middleware(
@@ -20,15 +62,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Öneri uç noktalarının toplam süresi (aşama süreleri search.py / llm.py içinde ölçülür)
+app.add_middleware(metrics.RequestTimer, endpoints=("/api/recommend", "/api/recommend/batch", "/api/recommend/stream"))
+
 # Static dosyaları serve et
 app.mount("/static", StaticFiles(directory="templates"), name="static")
 
-# Global instances
-product_search = ProductSearch()
-llm_processor = LLMProcessor()
+# Global instances: lifespan'daki warm_up kurar (benchmark'lar doğrudan atayabilir)
+product_search: Optional["ProductSearch"] = None
+llm_processor: Optional["LLMProcessor"] = None
+_llm_lock = threading.Lock()
+_startup: Dict[str, Any] = {"status": "starting", "error": None, "seconds": None}
+# Aynı anda gelen aynı (normalize) promptlar tek arama + LLM çağrısını paylaşır
+recommend_flight = SingleFlight()
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "1") != "0"
+metrics.REGISTRY.register(metrics.Counter(
+    "bimaks_coalesced_requests_total", "Devam eden özdeş bir isteğe bağlanan istekler",
+    func=lambda: recommend_flight.coalesced))
+metrics.REGISTRY.register(metrics.Gauge(
+    "bimaks_inflight_recommendations", "Şu an hesaplanan (birleştirilmiş) öneri sayısı",
+    func=lambda: recommend_flight.stats()["in_flight"]))
 
 class RecommendationRequest(BaseModel):
     prompt: str
+    # Örn. {"category": ["Soğutma Suyu Islahı"]}; alanlar: category, applications, problems_solved, key_params
+    filters: Optional[Dict[str, List[str]]] = None
 
 class Product(BaseModel):
     product_name: str
@@ -46,6 +104,27 @@ class RecommendationResponse(BaseModel):
     safety: str
     follow_up: str
 
+# Toplu istek limitleri
+BATCH_MAX_PROMPTS = int(os.getenv("BATCH_MAX_PROMPTS", "500"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "10"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+class BatchRecommendationRequest(BaseModel):
+    prompts: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_PROMPTS)
+    # Tüm promptlara uygulanır
+    filters: Optional[Dict[str, List[str]]] = None
+
+class BatchRecommendationItem(BaseModel):
+    index: int
+    prompt: str
+    status: str  # "ok" | "not_found" | "error"
+    result: Optional[RecommendationResponse] = None
+    error: Optional[str] = None
+
+class BatchRecommendationResponse(BaseModel):
+    results: List[BatchRecommendationItem]
+
 @app.get("/")
 async def root():
     return FileResponse("templates/index.html")
@@ -58,31 +137,209 @@ async def web_interface():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness():
+    """Arama kullanılabilir olunca 200; indeks kurulurken veya kurulamadıysa 503 (yük dengeleyici için)"""
+    if product_search is None:
+        return JSONResponse(status_code=503, content={"status": _startup["status"], "error": _startup["error"]},
+                            headers={"Retry-After": "1"})
+    return {"status": "ready", "products": len(product_search.products), "llm": llm_processor is not None,
+            "startup_seconds": _startup["seconds"]}
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    query_cache = product_search.query_cache_stats() if product_search is not None else {"enabled": False}
+    if llm_processor is None or llm_processor.cache is None:
+        return {"enabled": False, "coalescing": recommend_flight.stats(), "query_cache": query_cache}
+    return {"enabled": True, **llm_processor.cache.stats(), "coalescing": recommend_flight.stats(),
+            "query_cache": query_cache}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metin formatında worker metrikleri"""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.post("/admin/reload")
+async def reload_index(full: bool = False, x_admin_token: Optional[str] = Header(default=None)):
+    """Arama indeksini elle yenile (yalnızca bu worker; diğerleri dosya izleyicisiyle yakalar)"""
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Yetkisiz")
+    result = await asyncio.to_thread(_get_search().reload, full)
+    if result["status"] == "error":
+        raise HTTPException(status_code=409, detail=result["detail"])
+    return result
+
 @app.get("/api")
 async def api_info():
     return {"message": "Bimaks Ürün Asistanı API'si çalışıyor!"}
 
+def warm_up():
+    """Arama indeksini ve (anahtar varsa) LLM istemcisini kur; lifespan bunu ayrı thread'de çağırır"""
+    global product_search
+    if _startup["status"] == "ready":
+        return
+    t0 = time.perf_counter()
+    try:
+        if product_search is None:
+            from search import ProductSearch
+            # Kanonik katalog (catalog_compact.py çıktısı) güncelse o, kaynaklar değiştiyse products.jsonl yüklenir
+            product_search = ProductSearch(None)
+    except Exception as e:
+        _startup.update(status="failed", error=str(e))
+        print(f"❌ Arama indeksi kurulamadı: {e}")
+        return
+    try:
+        _get_llm()
+    except HTTPException as e:
+        print(f"⚠️ {e.detail}; öneri uç noktaları 503 döner")
+    _startup.update(status="ready", seconds=round(time.perf_counter() - t0, 3))
+    print(f"✅ Hazır ({_startup['seconds']} s)")
+
+def _get_search() -> "ProductSearch":
+    if product_search is None:
+        if _startup["status"] == "failed":
+            raise HTTPException(status_code=503, detail=f"Arama indeksi kurulamadı: {_startup['error']}")
+        raise HTTPException(status_code=503, detail="Arama indeksi hazırlanıyor", headers={"Retry-After": "1"})
+    return product_search
+
+def _get_llm() -> "LLMProcessor":
+    """LLM istemcisi ilk ihtiyaçta kurulur; OPENAI_API_KEY yoksa yalnızca öneri uç noktaları etkilenir"""
+    global llm_processor
+    if llm_processor is None:
+        with _llm_lock:
+            if llm_processor is None:
+                from llm import LLMProcessor
+                try:
+                    llm_processor = LLMProcessor()
+                except ValueError as e:
+                    raise HTTPException(status_code=503, detail=str(e))
+    return llm_processor
+
+def _check_filters(filters: Optional[Dict[str, List[str]]]):
+    from facets import FACET_FIELDS
+    unknown = [f for f in (filters or {}) if f not in FACET_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Bilinmeyen filtre alanı: {', '.join(unknown)} "
+                                                    f"(seçenekler: {', '.join(FACET_FIELDS)})")
+
+@app.get("/api/facets")
+async def facet_counts(category: Optional[List[str]] = Query(default=None),
+                       applications: Optional[List[str]] = Query(default=None),
+                       problems_solved: Optional[List[str]] = Query(default=None),
+                       key_params: Optional[List[str]] = Query(default=None),
+                       limit: int = Query(default=20, ge=1, le=500)):
+    """Seçili filtrelere uyan ürünlerde faset değerleri ve adetleri (ör. ?category=Kazan Su Islahı)"""
+    filters = {"category": category, "applications": applications,
+               "problems_solved": problems_solved, "key_params": key_params}
+    return _get_search().facet_counts({f: v for f, v in filters.items() if v}, limit=limit)
+
+async def _recommend(prompt: str, filters: Optional[Dict[str, List[str]]] = None) -> RecommendationResponse:
+    # 1. Prompt'a göre ürün ara
+    relevant_products = product_search.search(prompt, top_k=3, filters=filters)
+    
+    if not relevant_products:
+        raise HTTPException(status_code=404, detail="Uygun ürün bulunamadı")
+    
+    # 2. LLM ile analiz yap (event loop'u bloklamadan, süre bütçesi içinde)
+    analysis = await llm_processor.analyze_recommendations_async(prompt, relevant_products)
+    
+    return RecommendationResponse(
+        summary=analysis["summary"],
+        products=relevant_products,
+        safety=analysis["safety"],
+        follow_up=analysis["follow_up"]
+    )
+
 @app.post("/api/recommend", response_model=RecommendationResponse)
 async def recommend_products(request: RecommendationRequest):
+    _check_filters(request.filters)
+    # Hazır değilse 503 (aşağıdaki 500 sarmalamasına girmeden)
+    _get_search()
+    _get_llm()
+    try:
+        if not COALESCE_ENABLED:
+            return await _recommend(request.prompt, request.filters)
+        # Farklı filtreli aynı prompt ayrı sonuç üretir: filtre de anahtara girer
+        key = normalize_prompt(request.prompt)
+        if request.filters:
+            key += "\x00" + json.dumps(request.filters, sort_keys=True, ensure_ascii=False)
+        return await recommend_flight.do(key, lambda: _recommend(request.prompt, request.filters))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Öneri oluşturulurken hata: {str(e)}")
+
+@app.post("/api/recommend/batch", response_model=BatchRecommendationResponse)
+async def recommend_products_batch(request: BatchRecommendationRequest):
+    """Çok sayıda prompt için öneri: tek arama çağrısı, sınırlı eşzamanlı LLM analizi, giriş sırasıyla sonuç"""
+    _check_filters(request.filters)
+    search, llm = _get_search(), _get_llm()
+    # Tekrarlayan promptlar (normalize edilmiş haliyle) bir kez işlenir
+    representatives: Dict[str, str] = {}
+    for prompt in request.prompts:
+        representatives.setdefault(normalize_prompt(prompt), prompt)
+    keys = list(representatives)
+
     try:
-        # 1. Prompt'a göre ürün ara
-        relevant_products = product_search.search(request.prompt, top_k=3)
-        
-        if not relevant_products:
-            raise HTTPException(status_code=404, detail="Uygun ürün bulunamadı")
-        
-        # 2. LLM ile analiz yap
-        analysis = llm_processor.analyze_recommendations(request.prompt, relevant_products)
-        
+        searched = search.search_batch([representatives[k] for k in keys], top_k=3, filters=request.filters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Öneri oluşturulurken hata: {str(e)}")
+
+    semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+    async def analyze(key: str, products: List[Dict[str, Any]]) -> Optional[RecommendationResponse]:
+        if not products:
+            return None
+        async with semaphore:
+            analysis = await llm.analyze_recommendations_async(representatives[key], products)
         return RecommendationResponse(
             summary=analysis["summary"],
-            products=relevant_products,
+            products=products,
             safety=analysis["safety"],
             follow_up=analysis["follow_up"]
         )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Öneri oluşturulurken hata: {str(e)}")
+
+    # Bir promptun hatası diğerlerini etkilemesin
+    outcomes = await asyncio.gather(*(analyze(k, p) for k, p in zip(keys, searched)), return_exceptions=True)
+    by_key = dict(zip(keys, outcomes))
+
+    results = []
+    for index, prompt in enumerate(request.prompts):
+        outcome = by_key[normalize_prompt(prompt)]
+        if isinstance(outcome, Exception):
+            results.append(BatchRecommendationItem(index=index, prompt=prompt, status="error",
+                                                   error=f"Öneri oluşturulurken hata: {str(outcome)}"))
+        elif outcome is None:
+            results.append(BatchRecommendationItem(index=index, prompt=prompt, status="not_found",
+                                                   error="Uygun ürün bulunamadı"))
+        else:
+            results.append(BatchRecommendationItem(index=index, prompt=prompt, status="ok", result=outcome))
+    return BatchRecommendationResponse(results=results)
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/recommend/stream")
+async def recommend_products_stream(request: RecommendationRequest):
+    """Ürün listesini hemen, LLM analizini üretildikçe Server-Sent Events ile gönder"""
+    _check_filters(request.filters)
+    search, llm = _get_search(), _get_llm()
+    relevant_products = search.search(request.prompt, top_k=3, filters=request.filters)
+    if not relevant_products:
+        raise HTTPException(status_code=404, detail="Uygun ürün bulunamadı")
+
+    async def events():
+        yield _sse("products", {"products": [Product(**p).model_dump() for p in relevant_products]})
+        try:
+            async for event in llm.analyze_recommendations_stream(request.prompt, relevant_products):
+                if event["type"] == "delta":
+                    yield _sse("delta", {"field": event["field"], "text": event["text"]})
+                else:
+                    yield _sse("done", event["analysis"])
+        except Exception as e:
+            yield _sse("error", {"detail": f"Öneri oluşturulurken hata: {str(e)}"})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
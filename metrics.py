@@ -0,0 +1,251 @@
+"""Hafif, bağımlılıksız Prometheus metrikleri (metin formatı 0.0.4).
+
+Sayaçlar süreç (worker) başınadır; gunicorn altında her worker kendi
+değerlerini tutar. Gözlem maliyeti birkaç mikrosaniyedir (bisect + kilit),
+canlıda açık bırakılabilir.
+
+    with span("search_transform"):
+        ...
+"""
+import time
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Saniye cinsinden; alt uç sorgu aşamaları, üst uç LLM gidiş-dönüşü için
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('%s="%s"' % (n, _escape(str(v))) for n, v in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 func: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        # Verilirse değer her okumada (scrape) başka bir sayaçtan okunur
+        self._func = func
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        if self._func is not None:
+            return [f"{self.name} {_fmt(self._func())}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 func: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        # Verilirse değer her okumada (scrape) hesaplanır
+        self._func = func
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        if self._func is not None:
+            return [f"{self.name} {_fmt(self._func())}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # anahtar -> [kova sayaçları (kümülatif değil)..., +Inf], toplam, adet
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            entry[0][i] += 1
+            entry[1][0] += value
+            entry[1][1] += 1
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return int(entry[1][1]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), list(t))) for k, (c, t) in self._values.items())
+        lines = []
+        for key, (counts, (total, n)) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = _labels(self.labelnames, key, (("le", _fmt(bound)),))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {int(n)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "bimaks_stage_seconds", "Öneri akışındaki aşamaların süresi", ("stage",)))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "bimaks_request_seconds", "Uç nokta bazında toplam istek süresi", ("endpoint", "status")))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "bimaks_llm_tokens_total", "OpenAI usage alanından okunan token sayısı", ("kind",)))
+LLM_REQUESTS = REGISTRY.register(Counter(
+    "bimaks_llm_requests_total", "LLM analiz istekleri (sonuca göre)", ("mode", "outcome")))
+LLM_FALLBACKS = REGISTRY.register(Counter(
+    "bimaks_llm_fallbacks_total", "Sabit metne düşülen LLM yanıtları", ("reason",)))
+LLM_PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "bimaks_llm_prompt_tokens", "Gönderilen promptun tahmini token sayısı (sistem + kullanıcı)",
+    buckets=(100, 200, 300, 400, 500, 600, 800, 1000, 1500, 2000)))
+LLM_PROMPT_TRUNCATIONS = REGISTRY.register(Counter(
+    "bimaks_llm_prompt_truncations_total", "Token bütçesi için kısaltılan/atılan prompt parçaları", ("field",)))
+LLM_UPSTREAM_ATTEMPTS = REGISTRY.register(Counter(
+    "bimaks_llm_upstream_attempts_total", "Upstream'e giden LLM denemeleri (sonuca göre)", ("result",)))
+LLM_RETRIES = REGISTRY.register(Counter("bimaks_llm_retries_total", "Yeniden denenen LLM çağrıları", ("reason",)))
+LLM_REJECTED = REGISTRY.register(Counter(
+    "bimaks_llm_rejected_total", "Upstream'e gönderilmeden reddedilen LLM çağrıları", ("reason",)))
+LLM_CONCURRENCY_LIMIT = REGISTRY.register(Gauge(
+    "bimaks_llm_concurrency_limit", "AIMD ile ayarlanan eşzamanlı LLM çağrısı sınırı"))
+LLM_BREAKER_STATE = REGISTRY.register(Gauge(
+    "bimaks_llm_breaker_state", "LLM devre kesici durumu (0 kapalı, 1 yarı açık, 2 açık)"))
+LLM_BREAKER_TRANSITIONS = REGISTRY.register(Counter(
+    "bimaks_llm_breaker_transitions_total", "Devre kesici durum geçişleri", ("state",)))
+INDEX_PRODUCTS = REGISTRY.register(Gauge("bimaks_index_products", "İndeksteki ürün sayısı"))
+INDEX_TERMS = REGISTRY.register(Gauge("bimaks_index_terms", "İndeks sözlüğündeki terim sayısı"))
+INDEX_NNZ = REGISTRY.register(Gauge("bimaks_index_nonzeros", "TF-IDF matrisindeki sıfır olmayan eleman sayısı"))
+INDEX_LOAD_SECONDS = REGISTRY.register(Gauge("bimaks_index_load_seconds", "Son indeks yükleme/oluşturma süresi"))
+INDEX_LOADED_AT = REGISTRY.register(Gauge("bimaks_index_loaded_timestamp_seconds", "Son indeks yükleme zamanı"))
+INDEX_RELOADS = REGISTRY.register(Counter("bimaks_index_reloads_total", "İndeks yüklemeleri", ("mode",)))
+QUERY_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "bimaks_query_cache_lookups_total", "Anlamsal sorgu önbelleği aramaları (hit/miss/skip)", ("result",)))
+QUERY_CACHE_ENTRIES = REGISTRY.register(Gauge("bimaks_query_cache_entries", "Anlamsal sorgu önbelleğindeki kayıt sayısı"))
+QUERY_CACHE_EVICTIONS = REGISTRY.register(Counter("bimaks_query_cache_evictions_total", "LRU ile atılan önbellek kayıtları"))
+QUERY_CACHE_INVALIDATIONS = REGISTRY.register(Counter(
+    "bimaks_query_cache_invalidations_total", "İndeks yenilendiği için boşaltılan önbellekler"))
+QUERY_CACHE_SIMILARITY = REGISTRY.register(Histogram(
+    "bimaks_query_cache_hit_similarity", "Önbellekten dönen sorgularda en yakın kaydın kosinüs benzerliği",
+    buckets=(0.8, 0.85, 0.9, 0.925, 0.95, 0.975, 0.99, 1.0)))
+
+
+class RequestTimer:
+    """Saf ASGI ara katmanı: izlenen uç noktaların toplam süresini (akışlarda son parçaya kadar) ölçer"""
+
+    def __init__(self, app, endpoints: Tuple[str, ...]):
+        self.app = app
+        self.endpoints = frozenset(endpoints)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path not in self.endpoints:
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, endpoint=path, status=status)
+
+
+class span:
+    """Bloğun süresini bimaks_stage_seconds{stage=...} histogramına yaz"""
+
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "span":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        STAGE_SECONDS.observe(time.perf_counter() - self.t0, stage=self.stage)
+        return False
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
@@ -1,15 +1,33 @@
 #!/usr/bin/env python3
-import os, sys, re
-from typing import Set, Iterable
+"""PDF kataloglarındaki ürün bağlantılarını data/product_links.txt'ye ekler.
+
+    python pdf_extract_links.py [PDF veya klasör ...] [--workers 4] [--full]
+
+- Sayfa başına tek geçiş: önce link nesneleri (annotation); metin çıkarma
+  yalnızca link nesnesi URL vermeyen sayfalarda yapılır
+- Klasör verilirse altındaki tüm PDF'ler; sayfalar süreç havuzunda işlenir
+- Sonuçlar dosya içeriğinin SHA-256 özetine göre data/pdf_links_cache.json'da
+  tutulur; değişmeyen PDF'ler tekrar ayrıştırılmaz
+- Çıktıya yalnızca dosyada olmayan bağlantılar akış halinde eklenir
+"""
+import os, sys, re, json
+import argparse
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Set, Tuple
 from urllib.parse import urlparse
 from pypdf import PdfReader
 
 PDF_PATH = os.environ.get("PDF_PATH", "templates/docs/su-ve-proses-kimyasallari.pdf")
 OUT_TXT = os.path.join("data", "product_links.txt")
+CACHE_FILE = os.path.join("data", "pdf_links_cache.json")
 
 ALLOWED_HOST = "bimakskimya.com.tr"
 ALLOWED_PREFIXES = ("/cozumler-urunler/", "/%C3%A7%C3%B6z%C3%BCmler-%C3%BCr%C3%BCnler/")
 SKIP_EXT = (".pdf", ".jpg", ".jpeg", ".png", ".webp", ".gif", ".svg", ".zip")
+URL_RE = re.compile(r"https?://[\w\-\.\/%\?=&#:+~]+", re.IGNORECASE)
+# Süreç havuzuna gönderilen iş başına sayfa sayısı (görev yükünü düşük tutar)
+PAGES_PER_TASK = 8
 
 
 def keep_url(u: str) -> bool:
@@ -38,61 +56,190 @@ def keep_url(u: str) -> bool:
     return True
 
 
-def extract_urls_from_pdf(path: str) -> Set[str]:
+def page_urls(page) -> List[str]:
+    """Tek sayfanın URL'leri; link nesnesi yoksa metne bakılır"""
+    urls: List[str] = []
+    if "/Annots" in page:
+        for annot in page["/Annots"]:
+            try:
+                a = annot.get_object()
+                uri = a.get("/A", {}).get("/URI")
+                if uri:
+                    # URI dolaylı nesne olabilir; çözülmezse keep_url hepsini eler
+                    urls.append(str(uri.get_object()))
+            except Exception:
+                continue
+    if urls:
+        return urls
+    # Fallback: metni tara (pahalı; yalnızca link nesnesi olmayan sayfalarda)
+    try:
+        return URL_RE.findall(page.extract_text() or "")
+    except Exception:
+        return []
+
+
+_reader_cache: Dict[str, PdfReader] = {}
+
+
+def _pages_worker(path: str, start: int, stop: int) -> List[str]:
+    # Aynı dosyanın ardışık aralıkları çoğunlukla aynı sürece düşer; xref tekrar okunmasın
+    reader = _reader_cache.get(path)
+    if reader is None:
+        _reader_cache.clear()
+        reader = _reader_cache[path] = PdfReader(path)
+    urls: List[str] = []
+    for i in range(start, min(stop, len(reader.pages))):
+        urls.extend(page_urls(reader.pages[i]))
+    return urls
+
+
+def extract_urls_from_pdf(path: str) -> List[str]:
+    """Tek PDF'in URL'leri, sayfa sırasıyla ve tekrarsız"""
     reader = PdfReader(path)
-    urls: Set[str] = set()
-    # Annotations (link objects)
-    for page in reader.pages:
-        if "/Annots" in page:
-            for annot in page["/Annots"]:
-                try:
-                    a = annot.get_object()
-                    uri = a.get("/A", {}).get("/URI")
-                    if uri:
-                        urls.add(uri)
-                except Exception:
-                    continue
-    # Fallback: scan text
-    url_re = re.compile(r"https?://[\w\-\.\/%\?=&#:+~]+", re.IGNORECASE)
+    urls: List[str] = []
     for page in reader.pages:
+        urls.extend(page_urls(page))
+    return list(dict.fromkeys(urls))
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def find_pdfs(paths: Iterable[str]) -> List[str]:
+    found: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+        else:
+            found.append(path)
+    return sorted(dict.fromkeys(found))
+
+
+def write_atomic(path: str, text: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def load_cache(path: str) -> Dict[str, Dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def extract_from_paths(pdfs: List[str], cache: Dict[str, Dict], workers: int = 4) -> Tuple[Dict[str, List[str]], Dict[str, int]]:
+    """PDF başına URL listesi; önbellekte (içerik özeti) olanlar ayrıştırılmaz, cache yerinde güncellenir"""
+    stats = {"cached": 0, "parsed": 0, "failed": 0, "pages": 0}
+    results: Dict[str, List[str]] = {}
+    todo: List[Tuple[str, str]] = []
+    for pdf in pdfs:
+        digest = file_hash(pdf)
+        entry = cache.get(digest)
+        if entry is not None:
+            results[pdf] = entry["urls"]
+            stats["cached"] += 1
+        else:
+            todo.append((pdf, digest))
+    if not todo:
+        return results, stats
+
+    # Sayfa aralıkları: tek büyük PDF de tüm çekirdeklere dağılır
+    tasks: List[Tuple[str, int, int]] = []
+    readable: List[Tuple[str, str]] = []
+    for pdf, digest in todo:
         try:
-            text = page.extract_text() or ""
-            for m in url_re.findall(text):
-                urls.add(m)
-        except Exception:
+            n_pages = len(PdfReader(pdf).pages)
+        except Exception as e:
+            print("❌ Okunamadı:", pdf, "->", e)
+            stats["failed"] += 1
             continue
-    return urls
+        readable.append((pdf, digest))
+        stats["pages"] += n_pages
+        tasks.extend((pdf, s, s + PAGES_PER_TASK) for s in range(0, n_pages, PAGES_PER_TASK))
+
+    per_file: Dict[str, List[str]] = {pdf: [] for pdf, _ in readable}
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map sırayı korur: URL'ler sayfa sırasıyla birleşir
+            for (pdf, _, _), urls in zip(tasks, pool.map(_pages_worker, *zip(*tasks))):
+                per_file[pdf].extend(urls)
+    else:
+        for pdf, start, stop in tasks:
+            per_file[pdf].extend(_pages_worker(pdf, start, stop))
+        _reader_cache.clear()
+
+    for pdf, digest in readable:
+        urls = list(dict.fromkeys(per_file[pdf]))
+        results[pdf] = urls
+        cache[digest] = {"file": pdf, "urls": urls}
+        stats["parsed"] += 1
+    return results, stats
 
 
 def write_links(links: Iterable[str], out_path: str) -> int:
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    existing: Set[str] = set()
+    """Dosyada olmayan bağlantıları geldikleri sırayla ekle; eklenen sayısını döndür"""
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    seen: Set[str] = set()
     if os.path.exists(out_path):
         with open(out_path, "r", encoding="utf-8") as f:
             for line in f:
                 line = line.strip()
                 if line and not line.startswith("#"):
-                    existing.add(line)
+                    seen.add(line)
     added = 0
     with open(out_path, "a", encoding="utf-8") as f:
-        for u in sorted(set(links)):
-            if u in existing:
+        for u in links:
+            if u in seen:
                 continue
+            seen.add(u)
             f.write(u + "\n")
             added += 1
     return added
 
 
 def main():
-    path = sys.argv[1] if len(sys.argv) > 1 else PDF_PATH
-    if not os.path.exists(path):
-        print("PDF bulunamadı:", path)
+    parser = argparse.ArgumentParser(description="PDF kataloglarından ürün bağlantılarını çıkar")
+    parser.add_argument("paths", nargs="*", default=[PDF_PATH], help="PDF dosyaları veya klasörler")
+    parser.add_argument("--out", default=OUT_TXT)
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="sayfa işleyen süreç sayısı")
+    parser.add_argument("--full", action="store_true", help="önbelleği yok say, tüm PDF'leri yeniden ayrıştır")
+    args = parser.parse_args()
+
+    missing = [p for p in args.paths if not os.path.exists(p)]
+    if missing:
+        print("PDF bulunamadı:", ", ".join(missing))
         sys.exit(1)
-    urls = extract_urls_from_pdf(path)
-    filtered = [u for u in urls if keep_url(u)]
-    added = write_links(filtered, OUT_TXT)
-    print("Bulunan URL:", len(urls), "| Filtrelenen:", len(filtered), "| Eklenen yeni:", added)
-    print("Yazıldı ->", OUT_TXT)
+    pdfs = find_pdfs(args.paths)
+    cache = {} if args.full else load_cache(args.cache)
+    results, stats = extract_from_paths(pdfs, cache, args.workers)
+    write_atomic(args.cache, json.dumps(cache, ensure_ascii=False, indent=2))
+
+    found = kept = 0
+
+    def filtered():
+        nonlocal found, kept
+        for pdf in pdfs:
+            for u in results.get(pdf, []):
+                found += 1
+                if keep_url(u):
+                    kept += 1
+                    yield u
+
+    added = write_links(filtered(), args.out)
+    print("PDF:", len(pdfs), "| Önbellekten:", stats["cached"], "| Ayrıştırılan:", stats["parsed"],
+          f"({stats['pages']} sayfa)", "| Hatalı:", stats["failed"])
+    print("Bulunan URL:", found, "| Filtrelenen:", kept, "| Eklenen yeni:", added)
+    print("Yazıldı ->", args.out)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,189 @@
+"""Sütunlu, salt okunur ürün deposu.
+
+Ürün başına bir dict (ve içindeki liste/str nesneleri) yerine:
+
+  strings   tüm farklı metinler tek UTF-8 bayt tamponunda (aynı kategori,
+            uygulama vb. değerleri bir kez saklanır); str_ptr ile dilimlenir
+  <alan>    metin alanları: ürün başına metin numarası (uint32)
+  <liste>   liste alanları: CSR düzeni, <alan>_ptr + <alan>_ids
+
+Diziler artefakttan mmap ile açılabildiğinden worker'lar aynı sayfaları
+paylaşır. Ürünler dict gibi okunabilen hafif kayıtlar (ProductRecord) olarak
+döner; metinler yalnızca erişildiğinde (pratikte ilk k sonuç için) çözülür.
+"""
+import os
+import json
+from functools import lru_cache
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+STRING_FIELDS = ("product_name", "category", "short_desc", "url", "doc_url")
+LIST_FIELDS = ("applications", "problems_solved", "key_params")
+# products.jsonl'deki anahtar sırası (dict(kayıt) aynı sırayla döner)
+FIELDS = ("product_name", "category", "applications", "problems_solved", "key_params", "short_desc", "url", "doc_url")
+# Şemada olmayan ek anahtarlar ürün başına JSON metni olarak saklanır
+EXTRA = "_extra"
+TEXT_CACHE_SIZE = 8192
+_ARRAYS = (("strings", "str_ptr") + STRING_FIELDS + (EXTRA,)
+           + tuple(f"{f}_{part}" for f in LIST_FIELDS for part in ("ptr", "ids")))
+
+
+class ProductRecord(Mapping):
+    """Depodaki tek ürünün dict benzeri görünümü; alanlar erişildikçe çözülür"""
+
+    __slots__ = ("_store", "_i")
+
+    def __init__(self, store: "ProductStore", i: int):
+        self._store = store
+        self._i = i
+
+    def __getitem__(self, key: str) -> Any:
+        store, i = self._store, self._i
+        if key in store.strings_of:
+            return store.text(store.strings_of[key].item(i))
+        if key in store.lists_of:
+            ptr, ids = store.lists_of[key]
+            return [store.text(s) for s in ids[ptr.item(i):ptr.item(i + 1)].tolist()]
+        extra = store.extra(i)
+        if key in extra:
+            return extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from FIELDS
+        yield from self._store.extra(self._i)
+
+    def __len__(self) -> int:
+        return len(FIELDS) + len(self._store.extra(self._i))
+
+    def __repr__(self) -> str:
+        return f"ProductRecord({dict(self)!r})"
+
+
+class ProductStore(Sequence):
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self.strings_of = {f: getattr(self, f) for f in STRING_FIELDS}
+        self.lists_of = {f: (getattr(self, f"{f}_ptr"), getattr(self, f"{f}_ids")) for f in LIST_FIELDS}
+        # numpy dilimleme yerine memoryview: metin başına ~0.3 µs
+        self._buffer = memoryview(np.ascontiguousarray(self.strings)).cast("B") if len(self.strings) else memoryview(b"")
+        # Sık dönen metinler (kategori, uygulama, popüler ürünler) tekrar çözülmesin
+        self.text = lru_cache(maxsize=TEXT_CACHE_SIZE)(self._decode)
+
+    # --- kurulum -------------------------------------------------------------
+
+    @classmethod
+    def from_dicts(cls, products: List[Dict[str, Any]]) -> "ProductStore":
+        ids: Dict[str, int] = {}
+        pool: List[bytes] = []
+
+        def intern(value: Any) -> int:
+            text = value if isinstance(value, str) else ("" if value is None else str(value))
+            i = ids.get(text)
+            if i is None:
+                i = ids[text] = len(pool)
+                pool.append(text.encode("utf-8"))
+            return i
+
+        intern("")
+        n = len(products)
+        arrays: Dict[str, np.ndarray] = {}
+        for field in STRING_FIELDS:
+            arrays[field] = np.fromiter((intern(p.get(field)) for p in products), dtype=np.uint32, count=n)
+        for field in LIST_FIELDS:
+            lengths = np.zeros(n + 1, dtype=np.int64)
+            members: List[int] = []
+            for i, p in enumerate(products):
+                values = p.get(field) or []
+                values = values if isinstance(values, list) else [values]
+                lengths[i + 1] = len(values)
+                members.extend(intern(v) for v in values)
+            arrays[f"{field}_ptr"] = np.cumsum(lengths)
+            arrays[f"{field}_ids"] = np.asarray(members, dtype=np.uint32)
+        arrays[EXTRA] = np.fromiter(
+            (intern(json.dumps(extra, ensure_ascii=False) if extra else "")
+             for extra in ({k: v for k, v in p.items() if k not in FIELDS} for p in products)),
+            dtype=np.uint32, count=n)
+        str_ptr = np.zeros(len(pool) + 1, dtype=np.int64)
+        str_ptr[1:] = np.cumsum([len(b) for b in pool])
+        arrays["str_ptr"] = str_ptr
+        arrays["strings"] = np.frombuffer(b"".join(pool), dtype=np.uint8)
+        return cls(arrays)
+
+    # --- kaydetme / yükleme -------------------------------------------------------
+
+    def save(self, directory: str):
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"store_{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["ProductStore"]:
+        """Artefakttan salt okunur mmap ile aç; dosyalar yoksa None"""
+        paths = {name: os.path.join(directory, f"store_{name}.npy") for name in _ARRAYS}
+        if not all(os.path.exists(p) for p in paths.values()):
+            return None
+        return cls({name: np.load(p, mmap_mode="r") for name, p in paths.items()})
+
+    # --- erişim --------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.url)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [ProductRecord(self, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return ProductRecord(self, i)
+
+    def _decode(self, s: int) -> str:
+        ptr = self.str_ptr
+        return str(self._buffer[ptr.item(s):ptr.item(s + 1)], "utf-8")
+
+    def to_dict(self, i: int) -> Dict[str, Any]:
+        """Tek ürünü düz dict olarak çöz (ilk k sonuç için)"""
+        text, strings_of, lists_of = self.text, self.strings_of, self.lists_of
+        product: Dict[str, Any] = {}
+        for field in FIELDS:
+            if field in strings_of:
+                product[field] = text(strings_of[field].item(i))
+            else:
+                ptr, ids = lists_of[field]
+                product[field] = [text(s) for s in ids[ptr.item(i):ptr.item(i + 1)].tolist()]
+        if self._extra.item(i):
+            product.update(self.extra(i))
+        return product
+
+    def extra(self, i: int) -> Dict[str, Any]:
+        s = self._extra.item(i)
+        if s == 0:
+            return {}
+        return json.loads(self.text(s))
+
+    def column(self, field: str) -> List[Any]:
+        """Bir alanın tüm ürünlerdeki değerleri (toplu indeks kurulumları için); her farklı metin bir kez çözülür"""
+        if field in self.strings_of:
+            ids = self.strings_of[field]
+            texts = {int(s): self.text(int(s)) for s in np.unique(ids)}
+            return [texts[s] for s in ids.tolist()]
+        ptr, ids = self.lists_of[field]
+        texts = {int(s): self.text(int(s)) for s in np.unique(ids)}
+        flat = [texts[s] for s in ids.tolist()]
+        return [flat[ptr[i]:ptr[i + 1]] for i in range(len(self))]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        columns = {f: self.column(f) for f in FIELDS}
+        products = []
+        for i in range(len(self)):
+            p = {f: columns[f][i] for f in FIELDS}
+            p.update(self.extra(i))
+            products.append(p)
+        return products
+
+    def nbytes(self) -> int:
+        return int(sum(getattr(self, name).nbytes for name in _ARRAYS))
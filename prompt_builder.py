@@ -0,0 +1,184 @@
+"""LLM bağlamı için token bütçeli prompt oluşturma.
+
+Mesajlar iki parçadır:
+
+  sistem   her çağrıda bayt bayt aynı sabit önek (talimat + JSON şeması)
+  kullanıcı müşteri ihtiyacı + ürün başına tek satır
+
+OpenAI prompt önbelleği yalnızca en az PROMPT_CACHE_MIN_TOKENS (1024) tokenlık
+promptlarda devreye girer. Sistem öneki ~100 token, varsayılan bütçe (900)
+eşiğin altında olduğundan varsayılan ayarlarla önbellek hiç kullanılmaz.
+Öneki eşiğe kadar doldurmak çağrı başına ~900 token ekler; önbellekteki token
+indirimi (%50) bunu karşılamaz. Tasarruf kısa prompttan gelir, önbellekten değil.
+
+Ürün alanları öncelik sırasıyla yazılır (ad > çözülen problemler >
+uygulamalar > kategori > parametreler > açıklama). Toplam bütçeyi aşan
+promptta önce düşük sıradaki ürünlerin düşük öncelikli alanları kısaltılır
+/ atılır, gerekirse son ürünler çıkarılır; ürün adı hiç kısaltılmaz.
+
+Token sayısı tiktoken kuruluysa (ve kodlama dosyası yerelde varsa) gerçek
+tokenizer ile, değilse kelime/noktalama tabanlı bir tahminle hesaplanır.
+"""
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+SYSTEM_PROMPT = """Kimya şirketinin ürün öneri asistanısın. Müşteri ihtiyacını ve önerilen ürünleri analiz et; teknik terimleri kısaca açıkla, güvenliğe özen göster, pratik öneri ver.
+Yalnızca JSON döndür, her alan Türkçe ve en fazla 3 cümle:
+{"summary": "ihtiyaç özeti ve çözüm", "safety": "güvenlik uyarıları", "follow_up": "sonraki adımlar"}"""
+
+# (alan, etiket, liste alanıysa en fazla öğe, metin için en fazla karakter)
+FIELDS: Tuple[Tuple[str, str, int, int], ...] = (
+    ("problems_solved", "Problem", 4, 0),
+    ("applications", "Uygulama", 4, 0),
+    ("category", "Kategori", 0, 60),
+    ("key_params", "Parametre", 3, 0),
+    ("short_desc", "Açıklama", 0, 240),
+)
+# Bütçe aşılınca sırayla uygulanan kısaltmalar: (alan, yeni sınır; 0 = alanı at)
+SHRINK_STEPS: Tuple[Tuple[str, int], ...] = (
+    ("short_desc", 80),
+    ("short_desc", 0),
+    ("key_params", 0),
+    ("category", 0),
+    ("applications", 2),
+    ("problems_solved", 2),
+    ("applications", 0),
+)
+
+# Modele giden ürün alanları: LLM analiz önbelleğinin anahtarı bu alanların içeriğine bağlıdır
+PRODUCT_FIELDS: Tuple[str, ...] = ("product_name",) + tuple(field for field, _, _, _ in FIELDS)
+# Sistem promptu, alan sırası ya da ürün satırı biçimi değişince artırılır: eski promptla
+# üretilmiş analizler önbellekten (cache.analysis_key) dönmez
+PROMPT_VERSION = 2
+
+# OpenAI prompt önbelleğinin devreye girdiği en kısa prompt (token)
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_encoder: Optional[Callable[[str], List[int]]] = None
+_encoder_loaded = False
+
+
+def _get_encoder() -> Optional[Callable[[str], List[int]]]:
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("o200k_base").encode
+        except Exception:
+            # Kurulu değil ya da kodlama dosyası indirilemiyor (çevrimdışı): tahmin kullanılır
+            _encoder = None
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """Metnin yaklaşık token sayısı (gpt-4o ailesi)"""
+    encode = _get_encoder()
+    if encode is not None:
+        return len(encode(text))
+    # Türkçe metinde BPE kelime başına ~4 karakterlik parçalar üretir; noktalama ayrı token
+    return sum(max(1, round(len(t) / 4)) if t[0].isalnum() else 1 for t in _TOKEN_RE.findall(text))
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    if not limit or len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0] or text[:limit]
+    return cut.rstrip(",;:. ") + "…"
+
+
+class PromptBuilder:
+    def __init__(self, budget: int = 900, prompt_limit: int = 200):
+        # budget: sistem + kullanıcı mesajının toplam token sınırı
+        self.budget = budget
+        self.prompt_limit = prompt_limit
+        self.system_tokens = count_tokens(SYSTEM_PROMPT)
+
+    @classmethod
+    def from_env(cls) -> "PromptBuilder":
+        return cls(budget=int(os.getenv("LLM_PROMPT_BUDGET", "900")),
+                   prompt_limit=int(os.getenv("LLM_PROMPT_MAX_TOKENS", "200")))
+
+    def _clip_prompt(self, prompt: str) -> str:
+        prompt = " ".join((prompt or "").split())
+        # Küçük bütçelerde müşteri metni ürünlere en az yarı yer bırakır
+        limit = min(self.prompt_limit, max(20, (self.budget - self.system_tokens) // 2))
+        if count_tokens(prompt) <= limit:
+            return prompt
+        metrics.LLM_PROMPT_TRUNCATIONS.inc(field="prompt")
+        words = prompt.split()
+        # Kelime başına ~1.5 token varsayımıyla başla, sığana kadar kısalt
+        keep = min(len(words), int(limit / 1.5))
+        while keep > 1 and count_tokens(" ".join(words[:keep])) > limit:
+            keep = int(keep * 0.9)
+        return " ".join(words[:keep]) + " …"
+
+    def _limits(self) -> Dict[str, int]:
+        return {field: items or chars for field, _, items, chars in FIELDS}
+
+    def _product_line(self, i: int, product: Dict[str, Any], limits: Dict[str, int]) -> str:
+        name = " ".join(str(product.get("product_name") or "").split())
+        parts = [f"{i}. {name}"]
+        for field, label, items, _ in FIELDS:
+            limit = limits[field]
+            if not limit:
+                continue
+            value = product.get(field)
+            if items:
+                values = [" ".join(str(v).split()) for v in (value or []) if v]
+                text = ", ".join(values[:limit])
+            else:
+                text = _clip(str(value or ""), limit)
+                # Normalizasyon açıklamasız ürünlerde açıklamayı ürün adıyla doldurur; tekrar etme
+                if text.lower() == name.lower():
+                    text = ""
+            if text:
+                parts.append(f"{label}: {text}")
+        return " | ".join(parts)
+
+    def _user_message(self, prompt: str, lines: List[str]) -> str:
+        return f"Müşteri ihtiyacı: {prompt}\nÖnerilen ürünler:\n" + "\n".join(lines)
+
+    def build(self, prompt: str, products: List[Dict[str, Any]]) -> Tuple[List[Dict[str, str]], Dict[str, int]]:
+        """Bütçeye sığan mesajlar ve (tahmini) token / kısaltma istatistiği"""
+        prompt = self._clip_prompt(prompt)
+        limits = [self._limits() for _ in products]
+        lines = [self._product_line(i, p, limits[i - 1]) for i, p in enumerate(products, 1)]
+        user = self._user_message(prompt, lines)
+        tokens = self.system_tokens + count_tokens(user)
+        shrunk = 0
+        # Düşük sıradaki ürünlerden başlayarak düşük öncelikli alanları kısalt
+        for field, limit in SHRINK_STEPS:
+            if tokens <= self.budget:
+                break
+            for idx in reversed(range(len(products))):
+                if tokens <= self.budget:
+                    break
+                if limits[idx][field] <= limit:
+                    continue
+                limits[idx][field] = limit
+                lines[idx] = self._product_line(idx + 1, products[idx], limits[idx])
+                metrics.LLM_PROMPT_TRUNCATIONS.inc(field=field)
+                shrunk += 1
+                user = self._user_message(prompt, lines)
+                tokens = self.system_tokens + count_tokens(user)
+        # Hâlâ sığmıyorsa en alttaki ürünler çıkarılır (en az bir ürün kalır)
+        while tokens > self.budget and len(lines) > 1:
+            lines.pop()
+            metrics.LLM_PROMPT_TRUNCATIONS.inc(field="product")
+            shrunk += 1
+            user = self._user_message(prompt, lines)
+            tokens = self.system_tokens + count_tokens(user)
+
+        metrics.LLM_PROMPT_TOKENS.observe(tokens)
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user},
+        ]
+        return messages, {"prompt_tokens": tokens, "system_tokens": self.system_tokens,
+                          "products": len(lines), "truncations": shrunk}
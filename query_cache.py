@@ -0,0 +1,147 @@
+"""Benzer (yeniden ifade edilmiş) sorgular için anlamsal sonuç önbelleği.
+
+Tam metin eşleşmesi "ters osmozda kireç sorunu" ile "ters osmoz kireçlenme
+sorunu"nu ayrı sorgu sayar. Burada anahtar sorgunun L2 normalize TF-IDF
+vektörüdür: yeni sorgu önbellekteki bir sorguya kosinüs eşiğinden yakınsa
+onun ilk k sonucu döner.
+
+TF-IDF sözlüğü sınırlıdır (MAX_FEATURES): ürün kodları ve nadir terimler
+vektörde görünmez, "MAKS 1234" ile "MAKS 2345" aynı vektöre düşer. Bu yüzden
+sözlük dışı terimler ve ürün kodları kapsama (birebir eşleşmesi gereken kısım)
+eklenir; kosinüs yalnızca sözlükteki terimler arasında çalışır.
+
+En yakın komşu, önbellekteki sorgu vektörleri üzerinde küçük bir ters indeksle
+bulunur (terim -> kayıtlar); yalnızca ortak terimi olan kayıtlara bakılır.
+Kayıtlar top_k ve filtrelere göre ayrı kapsamlarda tutulur, sayı sınırı
+aşılınca en uzun süredir kullanılmayan atılır. Önbellek indeks sürümüne
+(IndexSnapshot) aittir; yeniden yüklemede yeni snapshot boş önbellekle gelir.
+"""
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_THRESHOLD = 0.9
+
+
+def cache_scope(top_k: int, filters: Optional[Dict[str, Any]], backend: str = "",
+                exact_terms: Iterable[str] = ()) -> str:
+    """Sonuçları etkileyen parametreler; farklı kapsamdaki kayıtlar eşleşmez.
+
+    exact_terms: kosinüsün göremediği, birebir (verilen sırayla) aynı olması gereken sorgu terimleri
+    """
+    normalized = {}
+    for field, values in (filters or {}).items():
+        values = values if isinstance(values, list) else [values]
+        if values:
+            normalized[field] = sorted(str(v) for v in values)
+    terms = " ".join(exact_terms)
+    return f"{top_k}|{backend}|{json.dumps(normalized, ensure_ascii=False, sort_keys=True)}|{terms}"
+
+
+class _Entry:
+    __slots__ = ("scope", "vector", "results")
+
+    def __init__(self, scope: str, vector: Dict[int, float], results: List[Any]):
+        self.scope = scope
+        self.vector = vector
+        self.results = results
+
+
+class QueryCache:
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE, threshold: float = QUERY_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        # (kapsam, terim) -> o terimi içeren kayıt numaraları
+        self._postings: Dict[Tuple[str, int], set] = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _row(query_vector) -> Dict[int, float]:
+        """Tek satırlık seyrek sorgu vektörü -> {terim: ağırlık}"""
+        return dict(zip(query_vector.indices.tolist(), query_vector.data.tolist()))
+
+    def _nearest(self, scope: str, vector: Dict[int, float]) -> Tuple[Optional[int], float]:
+        """Aynı kapsamda ortak terimi olan kayıtlar arasında en yüksek kosinüs (vektörler L2 normalize)"""
+        candidates = set()
+        for term in vector:
+            candidates.update(self._postings.get((scope, term), ()))
+        best, best_sim = None, 0.0
+        for entry_id in candidates:
+            other = self._entries[entry_id].vector
+            sim = sum(w * other.get(t, 0.0) for t, w in vector.items())
+            if sim > best_sim:
+                best, best_sim = entry_id, sim
+        return best, best_sim
+
+    def get(self, query_vector, scope: str) -> Optional[List[Any]]:
+        """Eşiğin üzerindeki en yakın kaydın sonuçları; yoksa None"""
+        vector = self._row(query_vector)
+        if not vector:
+            # Sözlükte terimi olmayan sorgu için benzerlik tanımsız
+            metrics.QUERY_CACHE_LOOKUPS.inc(result="skip")
+            return None
+        with self._lock:
+            entry_id, similarity = self._nearest(scope, vector)
+            if entry_id is None or similarity < self.threshold:
+                metrics.QUERY_CACHE_LOOKUPS.inc(result="miss")
+                return None
+            self._entries.move_to_end(entry_id)
+            results = self._entries[entry_id].results
+        metrics.QUERY_CACHE_LOOKUPS.inc(result="hit")
+        metrics.QUERY_CACHE_SIMILARITY.observe(similarity)
+        return list(results)
+
+    def put(self, query_vector, scope: str, results: List[Any]):
+        vector = self._row(query_vector)
+        if not vector or self.max_entries <= 0:
+            return
+        with self._lock:
+            entry_id, similarity = self._nearest(scope, vector)
+            if entry_id is not None and similarity >= self.threshold:
+                # Aynı sorgu eşzamanlı hesaplandıysa ikinci kayıt açılmaz
+                self._entries.move_to_end(entry_id)
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(scope, vector, list(results))
+            for term in vector:
+                self._postings.setdefault((scope, term), set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._evict(*self._entries.popitem(last=False))
+            metrics.QUERY_CACHE_ENTRIES.set(len(self._entries))
+
+    def _evict(self, entry_id: int, entry: _Entry):
+        for term in entry.vector:
+            key = (entry.scope, term)
+            ids = self._postings[key]
+            ids.discard(entry_id)
+            if not ids:
+                del self._postings[key]
+        metrics.QUERY_CACHE_EVICTIONS.inc()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+        metrics.QUERY_CACHE_ENTRIES.set(0)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = {r: metrics.QUERY_CACHE_LOOKUPS.value(result=r) for r in ("hit", "miss", "skip")}
+        total = sum(lookups.values())
+        return {
+            "enabled": True,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            **lookups,
+            "hit_rate": round(lookups["hit"] / total, 4) if total else 0.0,
+        }
@@ -1,19 +1,269 @@
+import os
 import json
-from typing import List, Dict, Any
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import time
+import threading
+from collections.abc import Mapping
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 import numpy as np
 
+import metrics
+from text_analysis import turkish_lower
+from bm25_index import BM25Index, product_codes
+from dense_index import DenseIndex
+from catalog_compact import (catalog_watch_paths, default_catalog_path, is_compacted, is_generic_name,
+                             is_valid_url, name_from_url, normalize_product)
+from facets import FacetIndex
+from product_store import ProductStore
+from query_cache import QUERY_CACHE_SIZE, QUERY_CACHE_THRESHOLD, QueryCache, cache_scope
+from search_index import DEFAULT_INDEX_DIR, IndexData, content_hash, fit_index, load_index, refresh_index
+
+class SearchResult(Mapping):
+    """Arama sonucu için hafif görünüm: ürün sözlüğünü kopyalamadan
+    similarity_score / reason / product_name alanlarını üzerine bindirir"""
+
+    __slots__ = ("_product", "_overrides")
+
+    def __init__(self, product: Dict[str, Any], similarity_score: float, reason: str, product_name: Optional[str] = None):
+        self._product = product
+        self._overrides = {"similarity_score": similarity_score, "reason": reason}
+        if product_name is not None:
+            self._overrides["product_name"] = product_name
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._overrides:
+            return self._overrides[key]
+        return self._product[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._product
+        for key in self._overrides:
+            if key not in self._product:
+                yield key
+
+    def __len__(self) -> int:
+        return len(self._product) + sum(1 for key in self._overrides if key not in self._product)
+
+    def __repr__(self) -> str:
+        return f"SearchResult({dict(self)!r})"
+
+class IndexSnapshot:
+    """Sorguların gördüğü değişmez indeks sürümü; yeniden yükleme yeni bir nesneyi tek atamayla devreye alır"""
+
+    __slots__ = ("products", "index", "valid", "url_names", "facets", "source_hash", "loaded_at", "query_cache")
+
+    def __init__(self, products: ProductStore, index: Optional[IndexData], valid: np.ndarray,
+                 url_names: List[str], facets: FacetIndex, source_hash: Optional[str],
+                 query_cache: Optional[QueryCache] = None):
+        self.products = products
+        self.index = index
+        # Sorgu anında tekrar hesaplanmaması için ürün başına geçerlilik ve URL'den türetilmiş adlar
+        self.valid = valid
+        self.url_names = url_names
+        self.facets = facets
+        self.source_hash = source_hash
+        self.loaded_at = time.time()
+        # Sonuçlar bu sürümün ürünlerine ait: yeni snapshot boş önbellekle başlar
+        self.query_cache = query_cache
+
+# Sıralama motoru: "tfidf" (kosinüs), "bm25" (alan ağırlıklı BM25),
+# "hybrid" (BM25 ile aday getir, TF-IDF kosinüsüyle harmanlayıp yeniden sırala) veya
+# "dense" (deneysel: hibrit adaylar + yoğun vektör komşuları, iki skor harmanlanır; bkz. dense_index.py)
+SEARCH_BACKENDS = ("tfidf", "bm25", "hybrid", "dense")
+DEFAULT_BACKEND = "hybrid"
+# Hibrit skorda BM25 ağırlığı ve yeniden sıralanacak aday havuzu
+HYBRID_ALPHA = 0.7
+HYBRID_POOL = 50
+# dense motorunda gömme benzerliğinin ağırlığı (geri kalanı hibrit sözcüksel skor)
+DENSE_WEIGHT = 0.6
+# Filtreye uyan ürün oranı bunun altındaysa yalnızca o ürünler doğrudan skorlanır
+SELECTIVE_FILTER_RATIO = 0.1
+# Toplu aramada aynı seyrek çarpıma giren sorgu sayısı: (sorgu x ürün) skor matrisi bellekte sınırlı kalsın
+BATCH_SCORE_ROWS = 64
+
 class ProductSearch:
-    def __init__(self, data_path: str = "data/products.jsonl"):
-        self.data_path = data_path
-        self.products = self._load_products()
-        self.vectorizer = None
-        self.product_vectors = None
-        self._build_search_index()
-    
-    def _load_products(self) -> List[Dict[str, Any]]:
-        """JSONL dosyasından ürünleri yükle"""
+    def __init__(self, data_path: Optional[str] = "data/products.jsonl", index_dir: Optional[str] = DEFAULT_INDEX_DIR,
+                 backend: Optional[str] = None, query_cache_size: Optional[int] = None):
+        # None: kanonik katalog izlenir (bkz. catalog_compact.default_catalog_path); her yenilemede
+        # yol yeniden seçilir, kaynaklar katalogdan yeniyse products.jsonl'e geçilir
+        self._follow_catalog = data_path is None
+        self.data_path = data_path or default_catalog_path()
+        self.index_dir = index_dir
+        self.backend = backend or os.getenv("SEARCH_BACKEND", DEFAULT_BACKEND)
+        if self.backend not in SEARCH_BACKENDS:
+            raise ValueError(f"Bilinmeyen arama motoru: {self.backend} (seçenekler: {', '.join(SEARCH_BACKENDS)})")
+        self.hybrid_alpha = float(os.getenv("HYBRID_ALPHA", str(HYBRID_ALPHA)))
+        self.dense_weight = float(os.getenv("DENSE_WEIGHT", str(DENSE_WEIGHT)))
+        # Benzer sorgu önbelleği (0 kapatır) ve isabet için gereken kosinüs benzerliği
+        if query_cache_size is None:
+            query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", str(QUERY_CACHE_SIZE)))
+        self.query_cache_size = query_cache_size
+        self.query_cache_threshold = float(os.getenv("QUERY_CACHE_THRESHOLD", str(QUERY_CACHE_THRESHOLD)))
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self.snapshot: IndexSnapshot = self._empty_snapshot()
+        self.reload()
+    
+    # Geriye dönük uyumluluk: güncel snapshot'ın parçaları
+    @property
+    def products(self) -> ProductStore:
+        return self.snapshot.products
+    
+    @property
+    def vectorizer(self):
+        return self.snapshot.index.vectorizer if self.snapshot.index else None
+    
+    @property
+    def product_vectors(self):
+        return self.snapshot.index.matrix if self.snapshot.index else None
+    
+    def _empty_snapshot(self) -> IndexSnapshot:
+        store = ProductStore.from_dicts([])
+        return IndexSnapshot(store, None, np.zeros(0, dtype=bool), [], FacetIndex.build(store), None)
+    
+    def _make_snapshot(self, products: ProductStore, index: Optional[IndexData], source_hash: Optional[str]) -> IndexSnapshot:
+        # Ürün başına kayıt çözmek yerine sütunlar bir kez okunur
+        urls, names = products.column('url'), products.column('product_name')
+        valid = np.fromiter((self._is_valid_url(u) for u in urls), dtype=bool, count=len(products))
+        url_names = [self._name_from_url(u) or n for u, n in zip(urls, names)]
+        cache = QueryCache(self.query_cache_size, self.query_cache_threshold) if index is not None and self.query_cache_size > 0 else None
+        return IndexSnapshot(products, index, valid, url_names, FacetIndex.build(products, valid), source_hash, cache)
+    
+    def _load_index_artifact(self, source_hash: str) -> Optional[Tuple[ProductStore, IndexData]]:
+        """Önceden derlenmiş indeksi mmap ile aç (bkz. search_index.py)"""
+        try:
+            artifact = load_index(self.index_dir, source_hash)
+        except Exception as e:
+            print(f"⚠️ İndeks artefaktı okunamadı: {e}")
+            return None
+        if artifact is None:
+            print(f"ℹ️ Güncel indeks artefaktı yok ({self.index_dir}), canlı fit yapılıyor")
+        elif self.backend == "dense" and artifact[1].dense is None:
+            print("ℹ️ İndeks artefaktında yoğun vektör yok (SEARCH_BACKEND=dense ile derlenmeli), canlı fit yapılıyor")
+            return None
+        return artifact
+    
+    def reload(self, full: bool = False) -> Dict[str, Any]:
+        """Katalog dosyasını yeniden oku, yeni indeksi kur ve tek atamayla devreye al.
+        
+        Sıra: güncel artefakt varsa mmap; yoksa mevcut sözlükle artımlı
+        güncelleme; değişiklik/sözlük kayması eşiği aşılırsa (veya full=True) tam fit.
+        """
+        with self._reload_lock:
+            t0 = time.perf_counter()
+            current = self.snapshot
+            if self._follow_catalog and current.index is not None:
+                self.data_path = default_catalog_path()
+            try:
+                source_hash = content_hash(self.data_path)
+            except FileNotFoundError:
+                source_hash = None
+            if not full and current.index is not None and source_hash == current.source_hash:
+                return {"status": "unchanged", "products": len(current.products)}
+
+            stats: Dict[str, Any] = {}
+            artifact = self._load_index_artifact(source_hash) if self.index_dir and source_hash else None
+            if artifact is not None:
+                products, index = artifact
+                mode = "artifact"
+                print(f"✅ {len(products)} ürün ve arama indeksi artefakttan yüklendi")
+            else:
+                # Çalışan bir indeks varken okunamayan / yarım yazılmış dosya onu bozmasın
+                serving = current.index is not None
+                try:
+                    products = self._load_products(strict=serving)
+                    if is_compacted(self.data_path, source_hash):
+                        print("ℹ️ Kanonik katalog: normalizasyon atlandı")
+                    else:
+                        products = self._normalize_products(products)
+                except Exception as e:
+                    return {"status": "error", "detail": str(e), "products": len(current.products)}
+                if serving and not products:
+                    return {"status": "error", "detail": "boş katalog, mevcut indeks korunuyor", "products": len(current.products)}
+                index, mode = None, "full"
+                if products:
+                    texts = self._search_texts(products)
+                    if not full and current.index is not None:
+                        index, stats = refresh_index(current.index, texts)
+                        mode = "incremental" if index is not None else "full"
+                    if index is None:
+                        index = fit_index(texts)
+                    # BM25 posting'leri doküman numarasına göre sıkıştırıldığından artımlı değil, baştan kurulur
+                    index.bm25 = BM25Index.build(products)
+                    if self.backend == "dense":
+                        # Artımlı yenilemede kodlayıcı korunur, yalnızca vektörler yeniden hesaplanır
+                        previous = current.index.dense if mode == "incremental" and current.index is not None else None
+                        index.dense = DenseIndex.build(texts, previous.encoder if previous is not None else None)
+                    print(f"✅ Arama indeksi oluşturuldu ({mode})")
+                # İndeksler kurulduktan sonra dict listesi bırakılır; snapshot sütunlu depoyu tutar
+                products = ProductStore.from_dicts(products)
+
+            # Atomik değişim: sorgular ya eski ya yeni snapshot'ı bütün olarak görür
+            self.snapshot = self._make_snapshot(products, index, source_hash)
+            if current.query_cache is not None and len(current.query_cache):
+                metrics.QUERY_CACHE_INVALIDATIONS.inc()
+                current.query_cache.clear()
+            seconds = time.perf_counter() - t0
+            self._export_metrics(self.snapshot, mode, seconds)
+            return {"status": "reloaded", "mode": mode, "products": len(products),
+                    "seconds": round(seconds, 4), **stats}
+    
+    def _export_metrics(self, snap: IndexSnapshot, mode: str, seconds: float):
+        metrics.INDEX_PRODUCTS.set(len(snap.products))
+        metrics.INDEX_TERMS.set(len(snap.index.vectorizer.vocabulary_) if snap.index is not None else 0)
+        metrics.INDEX_NNZ.set(snap.index.matrix.nnz if snap.index is not None else 0)
+        metrics.INDEX_LOAD_SECONDS.set(seconds)
+        metrics.INDEX_LOADED_AT.set(snap.loaded_at)
+        metrics.INDEX_RELOADS.inc(mode=mode)
+    
+    def _file_signature(self) -> Tuple[Optional[Tuple[int, int]], ...]:
+        paths = catalog_watch_paths() if self._follow_catalog else [self.data_path]
+        signature = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def start_watching(self, interval: float = 10.0):
+        """Katalog dosyasını (kanonik katalog izleniyorsa onu, meta'sını ve kaynaklarını) arka planda izle; değişirse indeksi yeniden kur"""
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        # İlk imza thread başlamadan alınır: başlatmadan hemen sonraki değişiklik kaçmasın
+        initial = self._file_signature()
+        
+        def watch():
+            last = initial
+            while not self._stop_watching.wait(interval):
+                signature = self._file_signature()
+                if signature == last:
+                    continue
+                last = signature
+                try:
+                    result = self.reload()
+                    if result["status"] == "reloaded":
+                        print(f"🔄 Arama indeksi yenilendi: {result}")
+                    elif result["status"] == "error":
+                        # Dosya yazılırken okunduysa bir sonraki turda tekrar dene
+                        last = None
+                        print(f"⚠️ İndeks yenilenemedi, mevcut indeks korunuyor: {result['detail']}")
+                except Exception as e:
+                    print(f"❌ İndeks yenileme hatası: {e}")
+        
+        self._watcher = threading.Thread(target=watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+    
+    def stop_watching(self):
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+    
+    def _load_products(self, strict: bool = False) -> List[Dict[str, Any]]:
+        """JSONL dosyasından ürünleri yükle (strict=True ise hatayı yukarı ilet)"""
         products = []
         try:
             with open(self.data_path, 'r', encoding='utf-8') as f:
@@ -24,90 +274,36 @@ class ProductSearch:
             return products
         except FileNotFoundError:
             print(f"❌ Dosya bulunamadı: {self.data_path}")
+            if strict:
+                raise
             return []
         except Exception as e:
             print(f"❌ Veri yükleme hatası: {e}")
+            if strict:
+                raise
             return []
     
+    # Normalizasyon kuralları catalog_compact.py'de; kanonik katalogda açılışta tekrar çalışmaz
     def _name_from_url(self, url: str) -> str:
-        try:
-            slug = (url or '').rstrip('/').rsplit('/', 1)[-1]
-            name = slug.replace('-', ' ').strip()
-            # Özel durumlar için düzeltmeler
-            if 'maks' in name.lower():
-                # MAKS 804 ANTİSKALANT gibi formatlar için
-                parts = name.split()
-                if len(parts) >= 2 and parts[0].upper() == 'MAKS':
-                    return f"MAKS {parts[1]} {' '.join(parts[2:]).upper()}"
-            return name.upper()
-        except Exception:
-            return ''
+        return name_from_url(url)
     
     def _is_generic_name(self, name: str) -> bool:
-        n = (name or '').strip().lower()
-        if len(n) <= 8:
-            return True
-        generic_keys = (
-            'hakkımızda', 'sertifikalar', 'insan kaynakları', 'gizlilik', 'politikası',
-            'ürün grupları', 'ürün grubu', 'soğutma suyu ıslahı', 'su ve proses',
-            'haberler', 'etkinlik', 'teknik', 'e-bülten', 'endüstriyel su hazırlama sistemleri'
-        )
-        if any(k in n for k in generic_keys):
-            return True
-        if 'ürünleri' in n and 'maks' not in n:
-            return True
-        category_like = (
-            'ters osmoz', 'kazan', 'soğutma suyu', 'temizlik ürünleri', 'mikroorganizma kontrol',
-        )
-        if any(k in n for k in category_like):
-            if not any(x in n for x in ('maks', 'antiskal', 'temizleyici', 'inhibitör', 'inhibitor', 'biyosit')):
-                return True
-        return False
+        return is_generic_name(name)
     
     def _is_valid_product(self, p: Dict[str, Any]) -> bool:
         """Kategori/menü sayfalarını ve hatalı URL'leri ele"""
-        url = (p.get('url') or '').lower()
-        name = (p.get('product_name') or '').lower()
-        if not url.startswith('http'):
-            return False
-        if 'info@' in url:
-            return False
-        # Sadece gerçekten kötü URL'leri filtrele
-        banned = ('urun-gruplar', 'urun-gruplari', 'hammaddeler', 'haberler', 'etkinlik', 'iletisim', 'bulten')
-        if any(b in url for b in banned):
-            return False
-        # Daha esnek filtreleme - çoğu URL'yi kabul et
-        return True
-    
-    def _normalize_products(self):
-        normalized: List[Dict[str, Any]] = []
-        for p in self.products:
-            if not self._is_valid_product(p):
-                continue
-            name = p.get('product_name') or ''
-            if self._is_generic_name(name):
-                fallback = self._name_from_url(p.get('url', ''))
-                if fallback:
-                    p['product_name'] = fallback
-            # short_desc temizle ve kısalt
-            short_desc = (p.get('short_desc') or '').strip()
-            # Gereksiz metinleri temizle
-            if any(word in short_desc.lower() for word in ['hakkımızda', 'sertifikalar', 'gizlilik', 'politikası', 'insan kaynakları', 'arges']):
-                short_desc = ''
-            if not short_desc or len(short_desc) < 5:
-                p['short_desc'] = p['product_name']
-            else:
-                p['short_desc'] = short_desc
-            normalized.append(p)
-        self.products = normalized
+        return self._is_valid_url(p.get('url'))
     
-    def _build_search_index(self):
-        """TF-IDF vektörleri oluştur"""
-        if not self.products:
-            return
-        self._normalize_products()
+    def _is_valid_url(self, url: Optional[str]) -> bool:
+        return is_valid_url(url)
+    
+    def _normalize_products(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [normalize_product(p) for p in products if self._is_valid_product(p)]
+    
+    def _search_texts(self, products: List[Dict[str, Any]]) -> List[str]:
+        """TF-IDF için ürün başına aranacak metin"""
         search_texts = []
-        for product in self.products:
+        for product in products:
             text_parts = [
                 product.get('product_name', ''),
                 product.get('category', ''),
@@ -116,14 +312,9 @@ class ProductSearch:
                 ' '.join(product.get('key_params', [])),
                 product.get('short_desc', '')
             ]
-            search_texts.append(' '.join(text_parts).lower())
-        self.vectorizer = TfidfVectorizer(
-            max_features=1000,
-            stop_words=None,
-            ngram_range=(1, 2)
-        )
-        self.product_vectors = self.vectorizer.fit_transform(search_texts)
-        print("✅ Arama indeksi oluşturuldu")
+            # Küçük harf/katlama analizcide yapılır (str.lower() 'İ'yi bozar)
+            search_texts.append(' '.join(text_parts))
+        return search_texts
     
     def _keywords(self, text: str) -> List[str]:
         text = (text or '').lower()
@@ -141,52 +332,331 @@ class ProductSearch:
         
         return "; ".join(reasons)
     
-    def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
-        if not self.products or self.vectorizer is None:
+    def _top_k(self, indices: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+        """Skora göre azalan ilk k pozisyon (tam sıralama yerine argpartition)"""
+        if len(scores) > k:
+            kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            # Sınırdaki eşit skorlular da aday: seçim argpartition'ın iç sırasına bağlı kalmasın
+            part = np.flatnonzero(scores >= kth)
+        else:
+            part = np.arange(len(scores))
+        # Eşit skorlarda katalog sırası: sonuçlar çalıştırmadan çalıştırmaya değişmez
+        return part[np.lexsort((indices[part], -scores[part]))][:k]
+    
+    def _csr_row(self, matrix, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Seyrek matris satırı: (sütun numaraları, değerler); sütunlar sıralı olmayabilir"""
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        return matrix.indices[start:end].astype(np.int64), matrix.data[start:end]
+    
+    def _values_at(self, indices: np.ndarray, values: np.ndarray, wanted: np.ndarray, scratch: np.ndarray) -> np.ndarray:
+        """(indices, values) satırından istenen sütunların değeri, olmayanlar 0. scratch: ürün sayısı
+        uzunluğunda sıfır dizisi; satır içine yazılıp okunur ve yeniden sıfırlanır (satırı sıralamaktan ucuz)"""
+        scratch[indices] = values
+        out = scratch[wanted]
+        scratch[indices] = 0
+        return out
+    
+    def search(self, query: str, top_k: int = 3, filters: Optional[Dict[str, List[str]]] = None) -> List[Dict[str, Any]]:
+        """filters: {"category": [...], "applications": [...]} (bkz. facets.py); alan içi VEYA, alanlar arası VE"""
+        snap = self.snapshot
+        if not snap.products or snap.index is None:
+            return []
+        cache = snap.query_cache
+        if cache is None:
+            return self._search(snap, query, top_k, filters)
+        with metrics.span("search_transform"):
+            query_vector = snap.index.vectorizer.transform([query])
+        scope = self._cache_scope(snap, query, top_k, filters)
+        with metrics.span("search_cache"):
+            results = cache.get(query_vector, scope)
+        if results is None:
+            results = self._search(snap, query, top_k, filters, query_vector)
+            cache.put(query_vector, scope, results)
+        return results
+    
+    def _cache_scope(self, snap: IndexSnapshot, query: str, top_k: int, filters: Optional[Dict[str, List[str]]]) -> str:
+        """Önbellek kapsamı: motor, ürün kodları ve TF-IDF vektörünün göremediği terimler birebir eşleşmeli.
+        
+        TF-IDF sözlüğü dışında kalıp BM25'in skorladığı terimler ("MAKS 1234"teki 1234) kapsama
+        girer; hiçbir indekste olmayan dolgu kelimeleri sonucu değiştirmez, girmez. Dense motorunda
+        sorgunun analiz edilmiş terim dizisi olduğu gibi girer: sözlük dışı ihtiyaç kelimeleri
+        (yosun / pas) ve (sentence modelinde) kelime sırası yoğun vektörü değiştirir. Böylece dense'te
+        yalnızca büyük/küçük harf, ek ve noktalama farkı olan sorgular önbellekten döner.
+        """
+        vectorizer, bm25 = snap.index.vectorizer, snap.index.bm25
+        terms = vectorizer.analyzer.tokenize(query)
+        if self.backend != "dense":
+            terms = sorted(t for t in terms if t not in vectorizer.vocabulary_
+                           and (bm25 is None or t in bm25.vocabulary))
+        return cache_scope(top_k, filters, self.backend, terms + sorted(product_codes(query)))
+    
+    def _search(self, snap: IndexSnapshot, query: str, top_k: int, filters: Optional[Dict[str, List[str]]],
+                query_vector=None) -> List[Dict[str, Any]]:
+        allowed = snap.facets.mask(filters)
+        if allowed is not None:
+            return self._search_filtered(snap, query, top_k, allowed, query_vector)
+        if self.backend == "dense" and snap.index.dense is not None:
+            return self._search_dense(snap, query, top_k, query_vector=query_vector)
+        if self.backend != "tfidf" and snap.index.bm25 is not None:
+            return self._search_bm25(snap, query, top_k, query_vector=query_vector)
+        if query_vector is None:
+            with metrics.span("search_transform"):
+                query_vector = snap.index.vectorizer.transform([query])
+        # Tek seyrek çarpım: yalnızca sorgu terimlerinin posting listeleri taranır.
+        # Satırlar L2 normalize olduğundan sonuç kosinüs benzerliğine eşittir.
+        with metrics.span("search_score"):
+            scores_row = (query_vector @ snap.index.postings).tocsr()
+        with metrics.span("search_rank"):
+            return self._rank(snap, query, scores_row.indices, scores_row.data, top_k)
+    
+    def _search_filtered(self, snap: IndexSnapshot, query: str, top_k: int, allowed: np.ndarray,
+                         query_vector=None) -> List[Dict[str, Any]]:
+        """Faset filtresi skorlamadan önce uygulanır; sonuçlar (yedek liste dahil) filtre dışına çıkmaz"""
+        pool = np.flatnonzero(allowed & snap.valid)
+        if not len(pool):
             return []
-        query_vector = self.vectorizer.transform([query.lower()])
-        similarities = cosine_similarity(query_vector, self.product_vectors).flatten()
-        top_indices = np.argsort(similarities)[::-1][:max(top_k*5, top_k)]
+        if len(pool) <= SELECTIVE_FILTER_RATIO * len(snap.products):
+            # Seçici filtre: yalnızca filtredeki ürünlerin skoru hesaplanır
+            with metrics.span("search_filtered"):
+                scores = self._score_docs(snap, query, pool, query_vector)
+            with metrics.span("search_rank"):
+                return self._rank(snap, query, pool, scores, top_k, pool)
+        if self.backend == "dense" and snap.index.dense is not None:
+            return self._search_dense(snap, query, top_k, allowed, pool, query_vector)
+        if self.backend != "tfidf" and snap.index.bm25 is not None:
+            return self._search_bm25(snap, query, top_k, allowed, pool, query_vector)
+        if query_vector is None:
+            with metrics.span("search_transform"):
+                query_vector = snap.index.vectorizer.transform([query])
+        with metrics.span("search_score"):
+            scores_row = (query_vector @ snap.index.postings).tocsr()
+            keep = allowed[scores_row.indices]
+        with metrics.span("search_rank"):
+            return self._rank(snap, query, scores_row.indices[keep], scores_row.data[keep], top_k, pool)
+    
+    def _score_docs(self, snap: IndexSnapshot, query: str, docs: np.ndarray, query_vector=None,
+                    query_embedding: Optional[np.ndarray] = None, lexical: Optional[np.ndarray] = None) -> np.ndarray:
+        """Verilen ürünlerin seçili motordaki skoru (0-1 aralığında); lexical: önceden hesaplanmış sözcüksel skor"""
+        scores = self._lexical_scores(snap, query, docs, query_vector) if lexical is None else lexical
+        dense = snap.index.dense
+        if self.backend != "dense" or dense is None:
+            return scores
+        if query_embedding is None:
+            query_embedding = dense.encode_query(query)
+        similarity = np.maximum(dense.score(query_embedding, docs), 0)
+        return (1 - self.dense_weight) * scores + self.dense_weight * similarity
+    
+    def _lexical_scores(self, snap: IndexSnapshot, query: str, docs: np.ndarray, query_vector=None) -> np.ndarray:
+        """tfidf / bm25 / hibrit (dense motorunda da hibrit) skor"""
+        cosine = None
+        if self.backend != "bm25" or snap.index.bm25 is None:
+            if query_vector is None:
+                query_vector = snap.index.vectorizer.transform([query])
+            cosine = np.asarray((snap.index.matrix[docs] @ query_vector.T).todense()).ravel()
+            if self.backend == "tfidf" or snap.index.bm25 is None:
+                return cosine
+        scores, upper = snap.index.bm25.score(query, docs)
+        scores = scores / upper if upper > 0 else scores
+        if cosine is None:
+            return scores
+        return self.hybrid_alpha * scores + (1 - self.hybrid_alpha) * cosine
+    
+    def _search_bm25(self, snap: IndexSnapshot, query: str, top_k: int, allowed: Optional[np.ndarray] = None,
+                     fallback: Optional[np.ndarray] = None, query_vector=None) -> List[Dict[str, Any]]:
+        """Ters indeksten MaxScore ile ilk adaylar; hibritte TF-IDF kosinüsüyle yeniden sıralanır"""
+        hybrid = self.backend in ("hybrid", "dense")
+        pool = max(top_k * 5, HYBRID_POOL) if hybrid else top_k * 5
+        with metrics.span("search_bm25"):
+            docs, scores, upper = snap.index.bm25.top_k(query, pool, allowed)
+            # Skor üst sınırına bölünür: benzerlik yüzdesi 0-1 aralığında kalsın
+            scores = scores / upper if upper > 0 else scores
+        if hybrid and len(docs):
+            with metrics.span("search_rerank"):
+                if query_vector is None:
+                    query_vector = snap.index.vectorizer.transform([query])
+                cosine = np.asarray((snap.index.matrix[docs] @ query_vector.T).todense()).ravel()
+                scores = self.hybrid_alpha * scores + (1 - self.hybrid_alpha) * cosine
+        with metrics.span("search_rank"):
+            return self._rank(snap, query, docs, scores, top_k, fallback)
+    
+    def _search_dense(self, snap: IndexSnapshot, query: str, top_k: int, allowed: Optional[np.ndarray] = None,
+                      fallback: Optional[np.ndarray] = None, query_vector=None) -> List[Dict[str, Any]]:
+        """BM25 adayları ile gömme uzayındaki en yakın komşuların birleşimi, harmanlanmış skorla sıralanır.
+        
+        Sözcük olarak hiç eşleşmeyen ama aynı ihtiyacı anlatan ürünler (borularda kireç -> antiskalant)
+        yoğun vektör tarafından aday havuzuna girer; yerleşik lsa kodlayıcısında bu yalnızca
+        embedding.CONCEPTS'teki elle yazılmış eş anlamlılar için olur.
+        """
+        pool = max(top_k * 5, HYBRID_POOL)
+        docs = np.zeros(0, dtype=np.int64)
+        if snap.index.bm25 is not None:
+            with metrics.span("search_bm25"):
+                docs, _, _ = snap.index.bm25.top_k(query, pool, allowed)
+        with metrics.span("search_dense"):
+            query_embedding = snap.index.dense.encode_query(query)
+            neighbours, _ = snap.index.dense.search(query_embedding, pool, allowed)
+            docs = np.union1d(docs.astype(np.int64), neighbours)
+        with metrics.span("search_rerank"):
+            scores = self._score_docs(snap, query, docs, query_vector, query_embedding) if len(docs) else np.zeros(0)
+        with metrics.span("search_rank"):
+            return self._rank(snap, query, docs, scores, top_k, fallback)
+    
+    def search_batch(self, queries: List[str], top_k: int = 3,
+                     filters: Optional[Dict[str, List[str]]] = None) -> List[List[Dict[str, Any]]]:
+        """Birden çok sorgu: tek transform, her BATCH_SCORE_ROWS sorgu için tek seyrek matris çarpımı
+        (bkz. _search_many); tekrarlayan sorgular bir kez hesaplanır"""
+        snap = self.snapshot
+        if not snap.products or snap.index is None:
+            return [[] for _ in queries]
+        unique = list(dict.fromkeys(turkish_lower(q) for q in queries))
+        vectors = snap.index.vectorizer.transform(unique)
+        cache = snap.query_cache
+        scopes = [self._cache_scope(snap, q, top_k, filters) for q in unique] if cache is not None else []
+        ranked: Dict[str, List[Dict[str, Any]]] = {}
+        if cache is not None:
+            for i, q in enumerate(unique):
+                hit = cache.get(vectors[i], scopes[i])
+                if hit is not None:
+                    ranked[q] = hit
+        missing = [i for i, q in enumerate(unique) if q not in ranked]
+        allowed = snap.facets.mask(filters) if missing else None
+        for start in range(0, len(missing), BATCH_SCORE_ROWS):
+            chunk = missing[start:start + BATCH_SCORE_ROWS]
+            found = self._search_many(snap, [unique[i] for i in chunk], top_k, allowed, vectors[chunk])
+            for i, results in zip(chunk, found):
+                ranked[unique[i]] = results
+        if cache is not None:
+            for i in missing:
+                cache.put(vectors[i], scopes[i], ranked[unique[i]])
+        return [ranked[turkish_lower(q)] for q in queries]
+    
+    def _search_many(self, snap: IndexSnapshot, queries: List[str], top_k: int, allowed: Optional[np.ndarray],
+                     vectors) -> List[List[Dict[str, Any]]]:
+        """Toplu arama: sözcüksel skorlar tüm sorgular için tek seyrek çarpımla hesaplanır.
+
+        Aday havuzu, harmanlama ve sıralama tek sorgu yoluyla (_search / _search_filtered) aynıdır;
+        MaxScore budaması yerine her satırın ilk adayları seçilir. dense motorunda yoğun vektör
+        komşuları sorgu başına aranır.
+        """
+        fallback = None
+        selective = False
+        if allowed is not None:
+            fallback = np.flatnonzero(allowed & snap.valid)
+            if not len(fallback):
+                return [[] for _ in queries]
+            selective = len(fallback) <= SELECTIVE_FILTER_RATIO * len(snap.products)
+        bm25 = snap.index.bm25 if self.backend != "tfidf" else None
+        dense = snap.index.dense if self.backend == "dense" else None
+        pool = max(top_k * 5, HYBRID_POOL) if self.backend in ("hybrid", "dense") else top_k * 5
+        with metrics.span("search_score"):
+            bm25_scores = uppers = cosine = None
+            if bm25 is not None:
+                bm25_scores, uppers = bm25.score_batch(queries, allowed)
+            # Kosinüs tüm ürünlerde yalnızca adaylar ondan çıkıyorsa ya da filtre seçiciyse hesaplanır;
+            # hibritte BM25 adaylarının kosinüsü aşağıda tek seyrek çarpımla bulunur
+            if bm25 is None or (selective and self.backend != "bm25"):
+                # Satırlar L2 normalize olduğundan sonuç kosinüs benzerliğine eşittir
+                cosine = (vectors @ snap.index.postings).tocsr()
+                if allowed is not None:
+                    cosine.data *= allowed[cosine.indices]
+                    cosine.eliminate_zeros()
+
+        scratch = np.zeros(len(snap.products), dtype=np.float64)
+        candidates, lexical, embeddings = [], [], []
+        with metrics.span("search_rerank"):
+            for r, query in enumerate(queries):
+                if cosine is not None:
+                    cos_docs, cos_values = self._csr_row(cosine, r)
+                if bm25_scores is not None:
+                    bm_docs, bm_values = self._csr_row(bm25_scores, r)
+                    bm_values = bm_values / uppers[r] if uppers[r] > 0 else bm_values
+                if selective:
+                    docs = fallback
+                elif bm25 is not None:
+                    docs = bm_docs[self._top_k(bm_docs, bm_values, pool)]
+                elif dense is None:
+                    docs = cos_docs
+                else:
+                    docs = np.zeros(0, dtype=np.int64)
+                if dense is not None:
+                    embeddings.append(dense.encode_query(query))
+                    if not selective:
+                        neighbours, _ = dense.search(embeddings[-1], pool, allowed)
+                        docs = np.union1d(docs, neighbours)
+                if bm25 is None:
+                    scores = self._values_at(cos_docs, cos_values, docs, scratch)
+                else:
+                    scores = self._values_at(bm_docs, bm_values, docs, scratch)
+                    if cosine is not None:
+                        scores = (self.hybrid_alpha * scores
+                                  + (1 - self.hybrid_alpha) * self._values_at(cos_docs, cos_values, docs, scratch))
+                candidates.append(docs)
+                lexical.append(scores)
+            if bm25 is not None and cosine is None and self.backend != "bm25":
+                # Tüm (sorgu, aday) çiftlerinin kosinüsü: aday satırları ile sorgu satırlarının öğe çarpımı
+                sizes = [len(docs) for docs in candidates]
+                rows = np.repeat(np.arange(len(queries)), sizes)
+                pairs = snap.index.matrix[np.concatenate(candidates)].multiply(vectors[rows])
+                pair_cosine = np.split(np.asarray(pairs.sum(axis=1)).ravel(), np.cumsum(sizes)[:-1])
+                lexical = [self.hybrid_alpha * scores + (1 - self.hybrid_alpha) * pair
+                           for scores, pair in zip(lexical, pair_cosine)]
+
         results = []
-        for idx in top_indices:
-            if similarities[idx] > 0:
-                product = self.products[idx].copy()
-                if self._is_valid_product(product):
-                    product['similarity_score'] = float(similarities[idx])
-                    product['reason'] = self._reason(product, query, product['similarity_score'])
-                    results.append(product)
-            if len(results) >= top_k:
-                break
-        if not results:
-            soft = []
-            for idx in np.argsort(similarities)[::-1]:
-                if similarities[idx] <= 0:
-                    break
-                p = self.products[idx].copy()
-                if self._is_valid_product(p):
-                    p['similarity_score'] = float(similarities[idx])
-                    if self._is_generic_name(p.get('product_name','')):
-                        derived = self._name_from_url(p.get('url',''))
-                        if derived:
-                            p['product_name'] = derived
-                    p['reason'] = self._reason(p, query, p['similarity_score'])
-                    soft.append(p)
-                if len(soft) >= top_k:
-                    break
-            if soft:
-                return soft
-            last_res = []
-            for idx in np.argsort(similarities)[::-1][:top_k]:
-                p = self.products[idx].copy()
-                p['similarity_score'] = float(similarities[idx])
-                p['product_name'] = self._name_from_url(p.get('url','')) or p.get('product_name','')
-                p['reason'] = self._reason(p, query, p['similarity_score'])
-                last_res.append(p)
-            return last_res
+        for r, query in enumerate(queries):
+            docs, scores = candidates[r], lexical[r]
+            if dense is not None and len(docs):
+                with metrics.span("search_rerank"):
+                    scores = self._score_docs(snap, query, docs, query_embedding=embeddings[r], lexical=scores)
+            with metrics.span("search_rank"):
+                results.append(self._rank(snap, query, docs, scores, top_k, fallback))
         return results
     
-    def get_all_products(self) -> List[Dict[str, Any]]:
+    def _rank(self, snap: IndexSnapshot, query: str, matched: np.ndarray, scores: np.ndarray, top_k: int,
+              fallback: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Eşleşen ürün/skor çiftlerinden sonuç listesini oluştur; fallback: eşleşme yoksa seçilebilecek ürünler"""
+        matched = matched.astype(np.int64, copy=False)
+        positive = scores > 0
+        matched, scores = matched[positive], scores[positive]
+
+        valid = snap.valid[matched]
+        if valid.any():
+            cand, cand_scores = matched[valid], scores[valid]
+            order = self._top_k(cand, cand_scores, top_k)
+            results = []
+            for pos in order:
+                idx, score = int(cand[pos]), float(cand_scores[pos])
+                product = snap.products.to_dict(idx)
+                results.append(SearchResult(product, score, self._reason(product, query, score)))
+            return results
+
+        # Eşleşme yok: skor sırasıyla (sıfır skorlular en sonda) ilk top_k, URL'den türetilmiş adla
+        order = [int(matched[pos]) for pos in self._top_k(matched, scores, top_k)]
+        seen = set(order)
+        fallback = fallback if fallback is not None else np.arange(len(snap.products))
+        for idx in fallback[::-1][:top_k + len(seen)].tolist():
+            if len(order) >= top_k:
+                break
+            if idx not in seen:
+                order.append(idx)
+        score_of = dict(zip(matched.tolist(), scores.tolist()))
+        last_res = []
+        for idx in order:
+            product = snap.products.to_dict(idx)
+            score = score_of.get(idx, 0.0)
+            last_res.append(SearchResult(product, score, self._reason(product, query, score), snap.url_names[idx]))
+        return last_res
+    
+    def get_all_products(self) -> ProductStore:
         return self.products
     
-    def get_products_by_category(self, category: str) -> List[Dict[str, Any]]:
-        return [p for p in self.products if p.get('category', '').lower() == category.lower()]
+    def get_products_by_category(self, category: str) -> List[Mapping]:
+        snap = self.snapshot
+        return [snap.products[i] for i in snap.facets.select({"category": [category]}).tolist()]
+    
+    def query_cache_stats(self) -> Dict[str, Any]:
+        cache = self.snapshot.query_cache
+        return cache.stats() if cache is not None else {"enabled": False}
+    
+    def facet_counts(self, filters: Optional[Dict[str, List[str]]] = None, limit: int = 20) -> Dict[str, Any]:
+        """Filtreye uyan ürünlerde kategori/uygulama/sorun/parametre değerlerinin sayıları"""
+        return self.snapshot.facets.counts(filters, limit)
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""Önceden oluşturulmuş, memory-map edilen arama indeksi artefaktı.
+
+Çevrimdışı derleme (deploy öncesi bir kez):
+    python search_index.py [data/catalog.jsonl | data/products.jsonl] [data/index]
+
+Artefakt `data/index/v<sürüm>-<products.jsonl hash>/` dizinine yazılır:
+  meta.json        sürüm, kaynak hash, parametreler
+  vocabulary.json  sütun sırasıyla terimler
+  idf.npy          IDF ağırlıkları
+  data.npy / indices.npy / indptr.npy   L2 normalize TF-IDF CSR matrisi
+  postings_*.npy   aynı matrisin terim -> ürün (CSC) hali; sorgu maliyeti
+                   katalog boyutuna değil eşleşen posting sayısına bağlı olur
+  counts_*.npy     ham terim sayıları (artımlı yeniden indeksleme için)
+  row_hashes.npy   satır metinlerinin hash'i (hangi satırların değiştiğini bulmak için)
+  bm25_*.npy       alan ağırlıklı BM25 ters indeksi (bkz. bm25_index.py)
+  store_*.npy      normalize edilmiş ürünler, sütunlu depo (bkz. product_store.py)
+  dense_*          yalnızca SEARCH_BACKEND=dense ile derlenince: gömme kodlayıcısı,
+                   nicemlenmiş ürün vektörleri ve IVF kümeleri (bkz. dense_index.py)
+
+Worker'lar diziyi `np.load(mmap_mode='r')` ile salt okunur açar; sayfalar
+süreçler arasında paylaşılır ve sklearn fit makinesi hiç import edilmez.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from bm25_index import BM25Index
+from dense_index import DenseIndex
+from product_store import ProductStore
+from text_analysis import ANALYZER_VERSION, TurkishAnalyzer, get_analyzer
+
+ARTIFACT_VERSION = 6
+DEFAULT_INDEX_DIR = os.path.join("data", "index")
+NGRAM_RANGE = (1, 2)
+MAX_FEATURES = 1000
+# Artımlı güncelleme sınırları: bunlar aşılırsa sözlük dahil tam fit yapılır
+MAX_CHANGED_RATIO = 0.3
+VOCAB_DRIFT_THRESHOLD = 0.1
+
+
+def content_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def row_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def artifact_dir(index_dir: str, source_hash: str) -> str:
+    return os.path.join(index_dir, f"v{ARTIFACT_VERSION}-{source_hash[:16]}")
+
+
+class QueryVectorizer:
+    """Fit edilmiş TfidfVectorizer.transform'un sklearn gerektirmeyen karşılığı"""
+
+    def __init__(self, vocabulary: Dict[str, int], idf: np.ndarray,
+                 ngram_range: Tuple[int, int] = NGRAM_RANGE, analyzer: Optional[TurkishAnalyzer] = None):
+        self.vocabulary_ = vocabulary
+        self.idf_ = idf
+        self.ngram_range = tuple(ngram_range)
+        self.analyzer = analyzer or get_analyzer(self.ngram_range)
+
+    def with_idf(self, idf: np.ndarray) -> "QueryVectorizer":
+        return QueryVectorizer(self.vocabulary_, idf, self.ngram_range, self.analyzer)
+
+    def _analyze(self, text: str) -> List[str]:
+        return self.analyzer.analyze(text)
+
+    def term_counts(self, text: str) -> Tuple[Dict[int, int], int]:
+        """Sözlükteki terimlerin sayıları ve (sözlük dışı dahil) toplam terim sayısı"""
+        counts: Dict[int, int] = {}
+        terms = self._analyze(text)
+        for term in terms:
+            col = self.vocabulary_.get(term)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+        return counts, len(terms)
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        data: List[float] = []
+        indices: List[int] = []
+        indptr = [0]
+        for text in texts:
+            counts, _ = self.term_counts(text)
+            cols = sorted(counts)
+            weights = np.array([counts[c] for c in cols], dtype=np.float64) * self.idf_[cols]
+            norm = np.sqrt(np.dot(weights, weights))
+            if norm > 0:
+                weights /= norm
+            indices.extend(cols)
+            data.extend(weights.tolist())
+            indptr.append(len(indices))
+        return sp.csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int32)),
+            shape=(len(texts), len(self.idf_))
+        )
+
+
+class IndexData:
+    """Bir indeks sürümünün sorgu ve artımlı güncelleme için gereken tüm parçaları"""
+
+    __slots__ = ("vectorizer", "counts", "matrix", "postings", "row_hashes", "coverage", "stale_rows", "bm25", "dense")
+
+    def __init__(self, vectorizer: QueryVectorizer, counts: sp.csr_matrix, matrix: sp.csr_matrix,
+                 postings: sp.csr_matrix, row_hashes: np.ndarray, coverage: float, stale_rows: int = 0,
+                 bm25: Optional[BM25Index] = None, dense: Optional[DenseIndex] = None):
+        self.vectorizer = vectorizer
+        self.counts = counts
+        self.matrix = matrix
+        self.postings = postings
+        self.row_hashes = row_hashes
+        # Tam fit anında terimlerin sözlükte kalan oranı (sözlük kayması için referans)
+        self.coverage = coverage
+        # Son tam fit'ten bu yana artımlı olarak yeniden hesaplanan satır sayısı
+        self.stale_rows = stale_rows
+        # BM25 ters indeksi ürün alanlarından kurulur (TF-IDF'ten bağımsız, sözlük sınırı yok)
+        self.bm25 = bm25
+        # Yoğun vektör indeksi isteğe bağlı (SEARCH_BACKEND=dense)
+        self.dense = dense
+
+
+def postings_of(matrix: sp.csr_matrix) -> sp.csr_matrix:
+    """Ürün x terim matrisinden terim x ürün (posting listesi) CSR matrisi"""
+    postings = matrix.T.tocsr()
+    postings.sort_indices()
+    return postings
+
+
+def _weigh(counts: sp.csr_matrix) -> Tuple[np.ndarray, sp.csr_matrix]:
+    """Ham sayılardan smooth IDF ve L2 normalize TF-IDF (TfidfTransformer varsayılanlarıyla aynı)"""
+    n_docs = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+    matrix = (counts.astype(np.float64) @ sp.diags(idf)).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = (sp.diags(1 / norms) @ matrix).tocsr()
+    matrix.sort_indices()
+    return idf, matrix
+
+
+def fit_index(search_texts: List[str]) -> IndexData:
+    """Canlı tam fit (artefakt yoksa, eskiyse ya da sözlük kaydıysa)"""
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    # TfidfVectorizer(max_features=1000) ile aynı sonuç; ancak ham sayılar ve
+    # sözlük dışında kalan terim oranı da elde kalır. Token'lar sorgu tarafıyla
+    # aynı Türkçe analizciden geçer.
+    analyzer = get_analyzer(NGRAM_RANGE)
+    counter = CountVectorizer(tokenizer=analyzer.tokenize, lowercase=False, token_pattern=None,
+                              ngram_range=NGRAM_RANGE)
+    full = counter.fit_transform(search_texts).tocsr()
+    total_terms = full.sum()
+    tfs = np.asarray(full.sum(axis=0)).ravel()
+    keep = np.sort((-tfs).argsort()[:MAX_FEATURES])
+    counts = full[:, keep].tocsr()
+    terms = counter.get_feature_names_out()[keep]
+
+    idf, matrix = _weigh(counts)
+    vectorizer = QueryVectorizer({t: i for i, t in enumerate(terms)}, idf, NGRAM_RANGE, analyzer)
+    return IndexData(
+        vectorizer, counts, matrix, postings_of(matrix),
+        np.array([row_hash(t) for t in search_texts], dtype=np.uint64),
+        float(counts.sum() / total_terms) if total_terms else 1.0
+    )
+
+
+def refresh_index(old: IndexData, search_texts: List[str]) -> Tuple[Optional[IndexData], Dict[str, Any]]:
+    """Mevcut sözlüğü koruyarak yalnızca değişen satırları yeniden hesapla.
+
+    Değişen satır oranı veya sözlük kayması eşiği aşarsa (None, istatistik) döner;
+    bu durumda çağıran tam fit yapmalıdır.
+    """
+    hashes = np.array([row_hash(t) for t in search_texts], dtype=np.uint64)
+    old_rows = {int(h): i for i, h in enumerate(old.row_hashes)}
+    reuse = np.array([old_rows.get(int(h), -1) for h in hashes], dtype=np.int64)
+    changed = np.flatnonzero(reuse < 0)
+    n_rows = len(search_texts)
+    stats: Dict[str, Any] = {"changed_rows": int(len(changed))}
+    if not n_rows or old.stale_rows + len(changed) > MAX_CHANGED_RATIO * n_rows:
+        stats["refit_reason"] = "changed_rows"
+        return None, stats
+
+    data: List[int] = []
+    indices: List[int] = []
+    rows: List[int] = []
+    in_vocab = total = 0
+    for i in changed:
+        counts, n_terms = old.vectorizer.term_counts(search_texts[i])
+        total += n_terms
+        in_vocab += sum(counts.values())
+        for col in sorted(counts):
+            rows.append(int(i))
+            indices.append(col)
+            data.append(counts[col])
+    drift = max(0.0, old.coverage - in_vocab / total) if total else 0.0
+    stats["vocab_drift"] = round(drift, 4)
+    if drift > VOCAB_DRIFT_THRESHOLD:
+        stats["refit_reason"] = "vocab_drift"
+        return None, stats
+
+    n_features = old.counts.shape[1]
+    kept = sp.diags((reuse >= 0).astype(old.counts.dtype), dtype=old.counts.dtype) @ old.counts[np.maximum(reuse, 0)]
+    fresh = sp.csr_matrix((np.array(data, dtype=old.counts.dtype), (rows, indices)), shape=(n_rows, n_features))
+    counts = (kept + fresh).tocsr()
+    counts.eliminate_zeros()
+    counts.sort_indices()
+
+    idf, matrix = _weigh(counts)
+    return IndexData(
+        old.vectorizer.with_idf(idf), counts, matrix, postings_of(matrix), hashes,
+        old.coverage, old.stale_rows + len(changed)
+    ), stats
+
+
+def _save_csr(directory: str, prefix: str, matrix: sp.csr_matrix, dtype=np.float64):
+    # scipy indices/indptr için ortak tamsayı tipi ister; farklı olursa yüklemede kopyalar
+    index_dtype = np.int32 if matrix.nnz < 2 ** 31 else np.int64
+    np.save(os.path.join(directory, f"{prefix}data.npy"), matrix.data.astype(dtype))
+    np.save(os.path.join(directory, f"{prefix}indices.npy"), matrix.indices.astype(index_dtype))
+    np.save(os.path.join(directory, f"{prefix}indptr.npy"), matrix.indptr.astype(index_dtype))
+
+
+def _load_csr(directory: str, prefix: str, shape: Tuple[int, int]) -> sp.csr_matrix:
+    arrays = [np.load(os.path.join(directory, f"{prefix}{name}.npy"), mmap_mode="r")
+              for name in ("data", "indices", "indptr")]
+    return sp.csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+
+def save_index(out_dir: str, source_hash: str, products: ProductStore, index: IndexData) -> str:
+    """Artefaktı geçici dizine yaz, sonra tek rename ile yerine koy"""
+    target = artifact_dir(out_dir, source_hash)
+    tmp = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    vectorizer = index.vectorizer
+    terms = [""] * len(vectorizer.vocabulary_)
+    for term, col in vectorizer.vocabulary_.items():
+        terms[col] = term
+    np.save(os.path.join(tmp, "idf.npy"), np.asarray(vectorizer.idf_, dtype=np.float64))
+    np.save(os.path.join(tmp, "row_hashes.npy"), np.asarray(index.row_hashes, dtype=np.uint64))
+    _save_csr(tmp, "", index.matrix)
+    _save_csr(tmp, "postings_", index.postings)
+    _save_csr(tmp, "counts_", index.counts, dtype=np.int32)
+    if index.bm25 is not None:
+        index.bm25.save(tmp)
+    if index.dense is not None:
+        index.dense.save(tmp)
+    with open(os.path.join(tmp, "vocabulary.json"), "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False)
+    products.save(tmp)
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": ARTIFACT_VERSION,
+            "source_hash": source_hash,
+            "n_products": len(products),
+            "n_features": len(terms),
+            "ngram_range": list(vectorizer.ngram_range),
+            "analyzer_version": ANALYZER_VERSION,
+            "coverage": index.coverage,
+            "stale_rows": index.stale_rows,
+            "built_at": time.time()
+        }, f, indent=2)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.rename(tmp, target)
+    # Eski sürüm/hash dizinlerini temizle
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if path != target and os.path.isdir(path) and name.startswith("v") and ".tmp-" not in name:
+            shutil.rmtree(path, ignore_errors=True)
+    return target
+
+
+def load_index(index_dir: str, source_hash: str) -> Optional[Tuple[ProductStore, IndexData]]:
+    """Kaynak dosyanın hash'ine uyan artefaktı mmap ile aç; yoksa/eskiyse None"""
+    path = artifact_dir(index_dir, source_hash)
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if (meta.get("version") != ARTIFACT_VERSION or meta.get("source_hash") != source_hash
+            or meta.get("analyzer_version") != ANALYZER_VERSION):
+        return None
+
+    n_products, n_features = meta["n_products"], meta["n_features"]
+    with open(os.path.join(path, "vocabulary.json"), "r", encoding="utf-8") as f:
+        terms = json.load(f)
+    idf = np.load(os.path.join(path, "idf.npy"), mmap_mode="r")
+    index = IndexData(
+        QueryVectorizer({t: i for i, t in enumerate(terms)}, idf, tuple(meta["ngram_range"])),
+        _load_csr(path, "counts_", (n_products, n_features)),
+        _load_csr(path, "", (n_products, n_features)),
+        _load_csr(path, "postings_", (n_features, n_products)),
+        np.load(os.path.join(path, "row_hashes.npy"), mmap_mode="r"),
+        meta["coverage"],
+        meta["stale_rows"],
+        BM25Index.load(path),
+        DenseIndex.load(path)
+    )
+
+    products = ProductStore.load(path)
+    if products is None:
+        return None
+    return products, index
+
+
+def main():
+    from catalog_compact import default_catalog_path
+    from search import ProductSearch
+
+    data_path = sys.argv[1] if len(sys.argv) > 1 else default_catalog_path()
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_INDEX_DIR
+
+    t0 = time.perf_counter()
+    search = ProductSearch(data_path, index_dir=None)
+    snapshot = search.snapshot
+    if snapshot.index is None:
+        print("❌ İndekslenecek ürün yok:", data_path)
+        sys.exit(1)
+    target = save_index(out_dir, snapshot.source_hash, snapshot.products, snapshot.index)
+    print(f"✅ Arama indeksi artefaktı yazıldı -> {target} ({time.perf_counter() - t0:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
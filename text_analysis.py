@@ -0,0 +1,112 @@
+"""Türkçe metin analizi: hem indeksleme hem sorgu tarafında aynı token'ları üretir.
+
+- Türkçe büyük/küçük harf: "İ" -> "i", "I" -> "ı" (str.lower() "İ"yi "i̇" yapar)
+- ASCII katlama: ı/ş/ğ/ç/ö/ü -> i/s/g/c/o/u; katalogdaki "SOGUTMA SUYU" ile
+  sorgudaki "soğutma suyu" aynı token'a düşer
+- Hafif ek atma: çoğul, hâl ve iyelik eklerinin sık görülenleri
+
+Token başına normalizasyon LRU önbellekte tutulur; sorgularda tekrar eden
+terimler için maliyet tek sözlük aramasına iner.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Tuple
+
+# Artefakt meta'sına yazılır: kurallar değişirse eski indeks geçersiz sayılır
+ANALYZER_VERSION = 1
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+TOKEN_CACHE_SIZE = 50000
+
+_FOLD = str.maketrans({"ı": "i", "ş": "s", "ğ": "g", "ç": "c", "ö": "o", "ü": "u",
+                       "â": "a", "î": "i", "û": "u"})
+# Katlanmış (ASCII) hâlleriyle, uzundan kısaya; ilk eşleşen atılır
+_SUFFIXES = (
+    "lerinden", "larindan", "lerinde", "larinda", "lerini", "larini",
+    "lerden", "lardan", "lerde", "larda", "lerin", "larin", "leri", "lari",
+    "nden", "ndan", "nde", "nda", "nin", "nun",
+    "ler", "lar", "den", "dan", "ten", "tan",
+    "yle", "yla", "si", "su", "yi", "yu",
+    "de", "da", "te", "ta", "i", "u",
+)
+# Ek atıldıktan sonra kalması gereken en kısa kök (kısa kelimeler bozulmasın)
+MIN_STEM = 4
+MAX_STRIP = 2
+
+
+def turkish_lower(text: str) -> str:
+    return (text or "").replace("İ", "i").replace("I", "ı").lower()
+
+
+def fold(text: str) -> str:
+    """Türkçe karakterleri ASCII karşılıklarına indir, kalan birleşik işaretleri at"""
+    text = text.translate(_FOLD)
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def strip_suffixes(token: str) -> str:
+    """Katlanmış token'dan en fazla MAX_STRIP ek at; rakam içeren kodlara dokunma"""
+    if any(ch.isdigit() for ch in token):
+        return token
+    for _ in range(MAX_STRIP):
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM:
+                token = token[:-len(suffix)]
+                break
+        else:
+            break
+    return token
+
+
+def normalize_token(token: str) -> str:
+    return strip_suffixes(fold(turkish_lower(token)))
+
+
+class TurkishAnalyzer:
+    """Önceden derlenmiş token deseni + önbellekli token normalizasyonu.
+
+    `tokenize` sklearn vektörleştiricilerine `tokenizer=` olarak verilir
+    (lowercase=False, token_pattern=None); `analyze` aynı n-gram'ları sorgu
+    tarafında sklearn olmadan üretir.
+    """
+
+    def __init__(self, ngram_range: Tuple[int, int] = (1, 2), cache_size: int = TOKEN_CACHE_SIZE):
+        self.ngram_range = tuple(ngram_range)
+        self._token_re = re.compile(TOKEN_PATTERN)
+        self._normalize = lru_cache(maxsize=cache_size)(normalize_token)
+
+    def tokenize(self, text: str) -> List[str]:
+        # "İ" ayrıştırmadan önce çevrilmeli: aksi hâlde \b "i̇"yi iki parçaya böler
+        normalize = self._normalize
+        return [normalize(t) for t in self._token_re.findall(turkish_lower(text))]
+
+    def analyze(self, text: str) -> List[str]:
+        tokens = self.tokenize(text)
+        low, high = self.ngram_range
+        terms = list(tokens) if low == 1 else []
+        for n in range(max(2, low), high + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def cache_info(self):
+        return self._normalize.cache_info()
+
+    def __getstate__(self):
+        # lru_cache'li fonksiyon pickle edilemez; yeniden kurulur
+        return {"ngram_range": self.ngram_range}
+
+    def __setstate__(self, state):
+        self.__init__(state["ngram_range"])
+
+
+_default = TurkishAnalyzer()
+
+
+def get_analyzer(ngram_range: Tuple[int, int] = (1, 2)) -> TurkishAnalyzer:
+    """Aynı n-gram aralığı için süreç genelinde tek analizci (önbellek paylaşılsın)"""
+    if tuple(ngram_range) == _default.ngram_range:
+        return _default
+    return TurkishAnalyzer(ngram_range)